@@ -1,27 +1,23 @@
 from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
 from typing import Optional
 
-from app.db.database import get_db
-from app.models.product import ImageType, Product, ProductImage, ProductVariant
+from app.db.database import get_async_db, get_db
+from app.models.product_listing import ProductListing
 from app.models.category import Category
-from app.models.store import Store
-from app.models.user import User
+from app.core.principal import Principal
 from app.utils.response_handler import success_response, error_response
 from app.core.authz import get_current_user_from_cookie
+from app.core.cache import cached
+from app.services import catalog_cache_service
+from app.repositories.product_listing_repository import listing_query, listing_select
+from app.services.image_derivative_service import derivative_url
+from app.utils.pagination import COUNT_MODE_PATTERN, count_rows_async, keyset_page_async, offset_page_async
 
 router = APIRouter(prefix="/home", tags=["Home"])
 
 
-def get_lowest_variant_price(db: Session, product_id) -> float:
-    """Issue #8: ดึงราคาต่ำสุดจาก variants ของสินค้า"""
-    result = db.query(func.min(ProductVariant.price)).filter(
-        ProductVariant.product_id == product_id,
-        ProductVariant.is_active == True,
-    ).scalar()
-    return float(result) if result is not None else 0.0
-
 # =========================
 # TYPES (for reference)
 # =========================
@@ -49,7 +45,7 @@ def get_lowest_variant_price(db: Session, product_id) -> float:
 # };
 
 
-def get_optional_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
+def get_optional_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[Principal]:
     """
     พยายามดึง current user แต่ไม่ raise exception ถ้าไม่มี
     ใช้สำหรับ endpoint ที่ไม่จำเป็นต้อง login แต่ต้องการรู้ว่า user คือใคร (ถ้ามี)
@@ -59,81 +55,99 @@ def get_optional_current_user(request: Request, db: Session = Depends(get_db)) -
     except:
         return None
 
+def _load_home_categories(db: Session) -> list:
+    category_rows = (
+        db.query(Category)
+        .filter(Category.is_active == True)
+        .order_by(Category.name)
+        .all()
+    )
+    return [
+        {
+            "id": str(cat.category_id),
+            "name": cat.name,
+            "slug": cat.slug,
+            "iconUrl": cat.image if cat.image else None,
+        }
+        for cat in category_rows
+    ]
+
+
+def get_home_categories(db: Session) -> list:
+    """หมวดหมู่ที่เปิดใช้งาน (cache — ลบเมื่อ admin แก้หมวดหมู่)"""
+    return cached(
+        catalog_cache_service.home_categories_key(),
+        lambda: _load_home_categories(db),
+        catalog_cache_service.CATEGORY_TTL,
+    )
+
+
 @router.get("/products")
-def get_home_products(
+async def get_home_products(
     skip: int = Query(0),
     limit: int = Query(10),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_current_user)
+    cursor: Optional[str] = Query(None, description="next_cursor จากหน้าก่อน (keyset pagination)"),
+    count: str = Query("none", pattern=COUNT_MODE_PATTERN, description="exact | estimated | none"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Principal] = Depends(get_optional_current_user)
 ):
+    """
+    สินค้าหน้า home (AsyncSession — ไม่กิน thread ของ threadpool)
+    - หน้าแรก / หน้าถัดไป: ใช้ cursor (keyset) → ?cursor=<next_cursor>
+    - client เก่าที่ส่ง skip > 0 (ไม่มี cursor) ยังใช้ OFFSET แบบเดิมได้
+    """
     try:
-        current_user_store_id = None
-        if current_user:
-            user_store = db.query(Store).filter(Store.user_id == current_user.user_id).first()
-            if user_store:
-                current_user_store_id = user_store.store_id
-
-        product_query = (
-            db.query(Product, ProductImage, Store)
-            .join(Store, Product.store_id == Store.store_id)
-            .join(                                                    # เพิ่ม
-                ProductVariant,
-                and_(
-                    ProductVariant.product_id == Product.product_id,
-                    ProductVariant.is_active == True,
-                    ProductVariant.stock > 0,
-                )
-            )
-            .outerjoin(
-                ProductImage,
-                and_(
-                    Product.product_id == ProductImage.product_id,
-                    ProductImage.variant_id == None,
-                    ProductImage.is_main == True,
-                    ProductImage.image_type == ImageType.NORMAL
-                ),
+        current_user_store_id = current_user.store_id if current_user else None
+
+        query = listing_select(exclude_store_id=current_user_store_id)
+        total = await count_rows_async(db, query, count)
+
+        next_cursor = None
+        if skip and not cursor:
+            product_rows, has_more = await offset_page_async(
+                db,
+                query.order_by(ProductListing.created_at.desc(), ProductListing.product_id.desc()),
+                skip,
+                limit,
             )
-            .filter(
-                Product.is_active == True,
-                Product.is_draft == False,
-                Store.is_active == True,
-                # ลบ ProductVariant.stock และ ProductVariant.is_active ออกจากตรงนี้
+        else:
+            product_rows, next_cursor = await keyset_page_async(
+                db, query, ProductListing.created_at, ProductListing.product_id, limit, cursor
             )
-            .group_by(Product.product_id, ProductImage.image_id, Store.store_id)
-        )
-
-        if current_user_store_id:
-            product_query = product_query.filter(Product.store_id != current_user_store_id)
-
-        product_rows = (
-            product_query
-            .order_by(Product.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+            has_more = next_cursor is not None
 
         products = []
-        for p, img, store in product_rows:
+        for row in product_rows:
             products.append({
-                "id": str(p.product_id),
-                "title": p.product_name,
-                "price": get_lowest_variant_price(db, p.product_id),
-                "rating": p.average_rating or 0,
-                "imageUrl": img.image_url if img else None,
-                "imageId": str(img.image_id) if img else None,
-                "storeName": store.name if store else None,
+                "id": str(row.product_id),
+                "title": row.product_name,
+                "price": float(row.min_price or 0.0),
+                "rating": row.rating or 0,
+                "imageUrl": derivative_url(row.main_image_url, row.main_image_derivatives, "card"),
+                "imageSizes": row.main_image_derivatives,
+                "imageId": str(row.main_image_id) if row.main_image_id else None,
+                "storeName": row.store_name,
             })
 
-        return success_response("Products retrieved successfully", {"products": products})
+        return success_response(
+            "Products retrieved successfully",
+            {
+                "products": products,
+                "next_cursor": next_cursor,
+                "has_more": has_more,
+                "total": total,
+            },
+        )
 
+    except ValueError as e:
+        return error_response("Invalid cursor", {"cursor": str(e)}, 400)
     except Exception as e:
         return error_response("Failed to fetch products", {"error": str(e)}, 500)
     
 @router.get("")
 def get_home_data(
     db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_current_user)
+    current_user: Optional[Principal] = Depends(get_optional_current_user)
 ):
     try:
         banners = [
@@ -147,21 +161,7 @@ def get_home_data(
             },
         ]
 
-        category_rows = (
-            db.query(Category)
-            .filter(Category.is_active == True)
-            .order_by(Category.name)
-            .all()
-        )
-        
-        categories = []
-        for cat in category_rows:
-            categories.append({
-                "id": str(cat.category_id),
-                "name": cat.name,
-                "slug": cat.slug,
-                "iconUrl": cat.image if cat.image else None,
-            })
+        categories = get_home_categories(db)
 
         return success_response(
             "Home data retrieved successfully",
@@ -180,7 +180,7 @@ def get_home_data(
 @router.get("/categories-page")
 def get_category_page_data(
     db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_current_user)
+    current_user: Optional[Principal] = Depends(get_optional_current_user)
 ):
     """
     API สำหรับดึงข้อมูลทั้งหมดที่ต้องใช้ในหน้า Categories
@@ -193,85 +193,38 @@ def get_category_page_data(
     3. ✅ ไม่แสดงสินค้าของตัวเอง (ถ้า login อยู่)
     """
     try:
-        # 1. Categories (ดึงจาก Database)
-        category_rows = (
-            db.query(Category)
-            .filter(Category.is_active == True)
-            .order_by(Category.name)
-            .all()
-        )
-        
-        categories = []
-        for cat in category_rows:
-            categories.append({
-                "id": str(cat.category_id),
-                "name": cat.name,
-                "slug": cat.slug,
-                "iconUrl": cat.image if cat.image else None,
-            })
+        # 1. Categories (cache)
+        categories = get_home_categories(db)
 
         # 2. ดึง store_id ของตัวเอง (ถ้า login อยู่)
-        current_user_store_id = None
-        if current_user:
-            user_store = db.query(Store).filter(Store.user_id == current_user.user_id).first()
-            if user_store:
-                current_user_store_id = user_store.store_id
-                print(f"🛍️ Current user store_id: {current_user_store_id}")
-
-        # 3. Products (ดึงสินค้าทั้งหมดที่ active)
-        product_query = (
-            db.query(Product, ProductImage, Store)
-            .join(Store, Product.store_id == Store.store_id)
-            .join(                                                    # เพิ่ม
-                ProductVariant,
-                and_(
-                    ProductVariant.product_id == Product.product_id,
-                    ProductVariant.is_active == True,
-                    ProductVariant.stock > 0,
-                )
-            )
-            .outerjoin(
-                ProductImage,
-                and_(
-                    Product.product_id == ProductImage.product_id,
-                    ProductImage.variant_id == None,
-                    ProductImage.is_main == True,
-                    ProductImage.image_type == ImageType.NORMAL
-                ),
-            )
-            .filter(
-                Product.is_active == True,
-                Product.is_draft == False,
-                Store.is_active == True,
-                # ลบ ProductVariant.stock และ ProductVariant.is_active ออกจากตรงนี้
-            )
-            .group_by(Product.product_id, ProductImage.image_id, Store.store_id)
-        )
+        current_user_store_id = current_user.store_id if current_user else None
+        if current_user_store_id:
+            print(f"🛍️ Current user store_id: {current_user_store_id}")
 
-        # ✅ กรองสินค้าของตัวเองออก (ถ้า login อยู่)
+        # 3. Products (ดึงสินค้าทั้งหมดที่ active) — อ่านจาก read model product_listing
         if current_user_store_id:
-            product_query = product_query.filter(Product.store_id != current_user_store_id)
             print(f"🚫 Filtering out products from store: {current_user_store_id}")
 
         product_rows = (
-            product_query
-            .order_by(Product.created_at.desc())
+            listing_query(db, exclude_store_id=current_user_store_id)
+            .order_by(ProductListing.created_at.desc(), ProductListing.product_id.desc())
             .all()
         )
 
         products = []
-        for p, img, store in product_rows:
+        for row in product_rows:
             products.append(
                 {
-                    "id": str(p.product_id),
-                    "title": p.product_name,
-                    "price": get_lowest_variant_price(db, p.product_id),  # Issue #8
-                    "rating": p.average_rating or 0,
-                    "imageUrl": img.image_url if img else None,
-                    "imageId": str(img.image_id) if img else None,
+                    "id": str(row.product_id),
+                    "title": row.product_name,
+                    "price": float(row.min_price or 0.0),  # Issue #8
+                    "rating": row.rating or 0,
+                    "imageUrl": derivative_url(row.main_image_url, row.main_image_derivatives, "card"),
+                    "imageSizes": row.main_image_derivatives,
+                    "imageId": str(row.main_image_id) if row.main_image_id else None,
                     # ใช้ category_id (UUID) เป็น key
-                    "categoryId": str(p.category_id) if p.category_id else None,
-                    "storeName": store.name if store else None,  # เพิ่มชื่อร้านด้วย
+                    "categoryId": str(row.category_id) if row.category_id else None,
+                    "storeName": row.store_name,  # เพิ่มชื่อร้านด้วย
                 }
             )
 
@@ -6,14 +6,14 @@ from jose import JWTError, jwt
 from app.core.config import settings
 from app.db.database import get_db
 from sqlalchemy.orm import Session
-from app.models.user import User
+from app.core.principal import Principal, get_principal
 
 is_production = os.getenv("APP_ENV", "development") == "production"
 
 def get_current_user_from_cookie(
     request: Request,
     db: Session = Depends(get_db),
-) -> User:
+) -> Principal:
     # ✅ 1. พยายามอ่าน token จาก cookie ก่อน
     token = request.cookies.get("access_token")
     print(f"get token from cookie: {token}")
@@ -37,7 +37,8 @@ def get_current_user_from_cookie(
         if not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-        user = db.query(User).filter(User.user_id == user_id).first()
+        # role / is_active / store_id มาจาก principal cache (ไม่ query DB ทุก request)
+        user = get_principal(db, user_id)
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         if not user.is_active:
@@ -52,7 +53,7 @@ def get_current_user_from_cookie(
 
 def authenticate_token() -> Callable:
     # ✅ ประกาศฟังก์ชันซ้อนข้างใน
-    def wrapper(current_user: User = Depends(get_current_user_from_cookie)):
+    def wrapper(current_user: Principal = Depends(get_current_user_from_cookie)):
         
         # ใส่ Print เช็คตรงนี้
         print(f"✅ authenticate_token wrapper working... User: {getattr(current_user, 'username', 'None')}")
@@ -69,7 +70,7 @@ def authenticate_token() -> Callable:
 
 
 def authorize_role(required_roles: Sequence[str]) -> Callable:
-    def checker(current_user: User = Depends(get_current_user_from_cookie)):
+    def checker(current_user: Principal = Depends(get_current_user_from_cookie)):
         user_role = getattr(getattr(current_user, "role", None), "role_name", None)
         if user_role is None or user_role not in required_roles:
             raise HTTPException(
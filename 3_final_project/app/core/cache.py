@@ -0,0 +1,350 @@
+# app/core/cache.py
+"""
+Cache 2 ชั้นสำหรับข้อมูลที่อ่านบ่อยแต่เปลี่ยนน้อย (หมวดหมู่, ร้านค้า, สินค้า)
+
+    request → [1] in-process LRU/TTL → [2] Redis → [3] loader (query DB)
+
+- ค่าใน cache ต้องเป็น JSON ได้ (dict / list ที่ผ่าน jsonable_encoder แล้ว)
+- single-flight: key เดียวกันโหลดจาก DB ครั้งเดียว
+    * ใน process เดียวกัน → lock ต่อ key (striped lock)
+    * ข้าม process / worker → Redis lock ตัวที่ไม่ได้ lock จะรอค่าจาก Redis
+- invalidation:
+    * invalidate_on_commit(db, ...) → ลบ key หลัง transaction commit สำเร็จ
+    * ลบทั้ง Redis และ local แล้ว publish ให้ process อื่นลบ local ของตัวเอง
+    * ลบตาม prefix ได้เฉพาะ prefix ที่ลงทะเบียนด้วย track_prefix(): key ใต้ prefix ถูกจดไว้ใน Redis set
+      ตอนเก็บ → ลบจากรายชื่อใน set (ไม่ SCAN ทั้ง keyspace ที่ใช้ร่วมกับ Celery)
+- Redis ล่ม → ใช้แค่ local cache ต่อไป (ไม่ทำให้ request พัง)
+- stats(): hit / miss / load ของแต่ละชั้น
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.redis_client import get_redis
+
+KEY_PREFIX = "closetx:cache:"
+INVALIDATE_CHANNEL = "closetx:cache:invalidate"
+
+DEFAULT_TTL = 300           # วินาที (Redis)
+LOCAL_TTL = 30              # วินาที (in-process) สั้นกว่า เผื่อพลาด message invalidate
+LOCAL_MAX_ENTRIES = 2000
+LOCK_TTL_MS = 5000          # Redis lock ของ single-flight
+LOCK_WAIT_SECONDS = 2.0     # เวลารอค่าจาก process ที่ถือ lock
+REDIS_RETRY_SECONDS = 30    # Redis ล่ม → ข้าม Redis ช่วงนี้
+LOCK_STRIPES = 64
+INDEX_SUFFIX = "__keys"     # Redis set รายชื่อ key ของ prefix ที่ track
+INDEX_TTL = 86400           # member หมดอายุเองตาม TTL ของ key — set แค่ต้องอยู่นานกว่า
+
+_MISS = object()
+
+
+class LocalCache:
+    """LRU + TTL ใน memory (thread-safe)"""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISS
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    def __init__(self, local_ttl: float = LOCAL_TTL, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.local_ttl = local_ttl
+        self.local = LocalCache(max_entries)
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "redis_errors": 0,
+            "invalidations": 0,
+        }
+        # เพิ่มทุกครั้งที่ invalidate → ค่าที่โหลดมาก่อน invalidate จะไม่ถูกเก็บ
+        self._generation = 0
+        self._redis_down_until = 0.0
+        self._listener: Optional[threading.Thread] = None
+        self._tracked_prefixes: Tuple[str, ...] = ()
+
+    def track_prefix(self, prefix: str) -> None:
+        """ลงทะเบียน prefix ที่จะ invalidate ทั้งกลุ่ม (เรียกครั้งเดียวตอน import)"""
+        if prefix not in self._tracked_prefixes:
+            self._tracked_prefixes += (prefix,)
+
+    def check_prefixes(self, prefixes: Iterable[str]) -> None:
+        untracked = [p for p in prefixes if p not in self._tracked_prefixes]
+        if untracked:
+            raise ValueError(f"Cache prefix not tracked (call track_prefix first): {untracked}")
+
+    @staticmethod
+    def _index_key(prefix: str) -> str:
+        return KEY_PREFIX + prefix + INDEX_SUFFIX
+
+    # ---------- stats ----------
+
+    def _incr(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            data = dict(self._stats)
+        hits = data["local_hits"] + data["redis_hits"] + data["coalesced"]
+        lookups = hits + data["misses"]
+        data["hit_ratio"] = round(hits / lookups, 4) if lookups else None
+        data["local_entries"] = len(self.local)
+        data["redis_available"] = self._redis_available()
+        return data
+
+    # ---------- redis ----------
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception) -> None:
+        self._incr("redis_errors")
+        if self._redis_available():
+            print(f"⚠️ [Cache] Redis unavailable, using local cache only: {e}")
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def _redis_get(self, key: str) -> Any:
+        if not self._redis_available():
+            return _MISS
+        try:
+            raw = get_redis().get(KEY_PREFIX + key)
+        except Exception as e:
+            self._redis_failed(e)
+            return _MISS
+        return _MISS if raw is None else json.loads(raw)
+
+    def _redis_set(self, key: str, value: Any, ttl: int) -> None:
+        if not self._redis_available():
+            return
+        try:
+            pipe = get_redis().pipeline()
+            pipe.set(KEY_PREFIX + key, json.dumps(value), ex=ttl)
+            for prefix in self._tracked_prefixes:
+                if key.startswith(prefix):
+                    pipe.sadd(self._index_key(prefix), key)
+                    pipe.expire(self._index_key(prefix), INDEX_TTL)
+            pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def _redis_lock(self, key: str):
+        """Redis lock ของ single-flight ข้าม process — None ถ้ามี process อื่นถืออยู่"""
+        if not self._redis_available():
+            return False
+        try:
+            lock = get_redis().lock(KEY_PREFIX + key + ":lock", timeout=LOCK_TTL_MS / 1000)
+            return lock if lock.acquire(blocking=False) else None
+        except Exception as e:
+            self._redis_failed(e)
+            return False
+
+    def _wait_for_redis(self, key: str) -> Any:
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = self._redis_get(key)
+            if value is not _MISS:
+                return value
+        return _MISS
+
+    # ---------- read ----------
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: int = DEFAULT_TTL) -> Any:
+        """อ่านจาก cache ถ้าไม่มีเรียก loader() แล้วเก็บผลไว้ (loader คืน None = ไม่ cache)"""
+        value = self.local.get(key)
+        if value is not _MISS:
+            self._incr("local_hits")
+            return value
+
+        value = self._redis_get(key)
+        if value is not _MISS:
+            self._incr("redis_hits")
+            self.local.set(key, value, min(ttl, self.local_ttl))
+            return value
+
+        with self._locks[hash(key) % LOCK_STRIPES]:
+            # thread อื่นอาจโหลดเสร็จระหว่างรอ lock
+            value = self.local.get(key)
+            if value is not _MISS:
+                self._incr("coalesced")
+                return value
+
+            redis_lock = self._redis_lock(key)
+            if redis_lock is None:
+                value = self._wait_for_redis(key)
+                if value is not _MISS:
+                    self._incr("coalesced")
+                    self.local.set(key, value, min(ttl, self.local_ttl))
+                    return value
+
+            try:
+                return self._load(key, loader, ttl)
+            finally:
+                if redis_lock:
+                    try:
+                        redis_lock.release()
+                    except Exception:
+                        pass  # lock หมดอายุไปแล้ว
+
+    def _load(self, key: str, loader: Callable[[], Any], ttl: int) -> Any:
+        self._incr("misses")
+        generation = self._generation
+        try:
+            value = loader()
+        except Exception:
+            self._incr("load_errors")
+            raise
+        self._incr("loads")
+
+        if value is None or generation != self._generation:
+            return value
+        self.local.set(key, value, min(ttl, self.local_ttl))
+        self._redis_set(key, value, ttl)
+        return value
+
+    # ---------- invalidate ----------
+
+    def _drop_local(self, keys: Iterable[str], prefixes: Iterable[str]) -> None:
+        self._generation += 1
+        for key in keys:
+            self.local.delete(key)
+        for prefix in prefixes:
+            self.local.delete_prefix(prefix)
+
+    def invalidate(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        keys, prefixes = list(keys), list(prefixes)
+        if not keys and not prefixes:
+            return
+        self.check_prefixes(prefixes)
+        self._incr("invalidations")
+        self._drop_local(keys, prefixes)
+
+        if not self._redis_available():
+            return
+        try:
+            r = get_redis()
+            redis_keys = [KEY_PREFIX + key for key in keys]
+            if prefixes:
+                # อ่าน + ลบ set ใน MULTI เดียว → key ที่เก็บหลังจากนี้เข้า set ใหม่ ไม่หลุดรอบ
+                pipe = r.pipeline()
+                for prefix in prefixes:
+                    pipe.smembers(self._index_key(prefix))
+                    pipe.delete(self._index_key(prefix))
+                results = pipe.execute()
+                for members in results[::2]:
+                    redis_keys.extend(KEY_PREFIX + m.decode() for m in members)
+            if redis_keys:
+                r.delete(*redis_keys)
+            r.publish(INVALIDATE_CHANNEL, json.dumps({"keys": keys, "prefixes": prefixes}))
+        except Exception as e:
+            self._redis_failed(e)
+
+    def start_invalidation_listener(self) -> None:
+        """subscribe ช่อง invalidate → ลบ local cache เมื่อ process อื่นแก้ข้อมูล"""
+        if self._listener and self._listener.is_alive():
+            return
+        self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATE_CHANNEL)
+                print("✅ [Cache] Listening for invalidations")
+                # poll ด้วย timeout (listen() แบบ block โดน socket_timeout ของ client ตัดเมื่อเงียบนาน)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message:
+                        continue
+                    payload = json.loads(message["data"])
+                    self._drop_local(payload.get("keys", []), payload.get("prefixes", []))
+            except Exception as e:
+                print(f"⚠️ [Cache] Invalidation listener error: {e}")
+                # ระหว่างหลุด อาจพลาด message → ล้าง local ทิ้งทั้งหมด
+                self.local.clear()
+                time.sleep(REDIS_RETRY_SECONDS)
+
+
+cache = TwoTierCache()
+
+
+def cached(key: str, loader: Callable[[], Any], ttl: int = DEFAULT_TTL) -> Any:
+    return cache.get_or_load(key, loader, ttl)
+
+
+# ---------- invalidate หลัง commit ----------
+
+_PENDING_KEYS = "cache_invalidate_keys"
+_PENDING_PREFIXES = "cache_invalidate_prefixes"
+
+
+def invalidate_on_commit(db: Session, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+    """
+    จดไว้ว่าต้องลบ key ไหนบ้าง แล้วลบจริงหลัง db.commit() สำเร็จ
+    (ถ้าลบก่อน commit request อื่นอาจโหลดข้อมูลเก่ากลับเข้า cache)
+    """
+    prefixes = list(prefixes)
+    cache.check_prefixes(prefixes)
+    db.info.setdefault(_PENDING_KEYS, set()).update(keys)
+    db.info.setdefault(_PENDING_PREFIXES, set()).update(prefixes)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    keys = session.info.pop(_PENDING_KEYS, None) or ()
+    prefixes = session.info.pop(_PENDING_PREFIXES, None) or ()
+    cache.invalidate(keys, prefixes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEYS, None)
+    session.info.pop(_PENDING_PREFIXES, None)
@@ -40,4 +40,37 @@ celery_app.conf.update(
 celery_app.conf.imports = [
     "app.utils.order_task",
     "app.tasks.order_tasks",
-]
\ No newline at end of file
+    "app.tasks.stock_tasks",
+    "app.tasks.stripe_tasks",
+    "app.tasks.payout_tasks",
+    "app.tasks.vton_tasks",
+    "app.tasks.image_tasks",
+]
+
+# งานตามรอบ (ต้องรัน celery beat)
+celery_app.conf.beat_schedule = {
+    "sweep-expired-reservations": {
+        "task": "sweep_expired_reservations",
+        "schedule": settings.RESERVATION_SWEEP_INTERVAL_SECONDS,
+    },
+    "reconcile-reserved-qty": {
+        "task": "reconcile_reserved_qty",
+        "schedule": settings.STOCK_RECONCILE_INTERVAL_SECONDS,
+    },
+    "process-stripe-events": {
+        "task": "process_stripe_events",
+        "schedule": settings.STRIPE_EVENT_DRAIN_INTERVAL_SECONDS,
+    },
+    "settle-store-payouts": {
+        "task": "settle_store_payouts",
+        "schedule": settings.PAYOUT_SETTLEMENT_INTERVAL_SECONDS,
+    },
+    "expire-stale-vton-jobs": {
+        "task": "expire_stale_vton_jobs",
+        "schedule": settings.VTON_STALE_SWEEP_INTERVAL_SECONDS,
+    },
+    "evict-vton-cache": {
+        "task": "evict_vton_cache",
+        "schedule": settings.VTON_CACHE_EVICT_INTERVAL_SECONDS,
+    },
+}
\ No newline at end of file
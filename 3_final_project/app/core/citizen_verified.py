@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-import requests
+from app.core import http_client
 import hmac, hashlib, re, os
 
 PEPPER = os.getenv("CITIZEN_PEPPER")  # เก็บใน Secret Manager
@@ -17,12 +17,12 @@ def cid_hmac(cid: str) -> str:
 def citizen_verified(card_id, first_name, last_name, birth_date):
     print(card_id, first_name, last_name, "card_id, first_name, last_name")
     try:
-        res = requests.post(BASE_URL, json={
+        res = http_client.request("citizen", "POST", BASE_URL, json={
             "citizen_id": card_id,
             "first_name": first_name,
             "last_name": last_name,
             "birth_date": birth_date
-        })
+        }, timeout=10)
         
         if res.status_code == 200:
             return res.json()
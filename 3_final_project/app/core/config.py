@@ -14,6 +14,33 @@ class Settings:
         # ใช้ f-string เพื่อสร้าง URL หากไม่ได้ดึงมาจาก Env Var โดยตรง
         DATABASE_URL = f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOSTNAME}:{DB_PORT}/{DB_NAME}"
 
+    # asyncpg (AsyncSession) — ถ้าไม่ได้ตั้งจะแปลงจาก DATABASE_URL
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL.replace(
+        "postgresql+psycopg2://", "postgresql://", 1
+    ).replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    # ---------- Connection pool ----------
+    # API (FastAPI) — sync route ใช้ threadpool ของ Starlette (40 threads)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))          # วินาที รอ connection ว่าง
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))        # วินาที ต่อ connection ใหม่
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+    # API async (AsyncSession) — route ที่ port เป็น async แล้ว
+    DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+    DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "10"))
+    # Celery worker — 1 task ต่อ process ใช้ pool เล็ก
+    DB_WORKER_POOL_SIZE = int(os.getenv("DB_WORKER_POOL_SIZE", "2"))
+    DB_WORKER_MAX_OVERFLOW = int(os.getenv("DB_WORKER_MAX_OVERFLOW", "3"))
+    DB_WORKER_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_WORKER_STATEMENT_TIMEOUT_MS", "60000"))
+    # Admin dashboard — query หนักแยก pool ไม่ให้แย่ง connection ของ API
+    DB_ADMIN_POOL_SIZE = int(os.getenv("DB_ADMIN_POOL_SIZE", "2"))
+    DB_ADMIN_MAX_OVERFLOW = int(os.getenv("DB_ADMIN_MAX_OVERFLOW", "3"))
+    DB_ADMIN_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_ADMIN_STATEMENT_TIMEOUT_MS", "60000"))
+    # log query ที่ช้ากว่านี้ / รอ connection นานกว่านี้
+    DB_SLOW_QUERY_MS = int(os.getenv("DB_SLOW_QUERY_MS", "500"))
+    DB_SLOW_CHECKOUT_MS = int(os.getenv("DB_SLOW_CHECKOUT_MS", "100"))
+
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
@@ -25,6 +52,73 @@ class Settings:
     
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+    # Celery beat: ตรวจ reserved_qty ของ variant เทียบกับ stock_reservations
+    STOCK_RECONCILE_INTERVAL_SECONDS = int(os.getenv("STOCK_RECONCILE_INTERVAL_SECONDS", "900"))
+    # Celery beat: ยกเลิกออเดอร์ที่หมดเวลาชำระเงิน + คืน stock ที่จองไว้ (แทน timer ต่อออเดอร์)
+    RESERVATION_SWEEP_INTERVAL_SECONDS = int(os.getenv("RESERVATION_SWEEP_INTERVAL_SECONDS", "30"))
+    RESERVATION_SWEEP_BATCH_SIZE = int(os.getenv("RESERVATION_SWEEP_BATCH_SIZE", "500"))
+    RESERVATION_SWEEP_MAX_BATCHES = int(os.getenv("RESERVATION_SWEEP_MAX_BATCHES", "20"))
+    RESERVATION_SWEEP_GRACE_SECONDS = int(os.getenv("RESERVATION_SWEEP_GRACE_SECONDS", "60"))
+    # คิว Stripe webhook: endpoint บันทึก event → worker ประมวลผล (beat ดึงรอบสำรอง + retry)
+    STRIPE_EVENT_DRAIN_INTERVAL_SECONDS = int(os.getenv("STRIPE_EVENT_DRAIN_INTERVAL_SECONDS", "15"))
+    STRIPE_EVENT_BATCH_SIZE = int(os.getenv("STRIPE_EVENT_BATCH_SIZE", "50"))
+    STRIPE_EVENT_MAX_BATCHES = int(os.getenv("STRIPE_EVENT_MAX_BATCHES", "10"))
+    STRIPE_EVENT_LEASE_SECONDS = int(os.getenv("STRIPE_EVENT_LEASE_SECONDS", "300"))
+    STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "8"))
+    STRIPE_EVENT_RETRY_BASE_SECONDS = int(os.getenv("STRIPE_EVENT_RETRY_BASE_SECONDS", "30"))
+
+    # จำนวน Stripe Transfer ที่สร้างพร้อมกันต่อออเดอร์ (ออเดอร์หลายร้าน)
+    PAYOUT_MAX_CONCURRENCY = int(os.getenv("PAYOUT_MAX_CONCURRENCY", "8"))
+    # instant = โอนให้ร้านทุกออเดอร์, batched = สะสมยอดแล้วโอนรวมต่อร้านทุก PAYOUT_SETTLEMENT_INTERVAL_SECONDS
+    PAYOUT_MODE = os.getenv("PAYOUT_MODE", "instant")
+    PAYOUT_SETTLEMENT_INTERVAL_SECONDS = int(os.getenv("PAYOUT_SETTLEMENT_INTERVAL_SECONDS", "86400"))
+    PAYOUT_SETTLEMENT_MAX_ATTEMPTS = int(os.getenv("PAYOUT_SETTLEMENT_MAX_ATTEMPTS", "5"))
+    # โอนให้บางร้านไม่สำเร็จ → ออเดอร์ยัง DELIVERED แล้ว auto_confirm_received ลองโอนใหม่ (backoff base * 2^attempt)
+    PAYOUT_RETRY_MAX_ATTEMPTS = int(os.getenv("PAYOUT_RETRY_MAX_ATTEMPTS", "5"))
+    PAYOUT_RETRY_BASE_SECONDS = int(os.getenv("PAYOUT_RETRY_BASE_SECONDS", "300"))
+
+    # WebSocket broadcast ข้าม worker: redis (หลาย worker / pod) หรือ memory (process เดียว, dev)
+    WS_BACKPLANE = os.getenv("WS_BACKPLANE", "redis")
+    # คิวขาออกต่อ WebSocket: เต็มแล้ว drop_oldest (ทิ้งข้อความเก่า) หรือ disconnect (ตัด client ที่ช้า)
+    WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+    WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+    WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+    # connection ที่หลุดแบบ half-open: uvicorn ส่ง ping frame ระดับ protocol ให้อยู่แล้ว
+    # (--ws-ping-interval / --ws-ping-timeout, browser / React Native ตอบ pong เอง) แล้วปิดให้
+    # heartbeat ระดับ app: ส่ง {"type": "ping"} ให้ connection ที่เงียบ, เงียบนานเกิน idle timeout → ปิด
+    # ต้องใช้กับ client ที่ตอบ {"type": "pong"} เท่านั้น → 0 = ปิด (default, client ปัจจุบันยังไม่ตอบ)
+    WS_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "25"))
+    WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "0"))
+
+    # งานลองเสื้อ (VTON) รันใน celery worker: จำนวนงานที่ยังไม่เสร็จได้พร้อมกันต่อ user
+    VTON_MAX_ACTIVE_JOBS_PER_USER = int(os.getenv("VTON_MAX_ACTIVE_JOBS_PER_USER", "2"))
+    # งานที่ค้าง PENDING / PROCESSING นานเกินนี้ (worker ตาย / ส่ง task ไม่ถึง) → FAILED (ต้องมากกว่า IDM_VTON_TIMEOUT)
+    VTON_JOB_STALE_SECONDS = int(os.getenv("VTON_JOB_STALE_SECONDS", "900"))
+    VTON_STALE_SWEEP_INTERVAL_SECONDS = int(os.getenv("VTON_STALE_SWEEP_INTERVAL_SECONDS", "300"))
+
+    # cache ผลลัพธ์ลองเสื้อตาม hash ของ input: เกินขนาด/จำนวน → ลบตัวที่ไม่ได้ใช้นานที่สุด (LRU)
+    VTON_CACHE_ENABLED = os.getenv("VTON_CACHE_ENABLED", "true").lower() == "true"
+    VTON_CACHE_MAX_BYTES = int(os.getenv("VTON_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    VTON_CACHE_MAX_ENTRIES = int(os.getenv("VTON_CACHE_MAX_ENTRIES", "5000"))
+    VTON_CACHE_EVICT_INTERVAL_SECONDS = int(os.getenv("VTON_CACHE_EVICT_INTERVAL_SECONDS", "3600"))
+
+    # HTTP client กลาง (app.core.http_client) สำหรับเรียก service ภายนอก
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))                # connection ที่เก็บไว้ต่อ host
+    HTTP_MAX_CONCURRENCY_PER_HOST = int(os.getenv("HTTP_MAX_CONCURRENCY_PER_HOST", "16"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+    HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.5"))
+
+    # รูปย่อของรูปสินค้า (thumb / card / detail) สร้างใน worker หลังอัปโหลด: webp, jpeg, avif
+    IMAGE_DERIVATIVE_FORMATS = [
+        f.strip().lower() for f in os.getenv("IMAGE_DERIVATIVE_FORMATS", "webp,jpeg").split(",") if f.strip()
+    ]
+
+    # ลบพื้นหลังรูป (rembg) ใน process pool: จำนวน process + model ที่โหลดค้างไว้ในแต่ละ process
+    REMBG_WORKERS = int(os.getenv("REMBG_WORKERS", "2"))
+    REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+    # true = โหลด model ตอน startup ของ web app (ต้องติดตั้ง rembg) ไม่งั้นโหลดตอนใช้ครั้งแรก
+    REMBG_PRELOAD = os.getenv("REMBG_PRELOAD", "false").lower() == "true"
+
     # OTP_SECRET_KEY = os.getenv("OTP_SECRET_KEY")
     # OTP_TOKEN_EXPIRE_MINUTES = int(os.getenv("OTP_TOKEN_EXPIRE_MINUTES"))
     
@@ -0,0 +1,292 @@
+# app/core/http_client.py
+"""
+HTTP client กลางสำหรับเรียก service ภายนอก (IDM VTON, citizen validator, ดาวน์โหลดรูป)
+
+- sync: requests.Session เดียวทั้ง process (connection pool + keep-alive)
+- async: aiohttp.ClientSession ต่อ event loop (ปิดตอน shutdown ด้วย close_async_sessions)
+- จำกัดจำนวน request พร้อมกันต่อ host (HTTP_MAX_CONCURRENCY_PER_HOST)
+- retry (backoff แบบ full jitter):
+    * GET / HEAD / PUT / DELETE / OPTIONS: ต่อไม่ติด / หลุดกลางคัน / ได้ 429, 502, 503, 504
+    * POST / PATCH: เฉพาะที่แน่ใจว่า upstream ยังไม่ได้ทำงาน — ต่อไม่ติด (connect timeout / refused)
+      หรือได้ 429, 503 (502 / 504 / หลุดกลาง response อาจทำงานไปแล้ว เช่น IDM คิดเงินแล้ว)
+  read timeout ไม่ retry ทุก method
+- stream(...) / async_stream(...) คืน response ที่ยังไม่อ่าน body → ส่งต่อเป็นชิ้นได้ (file_util.save_stream)
+- latency histogram ต่อ upstream ใน process นี้ — ดูได้ที่ /internal/http-stats
+
+    with http_client.stream("idm_vton", "POST", url, json=payload, timeout=380) as res:
+        path, size = save_stream(result_dir, res.iter_content(CHUNK_SIZE), filename)
+
+    async with http_client.async_stream("image_fetch", "GET", url) as res:
+        data = await res.read()
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from app.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# method ที่ทำซ้ำไม่ได้: upstream ปฏิเสธก่อนเริ่มทำงานแน่ ๆ
+UNSAFE_RETRY_STATUSES = {429, 503}
+RETRY_BACKOFF_MAX = 10.0
+# ขอบบนของแต่ละช่องใน histogram (ms) ช่องสุดท้าย = มากกว่านั้น
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+class UpstreamMetrics:
+    """จำนวน request / status / error + histogram เวลาจนได้ header ของ response ต่อ upstream"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, upstream: str) -> Dict[str, Any]:
+        entry = self._data.get(upstream)
+        if entry is None:
+            entry = self._data[upstream] = {
+                "requests": 0,
+                "retries": 0,
+                "errors": 0,
+                "status": {},
+                "latency_ms_sum": 0.0,
+                "latency_ms_max": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            }
+        return entry
+
+    def record(self, upstream: str, elapsed_ms: float, status: Optional[int]) -> None:
+        with self._lock:
+            entry = self._entry(upstream)
+            entry["requests"] += 1
+            entry["latency_ms_sum"] += elapsed_ms
+            entry["latency_ms_max"] = max(entry["latency_ms_max"], elapsed_ms)
+            index = next((i for i, le in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= le), len(LATENCY_BUCKETS_MS))
+            entry["buckets"][index] += 1
+            if status is None:
+                entry["errors"] += 1
+            else:
+                key = f"{status // 100}xx"
+                entry["status"][key] = entry["status"].get(key, 0) + 1
+
+    def record_retry(self, upstream: str) -> None:
+        with self._lock:
+            self._entry(upstream)["retries"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for upstream, entry in self._data.items():
+                labels = [f"le_{le}" for le in LATENCY_BUCKETS_MS] + ["inf"]
+                result[upstream] = {
+                    "requests": entry["requests"],
+                    "retries": entry["retries"],
+                    "errors": entry["errors"],
+                    "status": dict(entry["status"]),
+                    "latency_ms_avg": round(entry["latency_ms_sum"] / entry["requests"], 2) if entry["requests"] else 0,
+                    "latency_ms_max": round(entry["latency_ms_max"], 2),
+                    "latency_ms_histogram": dict(zip(labels, entry["buckets"])),
+                }
+            return result
+
+
+metrics = UpstreamMetrics()
+
+
+def _backoff(attempt: int) -> float:
+    """full jitter: สุ่ม 0 .. base * 2^attempt (ไม่เกิน RETRY_BACKOFF_MAX)"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, settings.HTTP_RETRY_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def _retry_statuses(method: str):
+    return RETRY_STATUSES if method.upper() in IDEMPOTENT_METHODS else UNSAFE_RETRY_STATUSES
+
+
+def _connect_failed(error: requests.exceptions.ConnectionError) -> bool:
+    """ต่อ upstream ไม่ติดเลย (request ยังไม่ถูกส่ง) — ไม่ใช่หลุดระหว่างรอ / อ่าน response"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    # NewConnectionError = connection refused / DNS / connect timeout ของ urllib3
+    return isinstance(reason, NewConnectionError)
+
+
+# ==================== SYNC ====================
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # retry ทำเองด้านล่าง (ต้องนับ metrics + ใส่ jitter)
+                adapter = HTTPAdapter(
+                    pool_connections=settings.HTTP_POOL_MAXSIZE,
+                    pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+                    max_retries=0,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _host_slot(host: str) -> threading.BoundedSemaphore:
+    slot = _host_slots.get(host)
+    if slot is None:
+        with _session_lock:
+            slot = _host_slots.setdefault(host, threading.BoundedSemaphore(settings.HTTP_MAX_CONCURRENCY_PER_HOST))
+    return slot
+
+
+@contextmanager
+def stream(upstream: str, method: str, url: str, retries: Optional[int] = None, **kwargs):
+    """
+    ส่ง request แล้วคืน response ที่ยังไม่อ่าน body (stream=True)
+    ถือ slot ของ host ไว้จนออกจาก with (อ่าน body เสร็จ) แล้วคืน connection เข้า pool
+    """
+    retries = settings.HTTP_MAX_RETRIES if retries is None else retries
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    retry_statuses = _retry_statuses(method)
+    slot = _host_slot(_host(url))
+    with slot:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = get_session().request(method, url, stream=True, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # ReadTimeout ไม่ใช่ ConnectionError → ไม่ retry
+                # หลุดกลาง response (RemoteDisconnected) ก็เป็น ConnectionError → retry เฉพาะ method ที่ทำซ้ำได้
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, None)
+                if attempt >= retries or not (idempotent or _connect_failed(e)):
+                    raise
+            except requests.exceptions.RequestException:
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, None)
+                raise
+            else:
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, response.status_code)
+                if response.status_code not in retry_statuses or attempt >= retries:
+                    break
+                response.close()
+
+            metrics.record_retry(upstream)
+            time.sleep(_backoff(attempt))
+            attempt += 1
+
+        try:
+            yield response
+        finally:
+            response.close()
+
+
+def request(upstream: str, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+    """เหมือน stream แต่อ่าน body ครบแล้ว (response เล็ก เช่น JSON)"""
+    with stream(upstream, method, url, retries=retries, **kwargs) as response:
+        response.content  # noqa: B018  อ่าน body ก่อนคืน connection
+        return response
+
+
+# ==================== ASYNC ====================
+
+_async_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_async_slots: Dict[tuple, asyncio.Semaphore] = {}
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """aiohttp session ผูกกับ event loop → 1 ตัวต่อ loop (web app มี loop เดียว)"""
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_MAXSIZE * 4,
+            limit_per_host=settings.HTTP_POOL_MAXSIZE,
+            ttl_dns_cache=300,
+        )
+        session = _async_sessions[loop] = aiohttp.ClientSession(connector=connector)
+    return session
+
+
+def _async_slot(host: str) -> asyncio.Semaphore:
+    key = (asyncio.get_running_loop(), host)
+    slot = _async_slots.get(key)
+    if slot is None:
+        slot = _async_slots[key] = asyncio.Semaphore(settings.HTTP_MAX_CONCURRENCY_PER_HOST)
+    return slot
+
+
+@asynccontextmanager
+async def async_stream(upstream: str, method: str, url: str, retries: Optional[int] = None, **kwargs):
+    """เหมือน stream แบบ async: อ่าน body เป็นชิ้นด้วย response.content.iter_chunked(CHUNK_SIZE)"""
+    retries = settings.HTTP_MAX_RETRIES if retries is None else retries
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    retry_statuses = _retry_statuses(method)
+    timeout = kwargs.pop("timeout", None)
+    if isinstance(timeout, (int, float)):
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+    async with _async_slot(_host(url)):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await get_async_session().request(method, url, **kwargs)
+            except asyncio.TimeoutError:
+                # ServerTimeoutError เป็น ClientConnectionError ด้วย → ดักก่อน (timeout ไม่ retry)
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, None)
+                raise
+            except aiohttp.ClientConnectionError as e:
+                # ClientConnectorError = ต่อไม่ติด, อื่น ๆ (ServerDisconnectedError) = หลุดกลางคัน
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, None)
+                if attempt >= retries or not (idempotent or isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+            except aiohttp.ClientError:
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, None)
+                raise
+            else:
+                metrics.record(upstream, (time.perf_counter() - started) * 1000, response.status)
+                if response.status not in retry_statuses or attempt >= retries:
+                    break
+                response.release()
+
+            metrics.record_retry(upstream)
+            await asyncio.sleep(_backoff(attempt))
+            attempt += 1
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+
+async def close_async_sessions() -> None:
+    """ปิด aiohttp session ของ loop นี้ (shutdown ของ web app)"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "upstreams": metrics.snapshot(),
+        "max_concurrency_per_host": settings.HTTP_MAX_CONCURRENCY_PER_HOST,
+        "pool_maxsize": settings.HTTP_POOL_MAXSIZE,
+    }
@@ -0,0 +1,102 @@
+# app/core/principal.py
+"""
+Principal cache - ข้อมูลผู้ใช้ที่ใช้ตรวจสิทธิ์ (cache ตาม user_id)
+
+ทุก request ที่ login ต้องรู้ role / is_active / store_id ของผู้ใช้
+→ เก็บใน cache (app.core.cache) แทนการ query users + roles ทุกครั้ง
+
+- get_principal: อ่านจาก cache (โหลดจาก DB เมื่อไม่มี)
+- invalidate_principal: เรียกเมื่อ role / สถานะ / ร้านค้าของผู้ใช้เปลี่ยน
+  (ลบหลัง commit สำเร็จ)
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.cache import cached, invalidate_on_commit
+from app.models.store import Store
+from app.models.user import User
+
+PRINCIPAL_TTL = 60
+
+
+def principal_key(user_id) -> str:
+    return f"auth:principal:{user_id}"
+
+
+def _load_principal(db: Session, user_id: str) -> Optional[Dict[str, Any]]:
+    user = (
+        db.query(User)
+        .options(joinedload(User.role))
+        .filter(User.user_id == user_id)
+        .first()
+    )
+    if not user:
+        return None
+
+    store_id = db.query(Store.store_id).filter(Store.user_id == user.user_id).scalar()
+    return {
+        "user_id": str(user.user_id),
+        "username": user.username,
+        "email": user.email,
+        "role_id": user.role_id,
+        "role_name": user.role.role_name if user.role else None,
+        "is_active": bool(user.is_active),
+        "store_id": str(store_id) if store_id else None,
+    }
+
+
+class Principal:
+    """
+    ผู้ใช้ที่ login อยู่ (ใช้แทน User ใน dependency ของ auth)
+
+    field ที่ใช้ตรวจสิทธิ์อ่านจาก cache ได้ทันที:
+        user_id, username, email, role (role_id / role_name), is_active, store_id
+    field อื่นของ User (เช่น first_name, profile_picture) โหลด User จาก DB
+    ครั้งแรกที่ถูกอ่าน แล้วใช้ object เดิมตลอด request
+    """
+
+    def __init__(self, data: Dict[str, Any], db: Session):
+        self._db = db
+        self._user: Optional[User] = None
+        self.user_id = UUID(data["user_id"])
+        self.username = data["username"]
+        self.email = data["email"]
+        self.role_id = data["role_id"]
+        self.role = SimpleNamespace(role_id=data["role_id"], role_name=data["role_name"])
+        self.is_active = data["is_active"]
+        self.store_id = UUID(data["store_id"]) if data["store_id"] else None
+
+    @property
+    def user(self) -> User:
+        """User ORM object (query ครั้งแรกที่เรียก)"""
+        if self._user is None:
+            self._user = self._db.get(User, self.user_id)
+        return self._user
+
+    def __getattr__(self, name: str):
+        # ถูกเรียกเฉพาะ attribute ที่ไม่มีใน principal
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __repr__(self) -> str:
+        return f"<Principal {self.username} ({self.role.role_name})>"
+
+
+def get_principal(db: Session, user_id: str) -> Optional[Principal]:
+    """user_id จาก token → Principal (None ถ้าไม่พบผู้ใช้ / user_id ไม่ใช่ UUID)"""
+    try:
+        user_id = str(UUID(str(user_id)))
+    except ValueError:
+        return None
+    data = cached(principal_key(user_id), lambda: _load_principal(db, user_id), PRINCIPAL_TTL)
+    return Principal(data, db) if data else None
+
+
+def invalidate_principal(db: Session, user_id) -> None:
+    """role / is_active / ร้านค้าของผู้ใช้เปลี่ยน → ลบ cache หลัง commit"""
+    if user_id:
+        invalidate_on_commit(db, keys=[principal_key(user_id)])
@@ -0,0 +1,25 @@
+# app/core/redis_client.py
+"""
+Redis client กลางของแอป (ใช้ REDIS_URL เดียวกับ Celery)
+
+สร้างครั้งเดียวตอนเรียกใช้ครั้งแรก และใช้ connection pool ร่วมกันทั้ง process
+"""
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+            health_check_interval=30,
+        )
+    return _client
@@ -1,14 +1,80 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
+
+
+def _create_engine(name: str, pool_size: int, max_overflow: int, statement_timeout_ms: int):
+    """
+    engine แยก pool ตามงาน (api / worker / admin)
+    - statement_timeout ตั้งที่ระดับ connection กัน query ค้างถือ connection ไว้นาน
+    - pool ยังไม่เปิด connection จนกว่าจะถูกใช้ → process ที่ไม่ได้ใช้ engine ไหนก็ไม่เสีย connection
+    """
+    engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            "options": f"-c statement_timeout={statement_timeout_ms}",
+            "application_name": f"closetx-{name}",
+        },
+    )
+    return instrument_engine(engine, name)
+
 
 try:
-    engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True,)
+    # API (FastAPI routes)
+    engine = _create_engine(
+        "api",
+        settings.DB_POOL_SIZE,
+        settings.DB_MAX_OVERFLOW,
+        settings.DB_STATEMENT_TIMEOUT_MS,
+    )
+    # Celery tasks / scheduler
+    worker_engine = _create_engine(
+        "worker",
+        settings.DB_WORKER_POOL_SIZE,
+        settings.DB_WORKER_MAX_OVERFLOW,
+        settings.DB_WORKER_STATEMENT_TIMEOUT_MS,
+    )
+    # Admin dashboard (aggregate query หนัก)
+    admin_engine = _create_engine(
+        "admin",
+        settings.DB_ADMIN_POOL_SIZE,
+        settings.DB_ADMIN_MAX_OVERFLOW,
+        settings.DB_ADMIN_STATEMENT_TIMEOUT_MS,
+    )
+    # API async (asyncpg) — route ที่เป็น async def ใช้ get_async_db ไม่ block event loop
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            "server_settings": {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+                "application_name": "closetx-api-async",
+            },
+        },
+    )
+    instrument_engine(async_engine.sync_engine, "api-async")
     print(f"[Database] Connected to {settings.DATABASE_URL}")
 except Exception as e:
     print(f"[Database] Connection failed: {e}")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+WorkerSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+AdminSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=admin_engine)
+# expire_on_commit=False: AsyncSession lazy load ไม่ได้ → อ่าน attribute หลัง commit ได้โดยไม่ query ใหม่
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -17,3 +83,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_admin_db():
+    db = AdminSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,148 @@
+# app/db/pool_metrics.py
+"""
+ตัวเก็บสถิติของ connection pool + query (ใช้ปรับขนาด pool จากข้อมูลจริง)
+
+- InstrumentedQueuePool / InstrumentedAsyncQueuePool: จับเวลาที่รอ connection ว่าง (checkout wait)
+- cursor events: จับเวลาแต่ละ query แล้ว log query ที่ช้า
+- db_stats(): สรุปของทุก engine (ใช้ใน /internal/db-stats)
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+SLOW_QUERY_SAMPLES = 20
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_ms_total = 0.0
+        self.checkout_wait_ms_max = 0.0
+        self.slow_checkouts = 0
+        self.checkout_timeouts = 0
+        self.queries = 0
+        self.query_ms_total = 0.0
+        self.slow_queries = 0
+        self.recent_slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)
+
+    def record_checkout(self, wait_ms: float) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.checkout_wait_ms_total += wait_ms
+            self.checkout_wait_ms_max = max(self.checkout_wait_ms_max, wait_ms)
+            if wait_ms >= settings.DB_SLOW_CHECKOUT_MS:
+                self.slow_checkouts += 1
+        if wait_ms >= settings.DB_SLOW_CHECKOUT_MS:
+            print(f"⚠️ [DB:{self.name}] Waited {wait_ms:.0f}ms for a pooled connection")
+
+    def record_timeout(self) -> None:
+        with self.lock:
+            self.checkout_timeouts += 1
+        print(f"❌ [DB:{self.name}] Pool checkout timed out (pool exhausted)")
+
+    def record_query(self, statement: str, elapsed_ms: float) -> None:
+        slow = elapsed_ms >= settings.DB_SLOW_QUERY_MS
+        with self.lock:
+            self.queries += 1
+            self.query_ms_total += elapsed_ms
+            if slow:
+                self.slow_queries += 1
+                self.recent_slow_queries.append({
+                    "ms": round(elapsed_ms, 1),
+                    "statement": " ".join(statement.split())[:500],
+                    "at": time.time(),
+                })
+        if slow:
+            print(f"🐢 [DB:{self.name}] Slow query {elapsed_ms:.0f}ms: {' '.join(statement.split())[:200]}")
+
+
+class _InstrumentedPoolMixin:
+    """จับเวลารอ connection (รวมเวลาเปิด connection ใหม่)"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout((time.perf_counter() - started) * 1000)
+        return conn
+
+    def recreate(self):
+        # pool ใหม่ (เช่นหลัง dispose) ใช้ตัวเก็บสถิติเดิม
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_engines: Dict[str, Engine] = {}
+
+
+def instrument_engine(engine: Engine, name: str) -> Engine:
+    """ผูก metrics กับ engine (pool ต้องเป็น Instrumented*Pool, async engine ส่ง .sync_engine)"""
+    metrics = PoolMetrics(name)
+    engine.pool.metrics = metrics
+    _engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        metrics.record_query(statement, (time.perf_counter() - started) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    return engine
+
+
+def db_stats() -> Dict[str, Any]:
+    result = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        m: PoolMetrics = pool.metrics
+        with m.lock:
+            result[name] = {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": m.checkouts,
+                "checkout_wait_ms_avg": round(m.checkout_wait_ms_total / m.checkouts, 2) if m.checkouts else 0,
+                "checkout_wait_ms_max": round(m.checkout_wait_ms_max, 2),
+                "slow_checkouts": m.slow_checkouts,
+                "checkout_timeouts": m.checkout_timeouts,
+                "queries": m.queries,
+                "query_ms_avg": round(m.query_ms_total / m.queries, 2) if m.queries else 0,
+                "slow_queries": m.slow_queries,
+                "recent_slow_queries": list(m.recent_slow_queries),
+            }
+    return result
@@ -1,13 +1,27 @@
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
+from sqlalchemy import text
 import stripe
 from app.api import cart, checkout, home, order, product, stripe_webhook
 from app.db.seed_categories import seed_categories
 import app.models 
+from app.core.cache import cache
+from app.core import http_client
+from app.core.config import settings
+from app.utils.background_remover import background_remover
+from fastapi.concurrency import run_in_threadpool
+from app.realtime.socket_manager import manager
 from app.db.database import Base, engine, SessionLocal
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import admin_category_router, admin_dashboard_router, admin_store_router, admin_user_router, auth_router, category_router, chat_router, chat_ws_router, checkout_router, forgot_password_router, notification_router, order_return_router, order_router, preview_image_router, product_router, product_variant_router, profile_router, report_router, review_router, search_router, seller_notification_ws, seller_router, shipping_address_router, stock_reservation_router, store_dashboard_router, store_public_router, store_router, stripe_webhook_router, user_notification_ws, vton_meta_router, vton_router, wishlist_router, ws_router
+from app.routes import admin_category_router, admin_dashboard_router, admin_store_router, admin_user_router, auth_router, category_router, chat_router, chat_ws_router, checkout_router, forgot_password_router, internal_router, notification_router, order_return_router, order_router, preview_image_router, product_router, product_variant_router, profile_router, report_router, review_router, search_router, seller_notification_ws, seller_router, shipping_address_router, stock_reservation_router, store_dashboard_router, store_public_router, store_router, stripe_webhook_router, user_notification_ws, vton_meta_router, vton_router, wishlist_router, ws_router
 from app.db.seed import seed_payment_methods, seed_roles
+from app.models.product_listing import ProductListing
+from app.models.daily_store_sales import DailyStoreSales
+from app.models.product_search import ProductSearch
+from app.repositories.product_listing_repository import rebuild_product_listing
+from app.repositories.daily_sales_repository import rebuild_daily_sales
+from app.repositories.stock_reservation_repository import reconcile_reserved_qty
+from app.repositories.search_index_repository import rebuild_search_index
 
 from app.utils.exception_handler import validation_exception_handler
 from app.utils.scheduler import start_scheduler 
@@ -31,8 +45,109 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup():
+    # pg_trgm ต้องมีก่อนสร้าง GIN trigram index ของ product_search
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        print(f"[Database] Could not enable pg_trgm: {e}")
+
     Base.metadata.create_all(bind=engine)
     print("[Database] Tables created.")
+
+    # create_all ไม่เพิ่ม column ให้ตารางที่มีอยู่แล้ว
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE product_variants "
+                "ADD COLUMN IF NOT EXISTS reserved_qty INTEGER NOT NULL DEFAULT 0"
+            ))
+    except Exception as e:
+        print(f"[Database] Could not add product_variants.reserved_qty: {e}")
+    # คิว Stripe webhook (แถวเดิมถือว่าประมวลผลแล้ว → status default PROCESSED)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE stripe_events "
+                "ADD COLUMN IF NOT EXISTS payload JSONB, "
+                "ADD COLUMN IF NOT EXISTS ordering_key VARCHAR(255), "
+                "ADD COLUMN IF NOT EXISTS event_created_at TIMESTAMPTZ, "
+                "ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'PROCESSED', "
+                "ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0, "
+                "ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ, "
+                "ADD COLUMN IF NOT EXISTS locked_until TIMESTAMPTZ, "
+                "ADD COLUMN IF NOT EXISTS last_error TEXT, "
+                "ADD COLUMN IF NOT EXISTS processed_at TIMESTAMPTZ"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_stripe_events_queue ON stripe_events (status, next_attempt_at) "
+                "WHERE status IN ('PENDING', 'PROCESSING', 'FAILED')"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_stripe_events_ordering "
+                "ON stripe_events (ordering_key, event_created_at, event_id)"
+            ))
+    except Exception as e:
+        print(f"[Database] Could not add stripe_events queue columns: {e}")
+    # settlement ของ payout (PAYOUT_MODE=batched)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE store_payouts ADD COLUMN IF NOT EXISTS settlement_id UUID "
+                "REFERENCES store_settlements (settlement_id)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_store_payouts_settlement_id ON store_payouts (settlement_id)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_store_payouts_accrued ON store_payouts (store_id, created_at) "
+                "WHERE status = 'accrued'"
+            ))
+    except Exception as e:
+        print(f"[Database] Could not add store_payouts.settlement_id: {e}")
+    # คิวงานลองเสื้อ (VTON) ใน celery worker
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE vton_sessions "
+                "ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'COMPLETED', "
+                "ADD COLUMN IF NOT EXISTS job_params JSONB, "
+                "ADD COLUMN IF NOT EXISTS error_message TEXT, "
+                "ADD COLUMN IF NOT EXISTS started_at TIMESTAMP, "
+                "ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_vton_sessions_active ON vton_sessions (user_id, status) "
+                "WHERE status IN ('PENDING', 'PROCESSING')"
+            ))
+            # ไฟล์ผลลัพธ์ใช้ร่วมกับ vton_result_cache → ตรวจว่ายังมี session อ้างถึงก่อนลบไฟล์
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_vton_sessions_result_image_url ON vton_sessions (result_image_url)"
+            ))
+    except Exception as e:
+        print(f"[Database] Could not add vton_sessions job columns: {e}")
+    # รูปย่อของรูปสินค้า (สร้างใน worker) + ใน read model ของหน้า listing
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE product_images ADD COLUMN IF NOT EXISTS derivatives JSONB"))
+            conn.execute(text("ALTER TABLE product_listing ADD COLUMN IF NOT EXISTS main_image_derivatives JSONB"))
+    except Exception as e:
+        print(f"[Database] Could not add image derivative columns: {e}")
+    # rollup ยอดขาย: ยอดตามวันที่ชำระเงิน (กราฟแอดมิน) → เพิ่ม column ครั้งแรกต้อง rebuild
+    rebuild_sales_rollup = False
+    try:
+        with engine.begin() as conn:
+            rebuild_sales_rollup = conn.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'daily_store_sales' AND column_name = 'paid_revenue'"
+            )).first() is None
+            conn.execute(text(
+                "ALTER TABLE daily_store_sales "
+                "ADD COLUMN IF NOT EXISTS paid_revenue DOUBLE PRECISION NOT NULL DEFAULT 0, "
+                "ADD COLUMN IF NOT EXISTS paid_order_count INTEGER NOT NULL DEFAULT 0"
+            ))
+    except Exception as e:
+        print(f"[Database] Could not add daily_store_sales paid columns: {e}")
     # seed roles ถ้าต้องการ
     db = SessionLocal()
     try:
@@ -40,7 +155,25 @@ def on_startup():
         seed_roles(db)
         seed_categories(db)
         seed_payment_methods(db)
+
+        # backfill read model ของหน้า listing ครั้งแรก (หลังจากนั้นอัปเดตแบบ incremental)
+        if not db.query(ProductListing.product_id).first():
+            rebuild_product_listing(db)
+
+        # backfill search index ครั้งแรก (หลังจากนั้น sync จาก product services)
+        if not db.query(ProductSearch.product_id).first():
+            rebuild_search_index(db)
+
+        # backfill rollup ยอดขายรายวันครั้งแรก (ซ่อม/คำนวณใหม่: python -m app.scripts.backfill_daily_sales)
+        if rebuild_sales_rollup or not db.query(DailyStoreSales.store_id).first():
+            rebuild_daily_sales(db)
         
+        # reserved_qty ตรงกับ reservation ที่ค้างอยู่ (เช่นหลังเพิ่ม column ครั้งแรก)
+        reconcile_reserved_qty(db)
+
+        # process อื่นแก้ข้อมูล → ลบ local cache ของ process นี้ด้วย
+        cache.start_invalidation_listener()
+
         # start_scheduler()
 
         # charge = stripe.Charge.create(
@@ -55,6 +188,30 @@ def on_startup():
         db.close()
 
 
+@app.on_event("startup")
+async def start_realtime():
+    # รับ WebSocket broadcast จาก worker / pod อื่น (ต้องรันใน event loop ของ app)
+    await manager.start()
+
+
+@app.on_event("startup")
+async def start_background_remover():
+    # โหลด rembg model ใน process pool ล่วงหน้า (REMBG_PRELOAD=true)
+    if not settings.REMBG_PRELOAD:
+        return
+    try:
+        await run_in_threadpool(background_remover.start)
+    except Exception as e:
+        print(f"⚠️ [BackgroundRemover] Could not preload model: {e}")
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    # ปิด connection pool ของ aiohttp (HTTP client กลางฝั่ง async)
+    await http_client.close_async_sessions()
+    background_remover.shutdown()
+
+
 app.include_router(auth_router.router)
 app.include_router(profile_router.router)
 # app.include_router(store_application_router.router)
@@ -92,6 +249,7 @@ app.include_router(store_public_router.router)
 app.include_router(forgot_password_router.router) 
 app.include_router(search_router.router) 
 app.include_router(wishlist_router.router) 
+app.include_router(internal_router.router)
 # app.include_router(otp_router.router) 
 
 
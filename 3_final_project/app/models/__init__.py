@@ -33,6 +33,11 @@ from app.models.notification import Notification, NotificationType
 from app.models.category import Category
 from app.models.report import Report
 from app.models.password_reset_token import PasswordResetToken
+from app.models.product_listing import ProductListing
+from app.models.product_search import ProductSearch, SearchTerm
+from app.models.daily_store_sales import DailyStoreSales
+from app.models.store_settlement import StoreSettlement
+from app.models.vton_result_cache import VTONResultCache
 
 from sqlalchemy.orm import configure_mappers
 configure_mappers()
\ No newline at end of file
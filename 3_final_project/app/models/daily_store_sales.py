@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Date, Float, Integer, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.database import Base
+from app.utils.now_utc import now_utc
+
+
+class DailyStoreSales(Base):
+    """
+    Rollup ยอดขายรายวันของแต่ละร้าน (วันตามเวลาไทย)
+
+    1 แถว = 1 ร้าน x 1 วัน
+    - revenue / order_count / units / customers: ออเดอร์ที่สร้างวันนั้นและอยู่ในสถานะที่นับเป็นยอดขาย
+    - returns: คำขอคืนสินค้าที่สร้างวันนั้น
+    - paid_revenue / paid_order_count: ออเดอร์ที่ชำระเงิน (paid_at) วันนั้น ทุกสถานะยกเว้น UNPAID / CANCELLED
+      (รวม RETURNING / RETURNED — นิยามเดียวกับกราฟยอดขายของแอดมินเดิม)
+    dashboard อ่านจากตารางนี้ (O(จำนวนวัน)) แทนการ sum orders ทั้งหมด
+    อัปเดตแบบ incremental ผ่าน app.repositories.daily_sales_repository
+
+    ไม่ผูก FK กับ stores → ยอดขายในอดีตของร้านที่ถูกลบยังอยู่ในยอดรวมของแพลตฟอร์ม
+    """
+    __tablename__ = "daily_store_sales"
+
+    store_id = Column(UUID(as_uuid=True), primary_key=True)
+    sale_date = Column(Date, primary_key=True)
+
+    revenue = Column(Float, nullable=False, default=0.0)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    customers = Column(Integer, nullable=False, default=0)
+    returns = Column(Integer, nullable=False, default=0)
+    paid_revenue = Column(Float, nullable=False, default=0.0)
+    paid_order_count = Column(Integer, nullable=False, default=0)
+
+    refreshed_at = Column(DateTime(timezone=True), default=now_utc, onupdate=now_utc)
+
+    __table_args__ = (
+        # dashboard แอดมิน: ยอดรวมทุกร้านตามช่วงวัน
+        Index("ix_daily_store_sales_date", sale_date),
+    )
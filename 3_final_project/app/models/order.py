@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Float, String, ForeignKey, DateTime
+from sqlalchemy import Boolean, Column, Float, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.database import Base
@@ -20,6 +20,10 @@ class OrderStatus(str, PyEnum):
     FAILED = "FAILED"
 
 
+# สถานะที่นับเป็นยอดขาย (ชำระแล้ว ยังไม่ยกเลิก / คืนสินค้า)
+SALES_STATUSES = ['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']
+
+
 class Order(Base):
     __tablename__ = 'orders'
 
@@ -46,6 +50,13 @@ class Order(Base):
     delivered_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
+    __table_args__ = (
+        # keyset pagination ของรายการคำสั่งซื้อ user (created_at, order_id)
+        Index("ix_orders_user_created", user_id, created_at.desc(), order_id.desc()),
+        # inbox ผู้ขาย (keyset) + rollup ยอดขายของร้าน
+        Index("ix_orders_store_created", store_id, created_at.desc(), order_id.desc()),
+    )
+
     store = relationship("Store", back_populates="orders")
     user = relationship('User', back_populates='orders')
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
@@ -1,9 +1,9 @@
 import enum
 from app.db.database import Base
-from sqlalchemy import Column, Float, Integer, String, TEXT, ForeignKey, Boolean, Date, DateTime
+from sqlalchemy import Column, Float, Integer, String, TEXT, ForeignKey, Boolean, Date, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.utils.now_utc import now_utc
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 import uuid
 from sqlalchemy import Enum
 
@@ -71,7 +71,8 @@ class ProductVariant(Base):
     product_id = Column(
         UUID(as_uuid=True),
         ForeignKey("products.product_id", ondelete="CASCADE"),
-        nullable=False
+        nullable=False,
+        index=True,  # ใช้ใน LATERAL / GROUP BY ของ product card query
     )
 
     color = Column(String(50), nullable=True)   # เช่น "ดำ", "ขาว"
@@ -80,6 +81,9 @@ class ProductVariant(Base):
     sku = Column(String(100), nullable=False)
     price = Column(Float, nullable=False)
     stock = Column(Integer, default=0)
+    # จำนวนที่ถูกจองอยู่ (รวม quantity ของ stock_reservations ที่ยังไม่ release)
+    # available = stock - reserved_qty ดูแลผ่าน stock_reservation_repository
+    reserved_qty = Column(Integer, nullable=False, default=0, server_default="0")
     weight_grams = Column(Integer, nullable=True, default=500)
     is_active = Column(Boolean, default=True)
     # ควรจะมี variant name หรือ variant option เพื่อบอกว่ามันคือ ไซส์หรือสีแทนที่จะเป็น color กับ size นะ
@@ -130,7 +134,8 @@ class ProductImage(Base):
     product_id = Column(
         UUID(as_uuid=True), 
         ForeignKey("products.product_id", ondelete="CASCADE"), # เพิ่มตรงนี้
-        nullable=True
+        nullable=True,
+        index=True,
     )
 
     # ✅ เพิ่ม ondelete="CASCADE": ลบ variant → รูปของ variant ถูกลบตามใน DB ด้วย
@@ -147,6 +152,8 @@ class ProductImage(Base):
 
     uploaded_at = Column(DateTime, default=now_utc)
     is_main = Column(Boolean, default=False)          # ใช้ระบุว่าเป็นรูปหลักไหม
+    # รูปย่อที่ worker สร้าง {"thumb" | "card" | "detail": {"width", "height", "webp": url, "jpeg": url}}
+    derivatives = Column(JSONB, nullable=True)
 
     product = relationship("Product", back_populates="images")
     variant = relationship("ProductVariant", back_populates="images")
@@ -188,6 +195,20 @@ class UserTryOnImage(Base):
     sessions = relationship("VTONSession", back_populates="user_image")
 
 
+class VTONSessionStatus:
+    """
+    สถานะของงานลองเสื้อ (สร้างภาพใน celery worker)
+    PENDING → PROCESSING → COMPLETED
+                        ↘ FAILED
+    """
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+    ACTIVE = (PENDING, PROCESSING)
+
+
 class VTONSession(Base):
     __tablename__ = "vton_sessions"
 
@@ -203,10 +224,26 @@ class VTONSession(Base):
     garment_id = Column(UUID(as_uuid=True), ForeignKey("garment_images.garment_id", ondelete="SET NULL"), nullable=True)
     background_id = Column(UUID(as_uuid=True), ForeignKey("vton_backgrounds.background_id", ondelete="SET NULL"), nullable=True)
 
-    result_image_url = Column(String(255), nullable=True)
+    result_image_url = Column(String(255), nullable=True, index=True)  # ไฟล์อาจใช้ร่วมกับ vton_result_cache
     model_used = Column(String(100), nullable=True)
     generated_at = Column(DateTime, default=now_utc)
 
+    # งานสร้างภาพ (worker): session เก่าก่อนมีคิว = COMPLETED
+    status = Column(String(20), nullable=False, default=VTONSessionStatus.COMPLETED, server_default=VTONSessionStatus.COMPLETED)
+    job_params = Column(JSONB, nullable=True)        # input ของ IDM API (รูปคน / รูปเสื้อ / category / steps / seed)
+    error_message = Column(TEXT, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # นับงานที่ยังไม่เสร็จต่อ user (จำกัดจำนวนงานพร้อมกัน) + sweep งานค้าง
+        Index(
+            "ix_vton_sessions_active",
+            "user_id", "status",
+            postgresql_where=status.in_(VTONSessionStatus.ACTIVE),
+        ),
+    )
+
     # Relationships
     user = relationship("User", back_populates="tryon_sessions")
     product = relationship("Product", back_populates="tryon_sessions")
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Float, Integer, String, ForeignKey, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from app.db.database import Base
+from app.utils.now_utc import now_utc
+
+
+class ProductListing(Base):
+    """
+    Read model สำหรับหน้า listing (home / categories / search)
+
+    1 แถว = 1 สินค้าที่ขายได้ (สินค้าเปิดขาย, ไม่ใช่ draft, ร้านเปิด, มี stock > 0)
+    ข้อมูลถูก denormalize ไว้แล้ว จึงไม่ต้อง join Product/ProductVariant/ProductImage/Store
+    อัปเดตแบบ incremental ผ่าน app.repositories.product_listing_repository
+    """
+    __tablename__ = "product_listing"
+
+    # ลบสินค้า → แถว listing หายตาม
+    product_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("products.product_id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    store_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("stores.store_id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    category_id = Column(UUID(as_uuid=True), nullable=True)
+
+    product_name = Column(String, nullable=False)
+    store_name = Column(String, nullable=True)
+    min_price = Column(Float, nullable=False, default=0.0)
+    total_stock = Column(Integer, nullable=False, default=0)
+    main_image_id = Column(UUID(as_uuid=True), nullable=True)
+    main_image_url = Column(String(255), nullable=True)
+    main_image_derivatives = Column(JSONB, nullable=True)   # ProductImage.derivatives ของรูปหลัก
+    rating = Column(Float, nullable=False, default=0.0)
+
+    created_at = Column(DateTime, nullable=True)
+    refreshed_at = Column(DateTime(timezone=True), default=now_utc, onupdate=now_utc)
+
+    __table_args__ = (
+        # หน้า home / search เรียงตามสินค้าใหม่สุด
+        Index("ix_product_listing_created", created_at.desc(), product_id.desc()),
+        # หน้า categories กรองตามหมวดหมู่
+        Index("ix_product_listing_category_created", category_id, created_at.desc()),
+    )
@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, TEXT, ForeignKey, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+
+from app.db.database import Base
+from app.utils.now_utc import now_utc
+
+
+class ProductSearch(Base):
+    """
+    Search index ของสินค้า (1 แถวต่อสินค้าที่เปิดขาย)
+
+    - search_vector: token ชื่อสินค้า (A) / หมวดหมู่ (B) / ร้าน (C) / คำอธิบาย (D)
+      สร้างจาก app.utils.search_text (รองรับภาษาไทย)
+    - search_text: ข้อความ normalize แล้วสำหรับ pg_trgm (ทนพิมพ์ผิด)
+    - name_term: ชื่อสินค้าที่นับอยู่ใน search_terms (ใช้ตอนเปลี่ยนชื่อ / ลบ)
+    """
+    __tablename__ = "product_search"
+
+    # ลบสินค้า → แถว index หายตาม
+    product_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("products.product_id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    search_vector = Column(TSVECTOR, nullable=False)
+    search_text = Column(TEXT, nullable=False, default="")
+    name_term = Column(String, nullable=True)
+    indexed_at = Column(DateTime(timezone=True), default=now_utc, onupdate=now_utc)
+
+    __table_args__ = (
+        Index("ix_product_search_vector", search_vector, postgresql_using="gin"),
+        Index(
+            "ix_product_search_text_trgm",
+            search_text,
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
+
+
+class SearchTerm(Base):
+    """
+    Index เล็กๆ สำหรับ autocomplete (prefix search)
+    1 แถว = ชื่อสินค้า 1 ชื่อ (normalize แล้ว) + จำนวนสินค้าที่ใช้ชื่อนี้
+    """
+    __tablename__ = "search_terms"
+
+    term = Column(String, primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # LIKE 'prefix%' ใช้ B-tree ได้เมื่อเป็น varchar_pattern_ops
+        Index(
+            "ix_search_terms_prefix",
+            term,
+            postgresql_ops={"term": "varchar_pattern_ops"},
+        ),
+    )
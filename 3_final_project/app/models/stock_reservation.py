@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -27,4 +27,12 @@ class StockReservation(Base):
 
     quantity = Column(Integer, nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)
-    created_at = Column(DateTime(timezone=True), default=now_utc)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), default=now_utc)
+
+    __table_args__ = (
+        # checkout: รวม reservation ที่ยังไม่หมดอายุของ variant
+        Index("ix_stock_reservations_variant_expires", variant_id, expires_at),
+        # sweeper: หา reservation ที่หมดอายุ / ลบตามออเดอร์
+        Index("ix_stock_reservations_expires", expires_at),
+        Index("ix_stock_reservations_order", order_id),
+    )
\ No newline at end of file
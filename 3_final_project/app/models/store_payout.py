@@ -5,7 +5,7 @@
 # =============================================================
 
 import uuid
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, TEXT
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, TEXT, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -42,14 +42,23 @@ class StorePayout(Base):
     platform_fee = Column(Float, nullable=False, default=0.0)  # ค่าธรรมเนียมของเราเอง
     net_amount = Column(Float, nullable=False)  # ยอดโอนจริง (หลังหักค่าธรรมเนียม)
     
+    # รอบโอนรวม (PAYOUT_MODE=batched) — NULL = โอนรายออเดอร์ / ยังไม่ถูกรวมรอบ
+    settlement_id = Column(UUID(as_uuid=True), ForeignKey('store_settlements.settlement_id'), nullable=True, index=True)
+
     # Status
-    status = Column(String, nullable=False, default="pending")  # pending, completed, failed
+    # pending, completed, failed (โอนรายออเดอร์) / accrued → settled (โอนรวมเป็นรอบ)
+    status = Column(String, nullable=False, default="pending")
     error_message = Column(TEXT, nullable=True)  # ข้อความ error (ถ้ามี)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), default=now_utc, nullable=False)
     transferred_at = Column(DateTime(timezone=True), nullable=True)  # เวลาที่โอนสำเร็จ
     
+    __table_args__ = (
+        # job settlement: ยอดค้างโอนของแต่ละร้าน
+        Index("ix_store_payouts_accrued", "store_id", "created_at", postgresql_where=(status == "accrued")),
+    )
+
     # Relationships
     store = relationship("Store", backref="payouts")
     order = relationship("Order", backref="payouts")
@@ -0,0 +1,49 @@
+# =============================================================
+# FILE: app/models/store_settlement.py
+# PURPOSE: รอบโอนเงินรวมให้ร้านค้า (PAYOUT_MODE=batched)
+# =============================================================
+
+import uuid
+from sqlalchemy import Column, String, Float, Integer, DateTime, ForeignKey, TEXT, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.database import Base
+from app.utils.now_utc import now_utc
+
+
+class StoreSettlement(Base):
+    """
+    1 แถว = Stripe Transfer 1 ครั้งให้ 1 ร้าน ที่รวมยอดหลายออเดอร์
+
+    - ออเดอร์ที่เสร็จสิ้นบันทึก StorePayout สถานะ accrued (ยังไม่โอน)
+    - job settle_store_payouts รวม accrued ของแต่ละร้าน → StoreSettlement (processing)
+      → โอนครั้งเดียว (idempotency_key = settlement_id) → completed
+      แล้ว StorePayout ที่อยู่ในรอบเปลี่ยนเป็น settled
+    - โอนไม่สำเร็จ → failed แล้วลองใหม่รอบถัดไปด้วย key เดิม (ไม่โอนซ้ำ)
+    """
+    __tablename__ = 'store_settlements'
+
+    settlement_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    store_id = Column(UUID(as_uuid=True), ForeignKey('stores.store_id'), nullable=False, index=True)
+
+    transfer_id = Column(String, nullable=True, unique=True)  # Stripe Transfer ID
+
+    amount = Column(Float, nullable=False)        # ยอดรวมก่อนหักค่าธรรมเนียม
+    platform_fee = Column(Float, nullable=False)
+    net_amount = Column(Float, nullable=False)    # ยอดโอนจริง
+    payout_count = Column(Integer, nullable=False)  # จำนวน StorePayout ในรอบนี้
+
+    status = Column(String, nullable=False, default="processing")  # processing, completed, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error_message = Column(TEXT, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), default=now_utc, nullable=False)
+    transferred_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # job หา settlement ที่ยังโอนไม่สำเร็จ
+        Index(
+            "ix_store_settlements_unfinished",
+            "created_at",
+            postgresql_where=status.in_(["processing", "failed"]),
+        ),
+    )
@@ -1,11 +1,54 @@
 # app/models/stripe_event.py
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.db.database import Base  # ถ้าของคุณ Base อยู่ที่อื่น ให้ปรับ import
 
+
+class StripeEventStatus:
+    """
+    สถานะของ event ในคิว webhook
+    PENDING → PROCESSING → PROCESSED
+                        ↘ FAILED (รอ retry) → ... → DEAD (ครบจำนวนครั้ง, replay ด้วย CLI)
+    """
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    PROCESSED = "PROCESSED"
+    FAILED = "FAILED"
+    DEAD = "DEAD"
+
+
 class StripeEvent(Base):
     __tablename__ = "stripe_events"
 
     event_id = Column(String(255), primary_key=True, index=True)  # Stripe event.id
     event_type = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # ---- คิว webhook (endpoint บันทึก event ดิบ → worker ประมวลผลทีหลัง) ----
+    payload = Column(JSONB, nullable=True)
+    # event ของ payment เดียวกันประมวลผลตามลำดับทีละตัว (ไม่มี payment → ใช้ event_id)
+    ordering_key = Column(String(255), nullable=True)
+    event_created_at = Column(DateTime(timezone=True), nullable=True)  # Stripe event.created
+    # แถวเก่า (ก่อนมีคิว) ถูกประมวลผลไปแล้วตอนรับ webhook → default PROCESSED
+    status = Column(String(20), nullable=False, server_default=StripeEventStatus.PROCESSED)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # worker หา event ที่ถึงเวลาประมวลผล
+        Index(
+            "ix_stripe_events_queue",
+            "status", "next_attempt_at",
+            postgresql_where=status.in_([
+                StripeEventStatus.PENDING,
+                StripeEventStatus.PROCESSING,
+                StripeEventStatus.FAILED,
+            ]),
+        ),
+        # ตรวจว่ามี event ก่อนหน้าของ payment เดียวกันค้างอยู่หรือไม่
+        Index("ix_stripe_events_ordering", "ordering_key", "event_created_at", "event_id"),
+    )
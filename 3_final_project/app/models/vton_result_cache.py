@@ -0,0 +1,28 @@
+# =============================================================
+# FILE: app/models/vton_result_cache.py
+# PURPOSE: cache ผลลัพธ์ลองเสื้อ (IDM VTON) ตาม hash ของ input
+# =============================================================
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+from app.db.database import Base
+from app.utils.now_utc import now_utc
+
+
+class VTONResultCache(Base):
+    """
+    1 แถว = ภาพผลลัพธ์ของ input ชุดหนึ่ง (รูปคน + รูปเสื้อ + คำอธิบาย + category + steps + seed)
+
+    - cache_key = sha256 ของ input → ลองชุดเดิมซ้ำได้ภาพเดิมทันที ไม่เรียก IDM API
+    - ไฟล์ใช้ร่วมกับ VTONSession ที่ได้ผลจาก cache (result_image_url เดียวกัน)
+    - job evict_vton_cache ลบแถวที่ไม่ได้ใช้นานที่สุดเมื่อเกิน VTON_CACHE_MAX_BYTES / MAX_ENTRIES
+      (ลบไฟล์เฉพาะที่ไม่มี session อ้างถึงแล้ว)
+    """
+    __tablename__ = 'vton_result_cache'
+
+    cache_key = Column(String(64), primary_key=True)
+    result_image_url = Column(String(255), nullable=False, index=True)
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), default=now_utc, nullable=False)
+    last_used_at = Column(DateTime(timezone=True), default=now_utc, nullable=False, index=True)
@@ -0,0 +1,158 @@
+# app/realtime/backplane.py
+"""
+Backplane ของ ConnectionManager — ส่ง broadcast ข้าม worker / pod + presence ทั้ง cluster
+
+    manager.broadcast(room) → ส่งให้ socket ใน process นี้ → publish ครั้งเดียว
+    process อื่น (listener) รับ message → ส่งให้ socket ของตัวเองใน room นั้น
+
+- RedisBackplane (default): pub/sub ช่องเดียว + presence ใน sorted set ต่อ room
+    * member = <worker_id>:<connection_id>, score = เวลาหมดอายุ (ต่ออายุเป็นรอบ)
+    * worker ตาย → connection ของ worker นั้นหมดอายุเองใน PRESENCE_TTL
+- InMemoryBackplane: process เดียว (dev / test) ไม่ต้องมี Redis
+
+method ทั้งหมดเป็น sync (Redis client แบบ sync) → ฝั่ง async เรียกผ่าน threadpool
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from app.core.redis_client import get_redis
+
+CHANNEL = "closetx:ws:broadcast"
+PRESENCE_PREFIX = "closetx:ws:presence:"
+PRESENCE_TTL = 90          # วินาที
+PRESENCE_REFRESH = 30      # ต่ออายุ presence ของ connection ใน process นี้ทุกกี่วินาที
+RETRY_SECONDS = 5
+
+# (room, text) → ส่งให้ socket ใน process นี้ (ถูกเรียกจาก thread ของ listener)
+Deliver = Callable[[str, str], None]
+
+
+class InMemoryBackplane:
+    """process เดียว: ไม่มี process อื่นให้ส่งต่อ presence = connection ใน process นี้"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._presence: Dict[str, Set[str]] = {}
+
+    def start(self, deliver: Deliver) -> None:
+        pass
+
+    def publish(self, room: str, text: str) -> None:
+        pass
+
+    def join(self, room: str, connection_id: str) -> None:
+        with self._lock:
+            self._presence.setdefault(room, set()).add(connection_id)
+
+    def leave(self, room: str, connection_id: str) -> None:
+        with self._lock:
+            members = self._presence.get(room)
+            if members is not None:
+                members.discard(connection_id)
+                if not members:
+                    del self._presence[room]
+
+    def room_count(self, room: str) -> int:
+        with self._lock:
+            return len(self._presence.get(room, ()))
+
+
+class RedisBackplane:
+    name = "redis"
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        # connection ของ process นี้ที่ต้องต่ออายุ presence
+        self._local: Set[Tuple[str, str]] = set()
+        self._listener: Optional[threading.Thread] = None
+
+    # ---------- fan-out ----------
+
+    def start(self, deliver: Deliver) -> None:
+        if self._listener and self._listener.is_alive():
+            return
+        self._listener = threading.Thread(
+            target=self._listen, args=(deliver,), name="ws-backplane", daemon=True
+        )
+        self._listener.start()
+
+    def publish(self, room: str, text: str) -> None:
+        get_redis().publish(CHANNEL, json.dumps({"origin": self.worker_id, "room": room, "data": text}))
+
+    def _listen(self, deliver: Deliver) -> None:
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                print(f"✅ [WS Backplane] Listening as {self.worker_id}")
+                next_refresh = 0.0
+                while True:
+                    if time.monotonic() >= next_refresh:
+                        self._refresh_presence()
+                        next_refresh = time.monotonic() + PRESENCE_REFRESH
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message:
+                        continue
+                    envelope = json.loads(message["data"])
+                    # process นี้ส่งให้ socket ของตัวเองไปแล้วตอน broadcast
+                    if envelope.get("origin") == self.worker_id:
+                        continue
+                    deliver(envelope["room"], envelope["data"])
+            except Exception as e:
+                print(f"⚠️ [WS Backplane] Listener error: {e}")
+                time.sleep(RETRY_SECONDS)
+
+    # ---------- presence ----------
+
+    def _member(self, connection_id: str) -> str:
+        return f"{self.worker_id}:{connection_id}"
+
+    def join(self, room: str, connection_id: str) -> None:
+        with self._lock:
+            self._local.add((room, connection_id))
+        key = PRESENCE_PREFIX + room
+        pipe = get_redis().pipeline()
+        pipe.zadd(key, {self._member(connection_id): time.time() + PRESENCE_TTL})
+        pipe.expire(key, PRESENCE_TTL)
+        pipe.execute()
+
+    def leave(self, room: str, connection_id: str) -> None:
+        with self._lock:
+            self._local.discard((room, connection_id))
+        get_redis().zrem(PRESENCE_PREFIX + room, self._member(connection_id))
+
+    def room_count(self, room: str) -> int:
+        """จำนวน connection ใน room ทั้ง cluster (ตัดตัวที่หมดอายุทิ้งก่อนนับ)"""
+        key = PRESENCE_PREFIX + room
+        pipe = get_redis().pipeline()
+        pipe.zremrangebyscore(key, "-inf", time.time())
+        pipe.zcard(key)
+        return int(pipe.execute()[1])
+
+    def _refresh_presence(self) -> None:
+        with self._lock:
+            local = list(self._local)
+        if not local:
+            return
+        expires_at = time.time() + PRESENCE_TTL
+        pipe = get_redis().pipeline(transaction=False)
+        for room, connection_id in local:
+            pipe.zadd(PRESENCE_PREFIX + room, {self._member(connection_id): expires_at})
+            pipe.expire(PRESENCE_PREFIX + room, PRESENCE_TTL)
+        pipe.execute()
+
+
+def create_backplane(name: str):
+    if name == "memory":
+        return InMemoryBackplane()
+    if name == "redis":
+        return RedisBackplane()
+    raise ValueError(f"Unknown WS_BACKPLANE: {name}")
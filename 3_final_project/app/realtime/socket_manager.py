@@ -1,7 +1,105 @@
 # app/realtime/socket_manager.py
-from typing import Dict, List, Set, Any
+from typing import Dict, List, Set, Any, Optional
 from starlette.websockets import WebSocket, WebSocketState
+from fastapi.concurrency import run_in_threadpool
+import asyncio
 import json
+import time
+
+from app.core.config import settings
+from app.realtime.backplane import create_backplane
+
+
+class SendMetrics:
+    """สถิติการส่งของทุก connection ใน process นี้ (ดูได้ที่ /internal/realtime-stats)"""
+
+    def __init__(self):
+        self.enqueued = 0
+        self.sent = 0
+        self.send_errors = 0
+        self.dropped = 0              # drop_oldest: ข้อความเก่าที่ถูกทิ้ง
+        self.slow_disconnects = 0     # disconnect: ตัด client ที่รับไม่ทัน
+        self.send_ms_total = 0.0
+        self.send_ms_max = 0.0
+        self.queue_depth_max = 0
+        self.pings = 0
+        self.idle_reaped = 0          # ไม่มีข้อความจาก client นานเกิน WS_IDLE_TIMEOUT_SECONDS
+
+    def record_send(self, elapsed_ms: float) -> None:
+        self.sent += 1
+        self.send_ms_total += elapsed_ms
+        self.send_ms_max = max(self.send_ms_max, elapsed_ms)
+
+    def snapshot(self, outboxes) -> Dict[str, Any]:
+        depths = [box.queue.qsize() for box in outboxes]
+        return {
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "send_errors": self.send_errors,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "send_ms_avg": round(self.send_ms_total / self.sent, 2) if self.sent else 0,
+            "send_ms_max": round(self.send_ms_max, 2),
+            "queue_depth_now": sum(depths),
+            "queue_depth_max_now": max(depths, default=0),
+            "queue_depth_max": self.queue_depth_max,
+            "bytes_queued_now": sum(box.bytes_queued for box in outboxes),
+            "pings": self.pings,
+            "idle_reaped": self.idle_reaped,
+        }
+
+
+class Outbox:
+    """
+    คิวขาออกของ 1 connection + writer task ของตัวเอง
+    client ที่ช้าทำให้คิวของตัวเองเต็มเท่านั้น ไม่ถ่วง connection อื่นในห้อง
+    เก็บ last_seen (ข้อความล่าสุดจาก client) ไว้ให้ reaper ตัด connection ที่เงียบหาย
+    """
+
+    def __init__(self, ws: WebSocket, metrics: SendMetrics, on_dead):
+        self.ws = ws
+        self.metrics = metrics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.bytes_queued = 0
+        self.connected_at = time.time()
+        self.last_seen = time.monotonic()
+        self._on_dead = on_dead
+        self._task = asyncio.get_running_loop().create_task(self._writer())
+
+    def put(self, text: str) -> None:
+        """ใส่ข้อความเข้าคิว (ไม่ block) — คิวเต็มทำตาม WS_SLOW_CONSUMER_POLICY"""
+        if self.queue.full():
+            if settings.WS_SLOW_CONSUMER_POLICY == "disconnect":
+                self.metrics.slow_disconnects += 1
+                print(f"[SocketManager] Slow consumer disconnected (queue full: {self.queue.qsize()})")
+                self._on_dead(self.ws, close_code=1013)
+                return
+            # drop_oldest: ทิ้งข้อความเก่าสุด เก็บข้อความล่าสุดไว้
+            self.bytes_queued -= len(self.queue.get_nowait())
+            self.metrics.dropped += 1
+        self.queue.put_nowait(text)
+        self.bytes_queued += len(text)
+        self.metrics.enqueued += 1
+        self.metrics.queue_depth_max = max(self.metrics.queue_depth_max, self.queue.qsize())
+
+    async def _writer(self) -> None:
+        while True:
+            text = await self.queue.get()
+            self.bytes_queued -= len(text)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.ws.send_text(text), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.send_errors += 1
+                print(f"[SocketManager] Failed to send to WebSocket: {e!r}")
+                self._on_dead(self.ws)
+                return
+            self.metrics.record_send((time.perf_counter() - started) * 1000)
+
+    def close(self) -> None:
+        self._task.cancel()
 
 
 class ConnectionManager:
@@ -9,16 +107,90 @@ class ConnectionManager:
     ✅ จัดการ WebSocket connections แบบ multi-room
     - แต่ละ room คือ conversation หรือ user
     - ใช้ broadcast ส่งข้อความไปยังทุก connection ในห้อง
+    - rooms เก็บเฉพาะ socket ของ process นี้ — process อื่น (uvicorn worker / pod / celery)
+      ส่งถึงกันผ่าน backplane (app.realtime.backplane, เลือกด้วย WS_BACKPLANE)
+    - แต่ละ socket มี Outbox (คิว + writer task) ของตัวเอง → broadcast แค่ใส่คิว ไม่รอส่ง
     """
-    
-    def __init__(self):
+
+    def __init__(self, backplane=None):
         # room_key -> set of websockets
         self.rooms: Dict[str, Set[WebSocket]] = {}
+        # socket -> ห้องที่อยู่ / คิวขาออก (1 socket อยู่ได้หลายห้อง ใช้คิวเดียว)
+        self._socket_rooms: Dict[WebSocket, Set[str]] = {}
+        self._outboxes: Dict[WebSocket, Outbox] = {}
+        self.send_metrics = SendMetrics()
+        self.backplane = backplane or create_backplane(settings.WS_BACKPLANE)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        เริ่มรับ broadcast จาก process อื่น + heartbeat / reaper (เรียกตอน startup ของ web app)
+        process ที่ไม่ได้ start (เช่น celery worker) ยัง broadcast ออกไปได้ตามปกติ
+        """
+        self._loop = asyncio.get_running_loop()
+        self.backplane.start(self._deliver_from_backplane)
+        if settings.WS_IDLE_TIMEOUT_SECONDS > 0 and (self._reaper_task is None or self._reaper_task.done()):
+            self._reaper_task = self._loop.create_task(self._heartbeat_loop())
+        print(f"[SocketManager] Backplane: {self.backplane.name}")
+
+    # ---------- heartbeat ----------
+
+    def touch(self, ws: WebSocket):
+        """route เรียกทุกครั้งที่ได้รับข้อความจาก client (รวม pong) → ยังไม่ idle"""
+        outbox = self._outboxes.get(ws)
+        if outbox:
+            outbox.last_seen = time.monotonic()
+
+    async def _heartbeat_loop(self):
+        """
+        ทุก WS_HEARTBEAT_INTERVAL_SECONDS:
+        - connection ที่เงียบเกิน WS_IDLE_TIMEOUT_SECONDS → ปิด (half-open / client หายไปแล้ว)
+        - connection ที่เงียบเกิน 1 รอบ → ส่ง {"type": "ping"} (client ตอบ {"type": "pong"})
+        เปิดเฉพาะเมื่อ WS_IDLE_TIMEOUT_SECONDS > 0 (client ทุกตัวต้องตอบ pong ก่อน ไม่งั้นโดนตัดทุก 90 วินาที)
+        ปิดอยู่ก็ยังตรวจ half-open ได้ด้วย ping frame ของ uvicorn
+        """
+        interval = settings.WS_HEARTBEAT_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                now = time.monotonic()
+                ping = json.dumps({"type": "ping", "ts": int(time.time() * 1000)})
+                for ws, outbox in list(self._outboxes.items()):
+                    idle = now - outbox.last_seen
+                    if idle > settings.WS_IDLE_TIMEOUT_SECONDS:
+                        self.send_metrics.idle_reaped += 1
+                        print(f"[SocketManager] Reaping idle WebSocket ({idle:.0f}s, rooms={sorted(self._socket_rooms.get(ws, ()))})")
+                        self._drop_socket(ws, close_code=1001)
+                    elif idle >= interval:
+                        outbox.put(ping)
+                        self.send_metrics.pings += 1
+            except Exception as e:
+                print(f"[SocketManager] Heartbeat error: {e}")
+
+    @staticmethod
+    def _connection_id(ws: WebSocket) -> str:
+        return str(id(ws))
+
+    def _spawn(self, func, *args):
+        """เรียก backplane (sync I/O) ใน threadpool โดยไม่ต้องรอผล"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            func(*args)
+            return
+        task = loop.create_task(run_in_threadpool(func, *args))
+        task.add_done_callback(self._log_backplane_error)
+
+    @staticmethod
+    def _log_backplane_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            print(f"[SocketManager] Backplane error: {task.exception()}")
 
     async def connect(self, room: str, ws: WebSocket):
         """
         เชื่อมต่อ WebSocket เข้า room
-        
+
         ✅ IMPORTANT:
         - อย่า accept() ซ้ำ ถ้า accept แล้วจะ crash
         - ตรวจสอบ WebSocketState ก่อน accept
@@ -38,20 +210,28 @@ class ConnectionManager:
         # เพิ่ม ws เข้า room
         if room not in self.rooms:
             self.rooms[room] = set()
-        
-        self.rooms[room].add(ws)
+
+        if ws not in self.rooms[room]:
+            self.rooms[room].add(ws)
+            self._socket_rooms.setdefault(ws, set()).add(room)
+            if ws not in self._outboxes:
+                self._outboxes[ws] = Outbox(ws, self.send_metrics, self._drop_socket)
+            self._spawn(self.backplane.join, room, self._connection_id(ws))
         print(f"[SocketManager] WebSocket added to room {room} (total: {len(self.rooms[room])})")
 
     def disconnect(self, room: str, ws: WebSocket):
         """
         ตัด WebSocket ออกจาก room
-        
+
         ✅ ถ้าไม่มีใครในห้องแล้ว ลบห้องทิ้ง
         """
         if room in self.rooms:
-            self.rooms[room].discard(ws)
+            if ws in self.rooms[room]:
+                self.rooms[room].discard(ws)
+                self._spawn(self.backplane.leave, room, self._connection_id(ws))
+                self._forget_room(ws, room)
             print(f"[SocketManager] WebSocket removed from room {room} (remaining: {len(self.rooms[room])})")
-            
+
             # ลบห้องถ้าไม่มีใครแล้ว
             if not self.rooms[room]:
                 del self.rooms[room]
@@ -59,52 +239,106 @@ class ConnectionManager:
 
     async def broadcast(self, room: str, message: Any):
         """
-        ส่งข้อความไปยังทุก connection ในห้อง
-        
+        ส่งข้อความไปยังทุก connection ในห้อง (ทุก process)
+
         ✅ รองรับ dict/list (แปลงเป็น JSON อัตโนมัติ)
-        ✅ ลบ connection ที่ส่งไม่ได้ (dead connections)
+        ✅ socket ใน process นี้ส่งทันที แล้ว publish ครั้งเดียวให้ process อื่นส่งต่อ
         """
-        if room not in self.rooms:
-            print(f"[SocketManager] Cannot broadcast to {room} (room not found)")
+        # แปลง dict/list เป็น JSON string ครั้งเดียว
+        text = json.dumps(message) if isinstance(message, (dict, list)) else str(message)
+
+        await self._deliver_local(room, text)
+
+        try:
+            await run_in_threadpool(self.backplane.publish, room, text)
+        except Exception as e:
+            # backplane ล่ม → socket ใน process นี้ได้รับไปแล้ว
+            print(f"[SocketManager] Backplane publish failed for {room}: {e}")
+
+    def _deliver_from_backplane(self, room: str, text: str):
+        """ถูกเรียกจาก thread ของ backplane → ส่งต่อเข้า event loop ของ web app"""
+        if self._loop is None or room not in self.rooms:
             return
+        asyncio.run_coroutine_threadsafe(self._deliver_local(room, text), self._loop)
 
-        dead: Set[WebSocket] = set()
-        success_count = 0
-        
-        # ส่งข้อความไปยังทุก WebSocket ในห้อง
-        for ws in list(self.rooms[room]):
-            try:
-                # แปลง dict/list เป็น JSON string
-                if isinstance(message, (dict, list)):
-                    await ws.send_text(json.dumps(message))
-                else:
-                    await ws.send_text(str(message))
-                
-                success_count += 1
-                
-            except Exception as e:
-                print(f"[SocketManager] Failed to send to WebSocket in {room}: {e}")
-                dead.add(ws)
+    async def _deliver_local(self, room: str, text: str):
+        """ใส่ข้อความเข้าคิวของทุก socket ของ process นี้ในห้อง (writer ของแต่ละ socket ส่งเอง)"""
+        for ws in list(self.rooms.get(room, ())):
+            outbox = self._outboxes.get(ws)
+            if outbox:
+                outbox.put(text)
 
-        # ✅ Cleanup dead connections
-        for ws in dead:
-            self.rooms[room].discard(ws)
+    def _forget_room(self, ws: WebSocket, room: str):
+        """socket ออกจากห้อง → ไม่เหลือห้องแล้ว หยุด writer + ทิ้งคิว"""
+        rooms = self._socket_rooms.get(ws)
+        if rooms is None:
+            return
+        rooms.discard(room)
+        if not rooms:
+            del self._socket_rooms[ws]
+            outbox = self._outboxes.pop(ws, None)
+            if outbox:
+                outbox.close()
+
+    def _drop_socket(self, ws: WebSocket, close_code: Optional[int] = None):
+        """
+        ✅ Cleanup dead / slow connections: เอาออกจากทุกห้อง
+        close_code → ปิด socket ด้วย (client รับไม่ทัน) ให้ client reconnect แล้วโหลดข้อมูลใหม่
+        """
+        for room in list(self._socket_rooms.get(ws, ())):
+            self.disconnect(room, ws)
+        if close_code is not None:
+            self._spawn_close(ws, close_code)
 
-        # ลบห้องถ้าไม่มีใครแล้ว
-        if room in self.rooms and not self.rooms[room]:
-            del self.rooms[room]
-            print(f"[SocketManager] Room {room} deleted after cleanup")
-        
-        print(f"[SocketManager] Broadcast to {room}: {success_count} successful, {len(dead)} failed")
+    @staticmethod
+    def _spawn_close(ws: WebSocket, code: int):
+        async def _close():
+            try:
+                await ws.close(code=code)
+            except Exception:
+                pass
+        asyncio.get_running_loop().create_task(_close())
 
     def get_room_size(self, room: str) -> int:
-        """ดูจำนวน connection ในห้อง"""
+        """ดูจำนวน connection ในห้อง (เฉพาะ process นี้)"""
         return len(self.rooms.get(room, set()))
-    
+
+    async def get_cluster_room_size(self, room: str) -> int:
+        """จำนวน connection ในห้องรวมทุก process (presence จาก backplane)"""
+        return await run_in_threadpool(self.backplane.room_count, room)
+
+    async def is_online(self, user_id) -> bool:
+        """ผู้ใช้มี connection เปิดอยู่ที่ process ใดก็ได้"""
+        room = f"user:{user_id}"
+        return bool(self.rooms.get(room)) or await self.get_cluster_room_size(room) > 0
+
     def get_all_rooms(self) -> List[str]:
-        """ดูรายชื่อห้องทั้งหมด"""
+        """ดูรายชื่อห้องทั้งหมด (เฉพาะ process นี้)"""
         return list(self.rooms.keys())
 
+    def connections(self) -> List[Dict[str, Any]]:
+        """รายการ connection ของ process นี้ (ห้อง / คิวค้าง / เงียบมานานเท่าไร)"""
+        now = time.monotonic()
+        return [
+            {
+                "connection_id": self._connection_id(ws),
+                "rooms": sorted(self._socket_rooms.get(ws, ())),
+                "queued_messages": outbox.queue.qsize(),
+                "bytes_queued": outbox.bytes_queued,
+                "connected_seconds": round(time.time() - outbox.connected_at, 1),
+                "idle_seconds": round(now - outbox.last_seen, 1),
+            }
+            for ws, outbox in list(self._outboxes.items())
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backplane": self.backplane.name,
+            "local_rooms": len(self.rooms),
+            "local_connections": len(self._outboxes),
+            "send": self.send_metrics.snapshot(list(self._outboxes.values())),
+        }
+
 
 # ✅ Singleton instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
@@ -0,0 +1,250 @@
+# app/repositories/daily_sales_repository.py
+"""
+Daily Store Sales Rollup - ดูแลตาราง daily_store_sales
+
+- refresh_orders: คำนวณแถว (ร้าน, วัน) ของออเดอร์ที่เปลี่ยนสถานะใหม่จาก orders (เรียกจาก write path)
+- rebuild_daily_sales: คำนวณใหม่ทั้งหมด / ตั้งแต่วันที่กำหนด (backfill / ซ่อมข้อมูล)
+- sales_by_day / platform_sales_by_day / store_totals: อ่านสำหรับ dashboard
+
+refresh คำนวณทั้งแถวจากข้อมูลต้นทางใหม่ (ไม่ใช่ +/- ทีละออเดอร์)
+→ เรียกซ้ำได้ ไม่เพี้ยนถ้า hook ไหนพลาดไป ให้ rebuild ช่วงนั้นใหม่
+ฟังก์ชัน refresh ไม่ commit เอง ให้ caller commit พร้อม transaction ของตัวเอง
+"""
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import DateTime, and_, cast, func, literal_column, or_, select, true, tuple_, union
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.daily_store_sales import DailyStoreSales
+from app.models.order import Order, OrderStatus, SALES_STATUSES
+from app.models.order_item import OrderItem
+from app.models.return_order import ReturnOrder
+from app.utils.now_utc import THAI_TZ, now_utc
+
+
+def _thai_date(column):
+    """timestamptz → วันที่ตามเวลาไทย"""
+    return func.date(func.timezone(literal_column(f"'{THAI_TZ}'"), column))
+
+
+def _rollup_source(targets):
+    """
+    แถวของ rollup สำหรับทุกคู่ (store_id, sale_date) ใน targets
+    คู่ที่ไม่มีข้อมูลแล้วได้ค่า 0 (เช่นออเดอร์เดียวของวันนั้นถูกยกเลิก)
+    """
+    order_day = _thai_date(Order.created_at)
+    paid = Order.order_status.in_(SALES_STATUSES)
+    target_pairs = select(targets.c.store_id, targets.c.sale_date)
+    target_stores = select(targets.c.store_id)
+
+    units = (
+        select(func.coalesce(func.sum(OrderItem.quantity), 0).label("units"))
+        .where(OrderItem.order_id == Order.order_id)
+        .lateral("order_units")
+    )
+    orders = (
+        select(
+            Order.store_id,
+            order_day.label("sale_date"),
+            func.sum(Order.total_price).filter(paid).label("revenue"),
+            func.count(Order.order_id).filter(paid).label("order_count"),
+            func.sum(units.c.units).filter(paid).label("units"),
+            func.count(func.distinct(Order.user_id)).filter(paid).label("customers"),
+        )
+        .select_from(Order)
+        .join(units, true())
+        .where(
+            Order.store_id.in_(target_stores),
+            tuple_(Order.store_id, order_day).in_(target_pairs),
+        )
+        .group_by(Order.store_id, order_day)
+        .subquery("orders_by_day")
+    )
+
+    return_day = _thai_date(ReturnOrder.created_at)
+    returns = (
+        select(
+            Order.store_id,
+            return_day.label("sale_date"),
+            func.count(ReturnOrder.return_id).label("returns"),
+        )
+        .join(Order, Order.order_id == ReturnOrder.order_id)
+        .where(
+            Order.store_id.in_(target_stores),
+            tuple_(Order.store_id, return_day).in_(target_pairs),
+        )
+        .group_by(Order.store_id, return_day)
+        .subquery("returns_by_day")
+    )
+
+    # ยอดตามวันที่ชำระเงิน (กราฟแอดมิน): ทุกสถานะยกเว้น UNPAID / CANCELLED
+    paid_day = _thai_date(Order.paid_at)
+    paid_orders = (
+        select(
+            Order.store_id,
+            paid_day.label("sale_date"),
+            func.sum(Order.total_price).label("paid_revenue"),
+            func.count(Order.order_id).label("paid_order_count"),
+        )
+        .where(
+            Order.store_id.in_(target_stores),
+            Order.paid_at.isnot(None),
+            Order.order_status.notin_([OrderStatus.UNPAID.value, OrderStatus.CANCELLED.value]),
+            tuple_(Order.store_id, paid_day).in_(target_pairs),
+        )
+        .group_by(Order.store_id, paid_day)
+        .subquery("paid_by_day")
+    )
+
+    return (
+        select(
+            targets.c.store_id,
+            targets.c.sale_date,
+            func.coalesce(orders.c.revenue, 0),
+            func.coalesce(orders.c.order_count, 0),
+            func.coalesce(orders.c.units, 0),
+            func.coalesce(orders.c.customers, 0),
+            func.coalesce(returns.c.returns, 0),
+            func.coalesce(paid_orders.c.paid_revenue, 0),
+            func.coalesce(paid_orders.c.paid_order_count, 0),
+            func.now(),
+        )
+        .select_from(targets)
+        .outerjoin(orders, and_(
+            orders.c.store_id == targets.c.store_id,
+            orders.c.sale_date == targets.c.sale_date,
+        ))
+        .outerjoin(returns, and_(
+            returns.c.store_id == targets.c.store_id,
+            returns.c.sale_date == targets.c.sale_date,
+        ))
+        .outerjoin(paid_orders, and_(
+            paid_orders.c.store_id == targets.c.store_id,
+            paid_orders.c.sale_date == targets.c.sale_date,
+        ))
+    )
+
+
+_ROLLUP_COLUMNS = [
+    "store_id",
+    "sale_date",
+    "revenue",
+    "order_count",
+    "units",
+    "customers",
+    "returns",
+    "paid_revenue",
+    "paid_order_count",
+    "refreshed_at",
+]
+
+
+def _upsert(db: Session, targets) -> None:
+    # session ตั้ง autoflush=False → flush ก่อนให้ INSERT ... SELECT เห็นสถานะล่าสุด
+    db.flush()
+
+    stmt = insert(DailyStoreSales).from_select(_ROLLUP_COLUMNS, _rollup_source(targets))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStoreSales.store_id, DailyStoreSales.sale_date],
+        set_={col: stmt.excluded[col] for col in _ROLLUP_COLUMNS[2:]},
+    )
+    db.execute(stmt)
+
+
+def _order_days(order_filter):
+    """(ร้าน, วัน) ที่ออเดอร์กระทบ: วันที่สร้าง / ชำระเงินของออเดอร์ + วันที่สร้างคำขอคืนของออเดอร์นั้น"""
+    return union(
+        select(Order.store_id, _thai_date(Order.created_at).label("sale_date"))
+        .where(order_filter, Order.store_id.isnot(None)),
+        select(Order.store_id, _thai_date(Order.paid_at).label("sale_date"))
+        .where(order_filter, Order.store_id.isnot(None), Order.paid_at.isnot(None)),
+        select(Order.store_id, _thai_date(ReturnOrder.created_at).label("sale_date"))
+        .join(ReturnOrder, ReturnOrder.order_id == Order.order_id)
+        .where(order_filter, Order.store_id.isnot(None)),
+    ).cte("targets")
+
+
+def refresh_orders(db: Session, order_ids: Iterable[UUID]) -> None:
+    """ออเดอร์เปลี่ยนสถานะ / มีคำขอคืน → คำนวณแถวของ (ร้าน, วัน) ที่เกี่ยวข้องใหม่"""
+    order_ids = list({oid for oid in order_ids if oid})
+    if not order_ids:
+        return
+    _upsert(db, _order_days(Order.order_id.in_(order_ids)))
+
+
+def rebuild_daily_sales(db: Session, since: Optional[date] = None) -> int:
+    """
+    คำนวณ rollup ใหม่ทั้งหมด (หรือตั้งแต่วันที่ since) แล้ว commit
+    ใช้ตอน backfill ครั้งแรก / ซ่อมข้อมูล
+    """
+    order_filter = true() if since is None else or_(
+        _thai_date(Order.created_at) >= since,
+        _thai_date(Order.paid_at) >= since,
+    )
+    _upsert(db, _order_days(order_filter))
+    db.commit()
+
+    total = db.query(func.count()).select_from(DailyStoreSales).scalar() or 0
+    print(f"[DailySales] Rebuilt rollup since {since or 'beginning'}: {total} rows at {now_utc().isoformat()}")
+    return total
+
+
+# ---------- read ----------
+
+def sales_by_bucket(
+    db: Session,
+    start: date,
+    end: date,
+    granularity: str = "day",
+    store_id: Optional[UUID] = None,
+):
+    """
+    ยอดขายรวมราย day / week / month ช่วง [start, end] (store_id=None → ทุกร้าน)
+    bucket ที่ไม่มีแถวคือไม่มียอด (caller เติม 0 เอง)
+    revenue / order_count = ตามวันที่สร้างออเดอร์, paid_revenue / paid_order_count = ตามวันที่ชำระเงิน
+    """
+    # cast เป็น timestamp (ไม่มี tz) → date_trunc ไม่ขึ้นกับ timezone ของ session
+    bucket = func.date_trunc(
+        literal_column(f"'{granularity}'"), cast(DailyStoreSales.sale_date, DateTime)
+    ).label("bucket")
+    query = db.query(
+        bucket,
+        func.sum(DailyStoreSales.revenue).label("revenue"),
+        func.sum(DailyStoreSales.order_count).label("order_count"),
+        func.sum(DailyStoreSales.units).label("units"),
+        func.sum(DailyStoreSales.returns).label("returns"),
+        func.sum(DailyStoreSales.paid_revenue).label("paid_revenue"),
+        func.sum(DailyStoreSales.paid_order_count).label("paid_order_count"),
+    ).filter(
+        DailyStoreSales.sale_date >= start,
+        DailyStoreSales.sale_date <= end,
+    )
+    if store_id is not None:
+        query = query.filter(DailyStoreSales.store_id == store_id)
+    return query.group_by(bucket).order_by(bucket).all()
+
+
+def store_revenue_between(db: Session, store_id: UUID, periods: Dict[str, Tuple[date, date]]):
+    """ยอดขายของร้านหลายช่วงใน query เดียว: {"today": (start, end), ...} → row.today, ..."""
+    columns = [
+        func.coalesce(
+            func.sum(DailyStoreSales.revenue).filter(
+                DailyStoreSales.sale_date >= period_start,
+                DailyStoreSales.sale_date <= period_end,
+            ),
+            0,
+        ).label(name)
+        for name, (period_start, period_end) in periods.items()
+    ]
+    earliest = min(period_start for period_start, _ in periods.values())
+    return (
+        db.query(*columns)
+        .filter(
+            DailyStoreSales.store_id == store_id,
+            DailyStoreSales.sale_date >= earliest,
+        )
+        .one()
+    )
@@ -0,0 +1,169 @@
+# app/repositories/product_card_repository.py
+"""
+Product Card Query Layer - ดึงข้อมูล "การ์ดสินค้า" สำหรับหน้า listing
+
+ราคาต่ำสุด / สต็อกรวม / รูปหลัก ถูกคำนวณใน SQL คำสั่งเดียวต่อทั้งหน้า
+(LATERAL join หรือ GROUP BY ... IN) แทนการ query ทีละสินค้า (N+1)
+ใช้ร่วมกันโดย home, categories page, search และหน้าร้านค้าสาธารณะ
+"""
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session
+
+from app.models.product import ImageType, Product, ProductImage, ProductVariant
+from app.models.review import Review
+from app.models.store import Store
+
+
+def _variant_stats_lateral():
+    """ราคาต่ำสุดและสต็อกรวมของ variant ที่ active (คำนวณต่อแถวสินค้าผ่าน LATERAL)"""
+    return (
+        select(
+            func.min(ProductVariant.price).label("min_price"),
+            func.coalesce(func.sum(ProductVariant.stock), 0).label("total_stock"),
+            func.max(ProductVariant.stock).label("max_stock"),
+        )
+        .where(
+            ProductVariant.product_id == Product.product_id,
+            ProductVariant.is_active == True,
+        )
+        .lateral("variant_stats")
+    )
+
+
+def _main_image_lateral():
+    """รูปหลักของสินค้า (ไม่ผูก variant, ประเภท NORMAL) เพียง 1 รูป"""
+    return (
+        select(
+            ProductImage.image_id.label("image_id"),
+            ProductImage.image_url.label("image_url"),
+            ProductImage.derivatives.label("image_derivatives"),
+        )
+        .where(
+            ProductImage.product_id == Product.product_id,
+            ProductImage.variant_id == None,
+            ProductImage.is_main == True,
+            ProductImage.image_type == ImageType.NORMAL,
+        )
+        .order_by(ProductImage.display_order, ProductImage.uploaded_at)
+        .limit(1)
+        .lateral("main_image")
+    )
+
+
+def sellable_product_cards_query(
+    db: Session,
+    exclude_store_id: Optional[UUID] = None,
+):
+    """
+    Query การ์ดสินค้าที่ขายได้ (ยังไม่ order / paginate)
+
+    เงื่อนไข:
+    - Product.is_active = True และ Product.is_draft = False
+    - Store.is_active = True
+    - มี variant ที่ active และ stock > 0 อย่างน้อย 1 ตัว
+
+    แต่ละแถวมี: product_id, store_id, product_name, average_rating, category_id, created_at,
+    store_name, min_price, total_stock, image_id, image_url, image_derivatives
+    """
+    variant_stats = _variant_stats_lateral()
+    main_image = _main_image_lateral()
+
+    query = (
+        db.query(
+            Product.product_id,
+            Product.store_id,
+            Product.product_name,
+            Product.average_rating,
+            Product.category_id,
+            Product.created_at,
+            Store.name.label("store_name"),
+            variant_stats.c.min_price,
+            variant_stats.c.total_stock,
+            main_image.c.image_id,
+            main_image.c.image_url,
+            main_image.c.image_derivatives,
+        )
+        .join(Store, Product.store_id == Store.store_id)
+        .join(variant_stats, true())
+        .outerjoin(main_image, true())
+        .filter(
+            Product.is_active == True,
+            Product.is_draft == False,
+            Store.is_active == True,
+            variant_stats.c.max_stock > 0,
+        )
+    )
+
+    # กรองสินค้าของร้านตัวเองออก (ถ้า login อยู่)
+    if exclude_store_id:
+        query = query.filter(Product.store_id != exclude_store_id)
+
+    return query
+
+
+def get_variant_stats_map(db: Session, product_ids: Iterable[UUID]) -> Dict[UUID, dict]:
+    """
+    ราคาต่ำสุด / สต็อกรวมของ variant ที่ active สำหรับสินค้าทั้งหน้าใน query เดียว
+
+    Returns:
+        {product_id: {"min_price": float | None, "total_stock": int}}
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+
+    rows = (
+        db.query(
+            ProductVariant.product_id,
+            func.min(ProductVariant.price),
+            func.coalesce(func.sum(ProductVariant.stock), 0),
+        )
+        .filter(
+            ProductVariant.product_id.in_(product_ids),
+            ProductVariant.is_active == True,
+        )
+        .group_by(ProductVariant.product_id)
+        .all()
+    )
+
+    return {
+        product_id: {
+            "min_price": float(min_price) if min_price is not None else None,
+            "total_stock": int(total_stock or 0),
+        }
+        for product_id, min_price, total_stock in rows
+    }
+
+
+def get_review_stats_map(db: Session, product_ids: Iterable[UUID]) -> Dict[UUID, dict]:
+    """
+    จำนวนรีวิวและเรตติ้งเฉลี่ยของสินค้าทั้งหน้าใน query เดียว
+
+    Returns:
+        {product_id: {"review_count": int, "rating": float}}
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+
+    rows = (
+        db.query(
+            Review.product_id,
+            func.count(Review.review_id),
+            func.avg(Review.rating),
+        )
+        .filter(Review.product_id.in_(product_ids))
+        .group_by(Review.product_id)
+        .all()
+    )
+
+    return {
+        product_id: {
+            "review_count": int(review_count or 0),
+            "rating": float(avg_rating) if avg_rating else 0.0,
+        }
+        for product_id, review_count, avg_rating in rows
+    }
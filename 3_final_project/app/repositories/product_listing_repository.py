@@ -0,0 +1,160 @@
+# app/repositories/product_listing_repository.py
+"""
+Product Listing Read Model - ดูแลตาราง product_listing
+
+- refresh_products / refresh_store: อัปเดตเฉพาะสินค้าที่เปลี่ยน (เรียกจาก write path)
+- rebuild_product_listing: สร้างใหม่ทั้งตาราง (backfill / ซ่อมข้อมูล)
+- listing_query / listing_select: query สำหรับหน้า listing (อ่านจากตารางเดียว ไม่ต้อง join)
+
+ฟังก์ชัน refresh ไม่ commit เอง ให้ caller commit พร้อม transaction ของตัวเอง
+"""
+from typing import Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.product_listing import ProductListing
+from app.models.review import Review
+from app.repositories.product_card_repository import sellable_product_cards_query
+from app.utils.now_utc import now_utc
+
+
+def _listing_source(db: Session, product_filter=None):
+    """แถวของ read model คำนวณจาก product card query (ยังไม่ insert)"""
+    avg_review_rating = (
+        select(func.avg(Review.rating))
+        .where(Review.product_id == Product.product_id)
+        .scalar_subquery()
+    )
+
+    query = sellable_product_cards_query(db).add_columns(
+        func.coalesce(avg_review_rating, Product.average_rating, 0).label("rating")
+    )
+    if product_filter is not None:
+        query = query.filter(product_filter)
+
+    cards = query.subquery()
+    return select(
+        cards.c.product_id,
+        cards.c.store_id,
+        cards.c.category_id,
+        cards.c.product_name,
+        cards.c.store_name,
+        func.coalesce(cards.c.min_price, 0),
+        cards.c.total_stock,
+        cards.c.image_id,
+        cards.c.image_url,
+        cards.c.image_derivatives,
+        cards.c.rating,
+        cards.c.created_at,
+        func.now(),
+    )
+
+
+_LISTING_COLUMNS = [
+    "product_id",
+    "store_id",
+    "category_id",
+    "product_name",
+    "store_name",
+    "min_price",
+    "total_stock",
+    "main_image_id",
+    "main_image_url",
+    "main_image_derivatives",
+    "rating",
+    "created_at",
+    "refreshed_at",
+]
+
+
+def _upsert(db: Session, product_filter=None) -> List[UUID]:
+    """INSERT ... SELECT ... ON CONFLICT DO UPDATE แล้วคืน product_id ที่เขียนลงไป"""
+    # session ตั้ง autoflush=False → flush ก่อนให้ INSERT ... SELECT เห็นการเปลี่ยนแปลงล่าสุด
+    db.flush()
+
+    stmt = insert(ProductListing).from_select(
+        _LISTING_COLUMNS, _listing_source(db, product_filter)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductListing.product_id],
+        set_={col: stmt.excluded[col] for col in _LISTING_COLUMNS if col != "product_id"},
+    ).returning(ProductListing.product_id)
+    return db.execute(stmt).scalars().all()
+
+
+def refresh_products(db: Session, product_ids: Iterable[UUID]) -> None:
+    """
+    อัปเดต read model ของสินค้าที่ระบุ
+    - สินค้าที่ยังขายได้ → upsert แถวใหม่
+    - สินค้าที่ขายไม่ได้แล้ว (ปิดขาย / stock หมด / ร้านปิด) → ลบแถวออก
+    """
+    product_ids = list({pid for pid in product_ids if pid})
+    if not product_ids:
+        return
+
+    written = _upsert(db, Product.product_id.in_(product_ids))
+
+    # สินค้าที่ upsert ไม่ได้เขียน = ขายไม่ได้แล้ว
+    # (ไม่ใช้ refreshed_at < now() เพราะ now() คงที่ทั้ง transaction → refresh ครั้งที่สองจะไม่ลบอะไรเลย)
+    (
+        db.query(ProductListing)
+        .filter(
+            ProductListing.product_id.in_(product_ids),
+            ProductListing.product_id.notin_(written),
+        )
+        .delete(synchronize_session=False)
+    )
+
+
+def refresh_store(db: Session, store_id: UUID) -> None:
+    """อัปเดต read model ของสินค้าทั้งร้าน (เปิด/ปิดร้าน, เปลี่ยนชื่อร้าน)"""
+    if not store_id:
+        return
+
+    written = _upsert(db, Product.store_id == store_id)
+
+    (
+        db.query(ProductListing)
+        .filter(
+            ProductListing.store_id == store_id,
+            ProductListing.product_id.notin_(written),
+        )
+        .delete(synchronize_session=False)
+    )
+
+
+def rebuild_product_listing(db: Session) -> int:
+    """สร้าง read model ใหม่ทั้งตาราง แล้ว commit (ใช้ตอน backfill / ซ่อมข้อมูล)"""
+    _upsert(db)
+    # ทั้งตาราง → เทียบกับ subquery สินค้าที่ขายได้ แทนการส่ง product_id ทั้งหมดเป็นพารามิเตอร์
+    sellable = sellable_product_cards_query(db).subquery()
+    (
+        db.query(ProductListing)
+        .filter(ProductListing.product_id.notin_(select(sellable.c.product_id)))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+
+    total = db.query(func.count(ProductListing.product_id)).scalar() or 0
+    print(f"[ProductListing] Rebuilt {total} rows at {now_utc().isoformat()}")
+    return total
+
+
+def listing_query(db: Session, exclude_store_id: Optional[UUID] = None):
+    """Query สินค้าที่ขายได้จาก read model (ยังไม่ order / paginate)"""
+    query = db.query(ProductListing)
+    if exclude_store_id:
+        query = query.filter(ProductListing.store_id != exclude_store_id)
+    return query
+
+
+def listing_select(exclude_store_id: Optional[UUID] = None):
+    """listing_query แบบ select() สำหรับ AsyncSession"""
+    stmt = select(ProductListing)
+    if exclude_store_id:
+        stmt = stmt.where(ProductListing.store_id != exclude_store_id)
+    return stmt
@@ -1,5 +1,6 @@
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from app.core.principal import invalidate_principal
 from app.models.user import User
 from app.repositories.user_repository import get_user_by_user_id
 from app.core.security import hash_password
@@ -100,6 +101,7 @@ def update_user(db: Session, user_id: str, update_data):
         return user
     
     print(f"✅ [REPO] Changes detected! Flushing to DB...")
+    invalidate_principal(db, user.user_id)  # username / email อยู่ใน principal cache
     db.flush()
     
     print(f"✅ [REPO] Refreshing user object from DB...")
@@ -123,6 +125,7 @@ def delete_user(db: Session, user_id: str):
             return None
         
         user.is_active = False
+        invalidate_principal(db, user.user_id)
         db.flush()
 
         return user  # คืน instance ที่ยังเป็น mapped class
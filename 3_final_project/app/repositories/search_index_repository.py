@@ -0,0 +1,203 @@
+# app/repositories/search_index_repository.py
+"""
+Product Search Index - full-text (tsvector) + trigram (pg_trgm) + autocomplete
+
+- index_product / index_products: sync index หลังสินค้าถูกสร้าง / แก้ไข / ปิดขาย
+- reindex_store / reindex_category: ชื่อร้าน / หมวดหมู่เปลี่ยน
+- rebuild_search_index: สร้างใหม่ทั้งหมด (backfill)
+- ranked_search: กรอง + จัดอันดับผลค้นหา
+- suggest_terms: autocomplete แบบ prefix จากตาราง search_terms
+
+ฟังก์ชัน index ไม่ commit เอง ให้ caller commit พร้อม transaction ของตัวเอง
+(ยกเว้น rebuild_search_index)
+"""
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import String, cast, func, literal, or_
+from sqlalchemy.dialects.postgresql import TSQUERY, TSVECTOR, insert
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.product import Product
+from app.models.product_listing import ProductListing
+from app.models.product_search import ProductSearch, SearchTerm
+from app.utils.search_text import (
+    escape_like,
+    normalize_text,
+    to_tsquery_literal,
+    to_tsvector_literal,
+    tokenize,
+)
+
+DESCRIPTION_INDEX_CHARS = 1000
+
+
+def _weighted_vector(text: Optional[str], weight: str):
+    return func.setweight(cast(literal(to_tsvector_literal(tokenize(text)), String), TSVECTOR), weight)
+
+
+def _bump_term(db: Session, term: Optional[str], delta: int) -> None:
+    """เพิ่ม / ลดจำนวนสินค้าของชื่อใน search_terms"""
+    if not term:
+        return
+    stmt = insert(SearchTerm).values(term=term, product_count=max(delta, 0))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SearchTerm.term],
+        set_={"product_count": func.greatest(SearchTerm.product_count + delta, 0)},
+    )
+    db.execute(stmt)
+
+
+def _remove(db: Session, entry: ProductSearch) -> None:
+    _bump_term(db, entry.name_term, -1)
+    db.delete(entry)
+
+
+def index_product(db: Session, product: Product) -> None:
+    """
+    อัปเดต search index ของสินค้า 1 ชิ้น
+    - สินค้าเปิดขาย (ไม่ใช่ draft) → สร้าง / อัปเดตแถว
+    - สินค้าปิดขาย / draft → ลบออกจาก index
+    """
+    entry = db.query(ProductSearch).filter(ProductSearch.product_id == product.product_id).first()
+
+    if not product.is_active or product.is_draft:
+        if entry:
+            _remove(db, entry)
+        return
+
+    category_name = product.category_rel.name if product.category_rel else product.category
+    store_name = product.store.name if product.store else None
+    description = (product.description or "")[:DESCRIPTION_INDEX_CHARS]
+
+    search_vector = (
+        _weighted_vector(product.product_name, "A")
+        .op("||")(_weighted_vector(category_name, "B"))
+        .op("||")(_weighted_vector(store_name, "C"))
+        .op("||")(_weighted_vector(description, "D"))
+    )
+    search_text = normalize_text(" ".join(filter(None, [product.product_name, category_name, store_name])))
+    name_term = normalize_text(product.product_name) or None
+
+    if entry is None:
+        entry = ProductSearch(product_id=product.product_id)
+        db.add(entry)
+        _bump_term(db, name_term, 1)
+    elif entry.name_term != name_term:
+        _bump_term(db, entry.name_term, -1)
+        _bump_term(db, name_term, 1)
+
+    entry.search_vector = search_vector
+    entry.search_text = search_text
+    entry.name_term = name_term
+
+
+def index_products(db: Session, product_ids: Iterable[UUID]) -> None:
+    """อัปเดต search index ของสินค้าหลายชิ้น"""
+    product_ids = list({pid for pid in product_ids if pid})
+    if not product_ids:
+        return
+
+    products = (
+        db.query(Product)
+        .options(joinedload(Product.store), joinedload(Product.category_rel))
+        .filter(Product.product_id.in_(product_ids))
+        .all()
+    )
+    for product in products:
+        index_product(db, product)
+
+
+def reindex_store(db: Session, store_id: UUID) -> None:
+    """ชื่อร้านเปลี่ยน → อัปเดต index ของสินค้าทั้งร้าน"""
+    product_ids = [pid for (pid,) in db.query(Product.product_id).filter(Product.store_id == store_id)]
+    index_products(db, product_ids)
+
+
+def reindex_category(db: Session, category_id: UUID) -> None:
+    """ชื่อหมวดหมู่เปลี่ยน → อัปเดต index ของสินค้าในหมวดหมู่"""
+    product_ids = [pid for (pid,) in db.query(Product.product_id).filter(Product.category_id == category_id)]
+    index_products(db, product_ids)
+
+
+def rebuild_search_index(db: Session, batch_size: int = 500) -> int:
+    """สร้าง search index ใหม่ทั้งหมด แล้ว commit (ใช้ตอน backfill / ซ่อมข้อมูล)"""
+    db.query(ProductSearch).delete(synchronize_session=False)
+    db.query(SearchTerm).delete(synchronize_session=False)
+    db.flush()
+
+    total = 0
+    last_id = None
+    while True:
+        query = (
+            db.query(Product)
+            .options(joinedload(Product.store), joinedload(Product.category_rel))
+            .filter(Product.is_active == True, Product.is_draft == False)
+        )
+        if last_id is not None:
+            query = query.filter(Product.product_id > last_id)
+        products = query.order_by(Product.product_id).limit(batch_size).all()
+        if not products:
+            break
+
+        for product in products:
+            index_product(db, product)
+        db.flush()
+
+        total += len(products)
+        last_id = products[-1].product_id
+
+    db.commit()
+    print(f"[SearchIndex] Indexed {total} products")
+    return total
+
+
+def ranked_search(base_query, text: str) -> Optional[Tuple[object, object]]:
+    """
+    กรอง listing query ด้วยคำค้นหา (ใช้ได้ทั้ง listing_query และ listing_select)
+
+    สินค้าที่ตรงเงื่อนไขอย่างใดอย่างหนึ่ง:
+    - full-text: ทุก token ของคำค้นหาอยู่ใน search_vector (token สุดท้ายเป็น prefix)
+    - trigram: คำค้นหาคล้ายกับบางส่วนของ search_text (ทนพิมพ์ผิด)
+
+    Returns:
+        (query, rank) — None ถ้าคำค้นหาว่าง
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+
+    conditions = [ProductSearch.search_text.op("%>")(normalized)]
+    rank = func.word_similarity(literal(normalized), ProductSearch.search_text)
+
+    tsquery_literal = to_tsquery_literal(text)
+    if tsquery_literal:
+        tsquery = cast(literal(tsquery_literal, String), TSQUERY)
+        conditions.append(ProductSearch.search_vector.op("@@")(tsquery))
+        rank = rank + func.ts_rank_cd(ProductSearch.search_vector, tsquery)
+
+    query = (
+        base_query
+        .join(ProductSearch, ProductSearch.product_id == ProductListing.product_id)
+        .filter(or_(*conditions))
+    )
+    return query, rank
+
+
+def suggest_terms(db: Session, prefix: str, limit: int = 10) -> List[str]:
+    """autocomplete: ชื่อสินค้าที่ขึ้นต้นด้วย prefix เรียงตามจำนวนสินค้า"""
+    normalized = normalize_text(prefix)
+    if not normalized:
+        return []
+
+    rows = (
+        db.query(SearchTerm.term)
+        .filter(
+            SearchTerm.term.like(f"{escape_like(normalized)}%", escape="\\"),
+            SearchTerm.product_count > 0,
+        )
+        .order_by(SearchTerm.product_count.desc(), SearchTerm.term)
+        .limit(limit)
+        .all()
+    )
+    return [term for (term,) in rows]
@@ -1,10 +1,10 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from uuid import UUID
-from datetime import datetime
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, delete, func, insert, select, update
 
+from app.models.product import ProductVariant
 from app.models.stock_reservation import StockReservation
 
 
@@ -29,6 +29,7 @@ def get_reservations(db: Session, skip: int = 0, limit: int = 100) -> List[Stock
 def create_reservation(db: Session, data) -> StockReservation:
     reservation = StockReservation(**data.dict())
     db.add(reservation)
+    _adjust_reserved(db, {reservation.variant_id: int(reservation.quantity)}, +1)
     db.commit()
     db.refresh(reservation)
     return reservation
@@ -36,28 +37,142 @@ def create_reservation(db: Session, data) -> StockReservation:
 
 def update_reservation(db: Session, reservation: StockReservation, data) -> StockReservation:
     update_data = data.dict(exclude_unset=True)
+    old_variant_id, old_quantity = reservation.variant_id, int(reservation.quantity)
     for field, value in update_data.items():
         setattr(reservation, field, value)
+    _adjust_reserved(db, {old_variant_id: old_quantity}, -1)
+    _adjust_reserved(db, {reservation.variant_id: int(reservation.quantity)}, +1)
     db.commit()
     db.refresh(reservation)
     return reservation
 
 
 def delete_reservation(db: Session, reservation: StockReservation):
+    _adjust_reserved(db, {reservation.variant_id: int(reservation.quantity)}, -1)
     db.delete(reservation)
     db.commit()
 
 
-def get_active_reserved_quantity(db: Session, variant_id: UUID, now: datetime) -> int:
+def lock_available_stock(db: Session, variant_ids: Iterable[UUID]) -> Dict[UUID, Tuple[int, int]]:
     """
-    รวมจำนวนที่ถูก reserve อยู่ (ยังไม่หมดอายุ)
+    ดึง (stock, reserved_qty) ของหลาย variant ใน statement เดียว
+    พร้อม lock แถว variant (FOR UPDATE) ไว้จนจบ transaction
+    → checkout อื่นที่ซื้อ variant เดียวกันต้องรอจน commit / rollback ก่อนค่อยเช็ค (กัน oversell)
+    lock เรียงตาม variant_id กัน deadlock ระหว่าง checkout ที่มีหลาย variant
     """
-    total = (
-        db.query(func.coalesce(func.sum(StockReservation.quantity), 0))
-        .filter(
-            StockReservation.variant_id == variant_id,
-            StockReservation.expires_at > now
+    rows = db.execute(
+        select(ProductVariant.variant_id, ProductVariant.stock, ProductVariant.reserved_qty)
+        .where(ProductVariant.variant_id.in_(list(variant_ids)))
+        .order_by(ProductVariant.variant_id)
+        .with_for_update(of=ProductVariant)
+    ).all()
+    return {variant_id: (int(stock or 0), int(reserved or 0)) for variant_id, stock, reserved in rows}
+
+
+def _adjust_reserved(db: Session, qty_by_variant: Dict[UUID, int], sign: int) -> None:
+    """reserved_qty += sign * qty ของหลาย variant ใน UPDATE เดียว (ไม่ต่ำกว่า 0)"""
+    qty_by_variant = {vid: qty for vid, qty in qty_by_variant.items() if vid and qty}
+    if not qty_by_variant:
+        return
+    delta = case(qty_by_variant, value=ProductVariant.variant_id, else_=0)
+    db.execute(
+        update(ProductVariant)
+        .where(ProductVariant.variant_id.in_(list(qty_by_variant)))
+        .values(reserved_qty=func.greatest(ProductVariant.reserved_qty + sign * delta, 0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bulk_create_reservations(db: Session, rows: List[dict]) -> None:
+    """
+    insert reservation หลายแถวใน statement เดียว + เพิ่ม reserved_qty (ไม่ commit)
+    caller ต้อง lock แถว variant ไว้แล้ว (lock_available_stock)
+    """
+    if not rows:
+        return
+    db.execute(insert(StockReservation), rows)
+
+    qty_by_variant: Dict[UUID, int] = {}
+    for row in rows:
+        qty_by_variant[row["variant_id"]] = qty_by_variant.get(row["variant_id"], 0) + int(row["quantity"])
+    _adjust_reserved(db, qty_by_variant, +1)
+
+
+def release_reservations(db: Session, *criteria) -> Dict[UUID, int]:
+    """
+    ลบ reservation ตามเงื่อนไข (เช่น order_id / หมดอายุ) แล้วคืน reserved_qty (ไม่ commit)
+    ใช้ตอนยกเลิก / หมดเวลาชำระเงิน — ตอนชำระเงินสำเร็จใช้ stock_service.commit_stock_for_order
+
+    Returns:
+        {variant_id: quantity ที่ release}
+    """
+    released = db.execute(
+        delete(StockReservation)
+        .where(*criteria)
+        .returning(StockReservation.variant_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    qty_by_variant: Dict[UUID, int] = {}
+    for variant_id, quantity in released:
+        qty_by_variant[variant_id] = qty_by_variant.get(variant_id, 0) + int(quantity)
+    if not qty_by_variant:
+        return qty_by_variant
+
+    # lock ตามลำดับเดียวกับ checkout ก่อน UPDATE กัน deadlock
+    db.execute(
+        select(ProductVariant.variant_id)
+        .where(ProductVariant.variant_id.in_(list(qty_by_variant)))
+        .order_by(ProductVariant.variant_id)
+        .with_for_update(of=ProductVariant)
+    ).all()
+    _adjust_reserved(db, qty_by_variant, -1)
+    return qty_by_variant
+
+
+def reconcile_reserved_qty(db: Session) -> int:
+    """
+    เทียบ reserved_qty กับผลรวมจริงของ stock_reservations แล้วแก้ให้ตรง (commit)
+    ค่าเพี้ยน = มี write path ที่ลบ / เพิ่ม reservation โดยไม่ผ่าน repository นี้
+
+    Returns:
+        จำนวน variant ที่ค่าเพี้ยน
+    """
+    actual = (
+        select(
+            StockReservation.variant_id,
+            func.sum(StockReservation.quantity).label("quantity"),
         )
-        .scalar()
+        .group_by(StockReservation.variant_id)
+        .subquery()
     )
-    return int(total or 0)
+    expected = func.coalesce(actual.c.quantity, 0)
+    drifted = db.execute(
+        select(ProductVariant.variant_id, ProductVariant.reserved_qty, expected)
+        .outerjoin(actual, actual.c.variant_id == ProductVariant.variant_id)
+        .where(ProductVariant.reserved_qty != expected)
+    ).all()
+
+    fixed = 0
+    for variant_id, _, _ in drifted:
+        # lock แล้วนับใหม่ (statement ใหม่เห็น checkout / release ที่ commit ระหว่างรอ lock)
+        counter = db.execute(
+            select(ProductVariant.reserved_qty)
+            .where(ProductVariant.variant_id == variant_id)
+            .with_for_update(of=ProductVariant)
+        ).scalar()
+        real = db.execute(
+            select(func.coalesce(func.sum(StockReservation.quantity), 0))
+            .where(StockReservation.variant_id == variant_id)
+        ).scalar()
+        if counter is not None and counter != real:
+            print(f"⚠️ [Stock] reserved_qty drift on variant {variant_id}: counter={counter}, reservations={real}")
+            db.execute(
+                update(ProductVariant)
+                .where(ProductVariant.variant_id == variant_id)
+                .values(reserved_qty=real)
+                .execution_options(synchronize_session=False)
+            )
+            fixed += 1
+        db.commit()  # ปล่อย lock ทีละ variant
+    return fixed
@@ -0,0 +1,188 @@
+# app/repositories/stripe_event_repository.py
+"""
+คิว Stripe webhook บนตาราง stripe_events
+
+- save_event: endpoint บันทึก event ดิบ (event_id ซ้ำ = Stripe ส่งซ้ำ → ไม่บันทึกซ้ำ)
+- claim_events: worker จอง event ที่ถึงเวลาเป็นชุด (SKIP LOCKED → หลาย worker แบ่งงานกันได้)
+  event ของ ordering_key เดียวกันถูกจองได้ทีละตัว ตามลำดับ event.created
+- mark_processed / mark_failed: ผลการประมวลผล (ครบจำนวนครั้ง → DEAD)
+- requeue_events: ส่ง event กลับเข้าคิว (replay)
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.models.stripe_event import StripeEvent, StripeEventStatus
+from app.utils.now_utc import now_utc
+
+# event ที่ยังไม่จบ → กั้น event หลังจากนั้นของ ordering_key เดียวกัน
+# (DEAD ไม่กั้น ไม่อย่างนั้น payment นั้นจะค้างทั้งสายจนกว่าจะ replay)
+UNFINISHED_STATUSES = (
+    StripeEventStatus.PENDING,
+    StripeEventStatus.PROCESSING,
+    StripeEventStatus.FAILED,
+)
+
+
+async def save_event(db: AsyncSession, values: dict) -> bool:
+    """บันทึก event ใหม่ (status PENDING) → False ถ้ามี event_id นี้อยู่แล้ว"""
+    stmt = (
+        pg_insert(StripeEvent)
+        .values(**values, status=StripeEventStatus.PENDING, attempts=0)
+        .on_conflict_do_nothing(index_elements=[StripeEvent.event_id])
+        .returning(StripeEvent.event_id)
+    )
+    inserted = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return inserted is not None
+
+
+def claim_events(db: Session, batch_size: int, lease_seconds: int) -> List[Tuple[str, dict, int]]:
+    """
+    จอง event ที่ถึงเวลาประมวลผล → PROCESSING (ถือไว้ lease_seconds) แล้ว commit
+    คืน [(event_id, payload, attempts)] เรียงตาม event.created
+
+    - PENDING / FAILED ที่ถึง next_attempt_at
+    - PROCESSING ที่ lease หมด (worker ตายระหว่างประมวลผล)
+    - ต้องไม่มี event ก่อนหน้าของ ordering_key เดียวกันที่ยังไม่จบ
+    """
+    now = now_utc()
+    earlier = aliased(StripeEvent)
+    blocked = exists().where(
+        earlier.ordering_key == StripeEvent.ordering_key,
+        earlier.status.in_(UNFINISHED_STATUSES),
+        tuple_(earlier.event_created_at, earlier.event_id)
+        < tuple_(StripeEvent.event_created_at, StripeEvent.event_id),
+    )
+    due = or_(
+        and_(
+            StripeEvent.status.in_([StripeEventStatus.PENDING, StripeEventStatus.FAILED]),
+            or_(StripeEvent.next_attempt_at.is_(None), StripeEvent.next_attempt_at <= now),
+        ),
+        and_(
+            StripeEvent.status == StripeEventStatus.PROCESSING,
+            StripeEvent.locked_until < now,
+        ),
+    )
+    candidates = (
+        select(StripeEvent.event_id)
+        .where(due, ~blocked)
+        .order_by(StripeEvent.event_created_at, StripeEvent.event_id)
+        .limit(batch_size)
+        .with_for_update(of=StripeEvent, skip_locked=True)
+        .cte("candidates")
+    )
+    rows = db.execute(
+        update(StripeEvent)
+        .where(StripeEvent.event_id.in_(select(candidates.c.event_id)))
+        .values(
+            status=StripeEventStatus.PROCESSING,
+            attempts=StripeEvent.attempts + 1,
+            locked_until=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(StripeEvent.event_id, StripeEvent.payload, StripeEvent.attempts, StripeEvent.event_created_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    rows.sort(key=lambda r: (r.event_created_at, r.event_id))
+    return [(r.event_id, r.payload, r.attempts) for r in rows]
+
+
+def mark_processed(db: Session, event_id: str) -> None:
+    db.execute(
+        update(StripeEvent)
+        .where(StripeEvent.event_id == event_id)
+        .values(
+            status=StripeEventStatus.PROCESSED,
+            processed_at=now_utc(),
+            locked_until=None,
+            next_attempt_at=None,
+            last_error=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def mark_failed(
+    db: Session,
+    event_id: str,
+    attempts: int,
+    error: str,
+    max_attempts: int,
+    retry_base_seconds: int,
+) -> str:
+    """ประมวลผลไม่สำเร็จ → FAILED (retry แบบ backoff) หรือ DEAD เมื่อครบ max_attempts"""
+    status = StripeEventStatus.DEAD if attempts >= max_attempts else StripeEventStatus.FAILED
+    delay = retry_base_seconds * (2 ** max(attempts - 1, 0))
+    db.execute(
+        update(StripeEvent)
+        .where(StripeEvent.event_id == event_id)
+        .values(
+            status=status,
+            locked_until=None,
+            next_attempt_at=now_utc() + timedelta(seconds=delay) if status == StripeEventStatus.FAILED else None,
+            last_error=error[:2000],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return status
+
+
+def requeue_events(
+    db: Session,
+    event_ids: Optional[Iterable[str]] = None,
+    statuses: Iterable[str] = (StripeEventStatus.DEAD,),
+    since: Optional[datetime] = None,
+) -> List[str]:
+    """
+    ส่ง event กลับเข้าคิว (PENDING, attempts = 0)
+    event_ids ระบุ → เฉพาะ event เหล่านั้น (สถานะใดก็ได้ ยกเว้นที่กำลังประมวลผล)
+    ไม่ระบุ → event ที่อยู่ใน statuses (ตั้งแต่ since)
+    """
+    criteria = [StripeEvent.status != StripeEventStatus.PROCESSING]
+    if event_ids is not None:
+        criteria.append(StripeEvent.event_id.in_(list(event_ids)))
+    else:
+        criteria.append(StripeEvent.status.in_(list(statuses)))
+    if since is not None:
+        criteria.append(StripeEvent.created_at >= since)
+
+    requeued = db.execute(
+        update(StripeEvent)
+        .where(*criteria)
+        .values(
+            status=StripeEventStatus.PENDING,
+            attempts=0,
+            next_attempt_at=None,
+            locked_until=None,
+            last_error=None,
+        )
+        .returning(StripeEvent.event_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    return requeued
+
+
+def queue_stats(db: Session) -> Dict[str, object]:
+    """จำนวน event แต่ละสถานะ + อายุของ event ที่ค้างนานที่สุด (วินาที)"""
+    counts = dict(
+        db.query(StripeEvent.status, func.count())
+        .group_by(StripeEvent.status)
+        .all()
+    )
+    oldest = (
+        db.query(func.min(StripeEvent.created_at))
+        .filter(StripeEvent.status.in_(UNFINISHED_STATUSES))
+        .scalar()
+    )
+    return {
+        "counts": counts,
+        "oldest_unfinished_age_seconds": round((now_utc() - oldest).total_seconds(), 1) if oldest else None,
+    }
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.models.user import User
 from uuid import UUID
 from sqlalchemy import or_
+from app.core.principal import invalidate_principal
 from app.core.security import hash_password
 
 
@@ -45,6 +46,7 @@ def update_is_active_status(db: Session, user_id: UUID, is_active: bool) -> User
     if not user:
         return None
     user.is_active = is_active
+    invalidate_principal(db, user.user_id)
     db.flush()
     db.refresh(user)
     return user
@@ -0,0 +1,104 @@
+# app/repositories/vton_cache_repository.py
+"""
+cache ผลลัพธ์ลองเสื้อบนตาราง vton_result_cache
+
+- lookup: หา cache_key → อัปเดต hits / last_used_at (LRU) ใน transaction ของผู้เรียก
+  (lock แถวไว้จน commit → evict ที่วิ่งพร้อมกันรอจนสร้าง session ที่อ้างไฟล์เสร็จ)
+- store: บันทึกผลลัพธ์ใหม่ (key ซ้ำ = มี worker อื่นบันทึกแล้ว → ไม่ทับ)
+- evict: ลบแถวที่ใช้ล่าสุดเก่าที่สุดจนรวมไม่เกิน max_bytes และ max_entries
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.product import VTONSession
+from app.models.vton_result_cache import VTONResultCache
+from app.utils.now_utc import now_utc
+
+
+def lookup(db: Session, cache_key: str) -> Optional[str]:
+    """คืน result_image_url ของ cache_key (ไม่ commit)"""
+    stmt = (
+        update(VTONResultCache)
+        .where(VTONResultCache.cache_key == cache_key)
+        .values(hits=VTONResultCache.hits + 1, last_used_at=now_utc())
+        .returning(VTONResultCache.result_image_url)
+    )
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def store(db: Session, cache_key: str, result_image_url: str, size_bytes: int) -> bool:
+    """บันทึกผลลัพธ์ (ไม่ commit) → False ถ้ามี key นี้อยู่แล้ว"""
+    stmt = (
+        pg_insert(VTONResultCache)
+        .values(
+            cache_key=cache_key,
+            result_image_url=result_image_url,
+            size_bytes=size_bytes or 0,
+            hits=0,
+        )
+        .on_conflict_do_nothing(index_elements=[VTONResultCache.cache_key])
+        .returning(VTONResultCache.cache_key)
+    )
+    return db.execute(stmt).scalar_one_or_none() is not None
+
+
+def is_cached_url(db: Session, result_image_url: str) -> bool:
+    return db.query(
+        db.query(VTONResultCache.cache_key)
+        .filter(VTONResultCache.result_image_url == result_image_url)
+        .exists()
+    ).scalar()
+
+
+def evict(db: Session, max_bytes: int, max_entries: int) -> List[str]:
+    """
+    ลบแถวที่เกินขนาด (เรียงจากใช้ล่าสุด → เก่าสุด แล้วตัดส่วนที่ล้น) แล้ว commit
+    คืน result_image_url ที่ถูกลบออกจาก cache (ผู้เรียกตัดสินใจลบไฟล์เอง)
+    """
+    rows = db.execute(
+        text(
+            """
+            WITH ranked AS (
+                SELECT cache_key,
+                       SUM(size_bytes) OVER w AS running_bytes,
+                       ROW_NUMBER() OVER w AS rn
+                FROM vton_result_cache
+                WINDOW w AS (ORDER BY last_used_at DESC, cache_key)
+            )
+            DELETE FROM vton_result_cache c
+            USING ranked r
+            WHERE c.cache_key = r.cache_key
+              AND (r.running_bytes > :max_bytes OR r.rn > :max_entries)
+            RETURNING c.result_image_url
+            """
+        ),
+        {"max_bytes": max_bytes, "max_entries": max_entries},
+    ).scalars().all()
+    db.commit()
+    return list(rows)
+
+
+def urls_in_use(db: Session, urls: Iterable[str]) -> Set[str]:
+    """ไฟล์ที่ยังมี VTONSession อ้างถึงอยู่"""
+    urls = list(urls)
+    if not urls:
+        return set()
+    rows = (
+        db.query(VTONSession.result_image_url)
+        .filter(VTONSession.result_image_url.in_(urls))
+        .distinct()
+        .all()
+    )
+    return {url for (url,) in rows}
+
+
+def cache_stats(db: Session) -> Dict[str, object]:
+    entries, total_bytes, total_hits = db.query(
+        func.count(VTONResultCache.cache_key),
+        func.coalesce(func.sum(VTONResultCache.size_bytes), 0),
+        func.coalesce(func.sum(VTONResultCache.hits), 0),
+    ).one()
+    return {"entries": entries, "total_bytes": int(total_bytes), "total_entry_hits": int(total_hits)}
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, case, extract
-from datetime import datetime, timedelta
+from sqlalchemy import func, and_, case
+from datetime import timedelta
 from typing import Optional
 
-from app.db.database import get_db
+from app.db.database import get_admin_db
 from app.core.authz import authenticate_token
 from app.models.store import Store
 from app.models.product import Product, ProductVariant, VTONSession
@@ -15,6 +15,8 @@ from app.models.category import Category
 from app.models.review import Review
 from app.models.order_item import OrderItem
 from app.models.vton_background import VTONBackground
+from app.repositories import daily_sales_repository
+from app.utils.now_utc import now_thai
 from app.utils.response_handler import success_response, error_response
 
 router = APIRouter(prefix="/admin/dashboard", tags=["Admin Dashboard"])
@@ -28,7 +30,7 @@ def check_admin(auth_user):
 
 @router.get("/overview")
 def get_dashboard_overview(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """
@@ -111,7 +113,7 @@ def get_dashboard_overview(
 
 @router.get("/products-by-category")
 def get_products_by_category(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """จำนวนสินค้าแต่ละหมวดหมู่"""
@@ -149,7 +151,7 @@ def get_products_by_category(
 @router.get("/sales")
 def get_sales_statistics(
     period: str = Query("daily", regex="^(daily|weekly|monthly)$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """
@@ -157,111 +159,43 @@ def get_sales_statistics(
     - daily: 7 วันล่าสุด
     - weekly: 4 สัปดาห์ล่าสุด
     - monthly: 6 เดือนล่าสุด
+
+    นิยามเดียวกับเดิม: total_price ของออเดอร์ทุกสถานะยกเว้น UNPAID / CANCELLED (รวม RETURNING / RETURNED)
+    จัดกลุ่มตามวันที่ชำระเงิน (paid_at) — ต่างจากเดิมตรงที่ตัดวันตามเวลาไทย (เดิมตัดตาม UTC)
+    และไม่นับออเดอร์ของร้านที่ถูกลบไปแล้ว (store_id = NULL)
     """
     try:
         check_admin(auth_user)
 
-        now = datetime.utcnow()
+        # อ่าน paid_revenue จาก rollup รายวัน (daily_store_sales) แทนการ sum orders ทั้งหมด
+        # bucket ที่ไม่มีออเดอร์ชำระเงินไม่แสดง (เหมือนเดิม)
+        today = now_thai().date()
 
         if period == "daily":
             # 7 วันล่าสุด
-            start_date = now - timedelta(days=7)
-            
-            results = (
-                db.query(
-                    func.date(Order.paid_at).label("date"),
-                    func.sum(Order.total_price).label("total")
-                )
-                .filter(
-                    and_(
-                        Order.order_status != OrderStatus.UNPAID.value,
-                        Order.order_status != OrderStatus.CANCELLED.value,
-                        Order.paid_at >= start_date
-                    )
-                )
-                .group_by(func.date(Order.paid_at))
-                .order_by(func.date(Order.paid_at))
-                .all()
-            )
-
+            rows = daily_sales_repository.sales_by_bucket(db, today - timedelta(days=7), today, "day")
             data = [
-                {
-                    "label": r.date.strftime("%d/%m") if r.date else "",
-                    "value": float(r.total or 0)
-                }
-                for r in results
+                {"label": r.bucket.strftime("%d/%m"), "value": float(r.paid_revenue or 0)}
+                for r in rows if r.paid_order_count
             ]
 
         elif period == "weekly":
             # 4 สัปดาห์ล่าสุด
-            start_date = now - timedelta(weeks=4)
-            
-            results = (
-                db.query(
-                    extract('year', Order.paid_at).label("year"),
-                    extract('week', Order.paid_at).label("week"),
-                    func.sum(Order.total_price).label("total")
-                )
-                .filter(
-                    and_(
-                        Order.order_status != OrderStatus.UNPAID.value,
-                        Order.order_status != OrderStatus.CANCELLED.value,
-                        Order.paid_at >= start_date
-                    )
-                )
-                .group_by(
-                    extract('year', Order.paid_at),
-                    extract('week', Order.paid_at)
-                )
-                .order_by(
-                    extract('year', Order.paid_at),
-                    extract('week', Order.paid_at)
-                )
-                .all()
-            )
-
+            rows = daily_sales_repository.sales_by_bucket(db, today - timedelta(weeks=4), today, "week")
             data = [
                 {
-                    "label": f"W{int(r.week)}/{int(r.year)}",
-                    "value": float(r.total or 0)
+                    "label": f"W{r.bucket.isocalendar()[1]}/{r.bucket.isocalendar()[0]}",
+                    "value": float(r.paid_revenue or 0)
                 }
-                for r in results
+                for r in rows if r.paid_order_count
             ]
 
         else:  # monthly
             # 6 เดือนล่าสุด
-            start_date = now - timedelta(days=180)
-            
-            results = (
-                db.query(
-                    extract('year', Order.paid_at).label("year"),
-                    extract('month', Order.paid_at).label("month"),
-                    func.sum(Order.total_price).label("total")
-                )
-                .filter(
-                    and_(
-                        Order.order_status != OrderStatus.UNPAID.value,
-                        Order.order_status != OrderStatus.CANCELLED.value,
-                        Order.paid_at >= start_date
-                    )
-                )
-                .group_by(
-                    extract('year', Order.paid_at),
-                    extract('month', Order.paid_at)
-                )
-                .order_by(
-                    extract('year', Order.paid_at),
-                    extract('month', Order.paid_at)
-                )
-                .all()
-            )
-
+            rows = daily_sales_repository.sales_by_bucket(db, today - timedelta(days=180), today, "month")
             data = [
-                {
-                    "label": f"{int(r.month)}/{int(r.year)}",
-                    "value": float(r.total or 0)
-                }
-                for r in results
+                {"label": f"{r.bucket.month}/{r.bucket.year}", "value": float(r.paid_revenue or 0)}
+                for r in rows if r.paid_order_count
             ]
 
         return success_response(f"ดึงข้อมูลยอดขาย ({period}) สำเร็จ", {
@@ -279,7 +213,7 @@ def get_sales_statistics(
 
 @router.get("/payment-methods")
 def get_payment_method_distribution(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """สัดส่วนช่องทางการชำระเงิน"""
@@ -318,7 +252,7 @@ def get_payment_method_distribution(
 
 @router.get("/order-status")
 def get_order_status_distribution(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """
@@ -386,7 +320,7 @@ def get_order_status_distribution(
 
 @router.get("/vton-usage")
 def get_vton_usage(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """จำนวนการใช้งาน VTON"""
@@ -430,7 +364,7 @@ def get_vton_usage(
 @router.get("/low-stock-products")
 def get_low_stock_products(
     threshold: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """สินค้าที่เหลือน้อยกว่า threshold (default: 10)"""
@@ -487,7 +421,7 @@ def get_low_stock_products(
 
 @router.get("/ratings")
 def get_ratings_overview(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """ภาพรวมเรทติ้ง"""
@@ -535,7 +469,7 @@ def get_ratings_overview(
 
 @router.get("/order-items-stats")
 def get_order_items_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_admin_db),
     auth_user=Depends(authenticate_token()),
 ):
     """
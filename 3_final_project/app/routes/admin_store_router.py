@@ -21,7 +21,9 @@ from app.core.config import settings
 from app.models.store import Store
 from app.models.product import Product
 from app.models.user import User
+from app.repositories import product_listing_repository, search_index_repository
 from app.utils.response_handler import success_response, error_response
+from app.services import catalog_cache_service
 from app.services.store_service import update_store_service
 from app.services.product_service import update_product_service
 
@@ -190,6 +192,8 @@ def toggle_store_status(
             return error_response("ไม่พบร้านค้า", {}, 404)
 
         store.is_active = is_active
+        product_listing_repository.refresh_store(db, store.store_id)
+        catalog_cache_service.invalidate_store(db, store.store_id, with_products=True)
         
         db.commit()
         db.refresh(store)
@@ -384,6 +388,9 @@ def toggle_product_status(
         else:
             product.closed_by = None
 
+        product_listing_repository.refresh_products(db, [product.product_id])
+        search_index_repository.index_product(db, product)
+        catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
         db.commit()
         db.refresh(product)
         
@@ -1,7 +1,6 @@
 # app/routes/chat_ws_router.py
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from sqlalchemy.orm import Session
-from typing import Dict
 import json
 from uuid import UUID
 import jwt
@@ -11,17 +10,15 @@ from app.db.database import get_db
 from app.realtime.socket_manager import manager
 from app.services.chat_service import ChatService
 from app.repositories.chat_repository import ChatRepository
-from app.repositories.user_repository import UserRepository
 from app.repositories.store_repository import StoreRepository
 from app.core.config import settings
+from app.core.principal import get_principal
 
 router = APIRouter(tags=["Chat WebSocket"])
 
-active_connections: Dict[str, WebSocket] = {}
-
 
 def verify_token(token: str, db: Session):
-    """ตรวจสอบ JWT token และคืน user object"""
+    """ตรวจสอบ JWT token และคืน user (Principal จาก cache)"""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         print("[TOKEN PAYLOAD]", payload)
@@ -30,7 +27,7 @@ def verify_token(token: str, db: Session):
         if not user_id:
             return None
 
-        user = UserRepository.get_user_by_id(db, UUID(user_id))
+        user = get_principal(db, user_id)
         print("[USER] from token", getattr(user, "first_name", "UNKNOWN"))
         return user
     except Exception as e:
@@ -53,15 +50,11 @@ async def chat_websocket(
         return
 
     user_id = str(user.user_id)
-    user_key = user_id
 
     # ✅ Accept WebSocket connection (ครั้งเดียวที่นี่)
     await websocket.accept()
     print(f"[WS] User {user_id} connected")
 
-    # Store connection
-    active_connections[user_key] = websocket
-
     # ✅ Join ห้องส่วนตัวของ user
     await manager.connect(f"user:{user_id}", websocket)
 
@@ -79,8 +72,17 @@ async def chat_websocket(
         while True:
             # รับข้อความจาก client
             raw = await websocket.receive_text()
+            manager.touch(websocket)
             message_data = json.loads(raw)
 
+            # ========== HEARTBEAT ==========
+            # เปิด WS_IDLE_TIMEOUT_SECONDS: server ส่ง {"type": "ping"} → client ตอบ {"type": "pong"} (แค่ touch ก็พอ)
+            if message_data.get("type") == "pong":
+                continue
+            if message_data.get("type") == "ping":
+                await websocket.send_json({"type": "pong", "timestamp": message_data.get("timestamp")})
+                continue
+
             action = message_data.get("action")
             conversation_id = message_data.get("conversation_id")
 
@@ -266,11 +268,7 @@ async def chat_websocket(
             pass
 
     finally:
-        # ✅ Cleanup
-        if user_key in active_connections:
-            del active_connections[user_key]
-
-        # ออกจากทุกห้องที่เคย join
+        # ✅ Cleanup: ออกจากทุกห้องที่เคย join
         for room in list(joined_rooms):
             manager.disconnect(room, websocket)
         
@@ -14,6 +14,7 @@ from app.utils.response_handler import success_response
 from app.models.order import Order
 from app.models.payment import Payment, PaymentStatus
 from app.models.stock_reservation import StockReservation
+from app.repositories.stock_reservation_repository import release_reservations
 from app.models.user import User
 
 router = APIRouter(
@@ -54,9 +55,7 @@ def cancel_reservation(
     order.order_status = "CANCELLED"
     order.order_text_status = "ยกเลิกโดยผู้ใช้"
     
-    db.query(StockReservation).filter(
-        StockReservation.order_id == order_id
-    ).delete(synchronize_session=False)
+    release_reservations(db, StockReservation.order_id == order_id)
     
     if order.payment_id:
         payment = db.query(Payment).filter(
@@ -0,0 +1,129 @@
+# app/routes/internal_router.py
+"""
+Internal Router - ข้อมูลสำหรับ monitor ระบบ (เฉพาะ Admin)
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core import http_client
+from app.core.authz import authorize_role
+from app.core.cache import cache
+from app.core.redis_client import get_redis
+from app.db.database import get_admin_db
+from app.db.pool_metrics import db_stats
+from app.realtime.socket_manager import manager
+from app.repositories.stripe_event_repository import queue_stats
+from app.services.vton_service import VTONService
+from app.tasks.stock_tasks import get_sweep_metrics
+from app.utils.response_handler import success_response
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/cache-stats")
+def get_cache_stats(auth_admin=Depends(authorize_role(["admin"]))):
+    """hit / miss ของ catalog cache ใน process นี้"""
+    return success_response("Cache stats", cache.stats())
+
+
+@router.get("/db-stats")
+def get_db_stats(auth_admin=Depends(authorize_role(["admin"]))):
+    """
+    สถิติ connection pool ของแต่ละ engine (api / worker / admin) ใน process นี้
+    - checked_out: connection ที่ถูกใช้อยู่
+    - checkout_wait_ms_*: เวลารอ connection ว่าง → สูง = pool เล็กไป
+    - slow_queries: query ที่ช้ากว่า DB_SLOW_QUERY_MS
+    """
+    return success_response("DB stats", db_stats())
+
+
+@router.get("/sweeper-stats")
+def get_sweeper_stats(auth_admin=Depends(authorize_role(["admin"]))):
+    """
+    ผลของ sweeper ยกเลิกออเดอร์หมดเวลา (รวมทุก worker)
+    - total_*: ยอดสะสม, last_run: จำนวนแถวที่จัดการ + เวลาที่ใช้ในรอบล่าสุด
+    """
+    return success_response("Reservation sweeper stats", get_sweep_metrics())
+
+
+@router.get("/stripe-events")
+def get_stripe_event_stats(
+    db: Session = Depends(get_admin_db),
+    auth_admin=Depends(authorize_role(["admin"])),
+):
+    """
+    คิว Stripe webhook
+    - counts: จำนวน event แต่ละสถานะ (DEAD = ต้อง replay: python -m app.scripts.replay_stripe_events)
+    - oldest_unfinished_age_seconds: event ที่ค้างนานที่สุด → สูง = worker ไม่ทัน / ไม่ได้รัน
+    """
+    return success_response("Stripe event queue stats", queue_stats(db))
+
+
+@router.get("/realtime-stats")
+async def get_realtime_stats(
+    room: Optional[str] = Query(None, description="เช่น user:<user_id> → นับ connection ทั้ง cluster"),
+    auth_admin=Depends(authorize_role(["admin"])),
+):
+    """WebSocket ของ process นี้ + จำนวน connection ของ room ทั้ง cluster (presence)"""
+    data = manager.stats()
+    if room:
+        data["room"] = room
+        data["cluster_connections"] = await manager.get_cluster_room_size(room)
+    return success_response("Realtime stats", data)
+
+
+@router.get("/realtime-connections")
+def get_realtime_connections(auth_admin=Depends(authorize_role(["admin"]))):
+    """
+    WebSocket ทุกตัวของ process นี้: ห้องที่อยู่, ข้อความ / bytes ที่ค้างในคิว, เงียบมากี่วินาที
+    (WS_IDLE_TIMEOUT_SECONDS > 0: connection ที่ idle_seconds เกินค่านี้จะถูก reaper ปิด)
+    """
+    return success_response("Realtime connections", {
+        **manager.stats(),
+        "connections": manager.connections(),
+    })
+
+
+@router.get("/vton-jobs")
+def get_vton_job_stats(
+    db: Session = Depends(get_admin_db),
+    auth_admin=Depends(authorize_role(["admin"])),
+):
+    """
+    คิวงานลองเสื้อ (VTON)
+    - pending / processing: session ที่ยังไม่เสร็จ, oldest_pending_age_seconds สูง = worker ไม่ทัน / ไม่ได้รัน
+    - broker_queue_depth: task ที่รอใน celery queue (ทุกประเภท ไม่ใช่แค่ VTON)
+    """
+    data = VTONService.vton_queue_stats(db)
+    try:
+        data["broker_queue_depth"] = get_redis().llen("celery")
+    except Exception as e:
+        data["broker_queue_depth"] = None
+        data["broker_error"] = str(e)
+    return success_response("VTON job stats", data)
+
+
+@router.get("/vton-cache")
+def get_vton_cache_stats(
+    db: Session = Depends(get_admin_db),
+    auth_admin=Depends(authorize_role(["admin"])),
+):
+    """
+    cache ผลลัพธ์ลองเสื้อ
+    - hits / misses / hit_ratio: ยอดสะสมของ create_vton_session (hit = ไม่ต้องเรียก IDM API)
+    - entries / total_bytes: ขนาด cache ตอนนี้ (evict เมื่อเกิน max_bytes / max_entries)
+    """
+    return success_response("VTON cache stats", VTONService.vton_cache_stats(db))
+
+
+@router.get("/http-stats")
+def get_http_stats(auth_admin=Depends(authorize_role(["admin"]))):
+    """
+    request ไปยัง service ภายนอกของ process นี้ แยกตาม upstream (idm_vton / citizen / image_fetch)
+    - latency_ms_histogram: จำนวน request ที่ได้ response ภายใน le_<ms> (นับแบบไม่สะสม)
+    - retries / errors: retry ที่เกิดขึ้น และ request ที่ไม่ได้ response เลย
+    (IDM VTON รันใน celery worker → ตัวเลขของ IDM อยู่ใน process ของ worker)
+    """
+    return success_response("HTTP client stats", http_client.stats())
@@ -1,10 +1,10 @@
 # app/routes/notification_router.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from uuid import UUID
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.core.authz import authenticate_token
 from app.models.user import User
 from app.schemas.notification import (
@@ -23,7 +23,7 @@ async def get_my_notifications(
     offset: int = 0,
     role: Optional[str] = Query(None, description="Filter by receiver_role: buyer or seller"),
     current_user: User = Depends(authenticate_token()),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ดึงการแจ้งเตือนของฉัน (แยกตาม role ได้)"""
     notifications, total = await NotificationService.get_user_notifications(
@@ -51,7 +51,7 @@ async def get_my_notifications(
 async def get_unread_count(
     role: Optional[str] = Query(None, description="Filter by receiver_role: buyer or seller"),
     current_user: User = Depends(authenticate_token()),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """นับจำนวนการแจ้งเตือนที่ยังไม่อ่าน"""
     unread_count = await NotificationService.get_unread_count(
@@ -66,19 +66,15 @@ async def get_unread_count(
 @router.get("/badge-count")
 async def get_badge_count(
     current_user: User = Depends(authenticate_token()),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ดึง badge count แยกตาม role (buyer + seller)"""
-    buyer_count = await NotificationService.get_unread_count(
+    counts = await NotificationService.get_unread_counts_by_role(
         db=db,
-        user_id=current_user.user_id,
-        receiver_role="buyer"
-    )
-    seller_count = await NotificationService.get_unread_count(
-        db=db,
-        user_id=current_user.user_id,
-        receiver_role="seller"
+        user_id=current_user.user_id
     )
+    buyer_count = counts.get("buyer", 0)
+    seller_count = counts.get("seller", 0)
     
     return {
         "unread_count": buyer_count + seller_count,
@@ -91,7 +87,7 @@ async def get_badge_count(
 async def mark_notification_as_read(
     notification_id: UUID,
     current_user: User = Depends(authenticate_token()),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ทำเครื่องหมายว่าอ่านแล้ว"""
     success = await NotificationService.mark_as_read(
@@ -110,7 +106,7 @@ async def mark_notification_as_read(
 async def mark_all_as_read(
     role: Optional[str] = Query(None, description="Filter by receiver_role: buyer or seller"),
     current_user: User = Depends(authenticate_token()),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ทำเครื่องหมายทั้งหมดว่าอ่านแล้ว (แยกตาม role ได้)"""
     updated = await NotificationService.mark_all_as_read(
@@ -126,7 +122,7 @@ async def mark_all_as_read(
 async def delete_notification(
     notification_id: UUID,
     current_user: User = Depends(authenticate_token()),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ลบการแจ้งเตือน"""
     success = await NotificationService.delete_notification(
@@ -20,16 +20,24 @@ def get_user_orders(
     status: Optional[List[str]] = Query(None, description="Filter by order status"),  # ← เปลี่ยนตรงนี้
     skip: int = Query(0, description="จำนวนที่ข้าม"),
     limit: int = Query(10, description="จำนวนที่ดึง"),
+    cursor: Optional[str] = Query(None, description="next_cursor จากหน้าก่อน (keyset pagination)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(authenticate_token()),
 ):
-    orders = OrderService.get_user_orders(db, current_user.user_id, status, skip, limit)
+    try:
+        orders, next_cursor = OrderService.get_user_orders(
+            db, current_user.user_id, status, skip, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return success_response(
         message="ดึงรายการคำสั่งซื้อสำเร็จ",
         data={
             "orders": orders,
-            "total": len(orders)
+            "total": len(orders),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
         }
     )
 
@@ -1,12 +1,17 @@
+import mimetypes
 import os
 import uuid
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from fastapi.responses import FileResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
 from app.db.database import get_db
 from app.models.product import ImageType, ProductImage
-from app.utils.file_util import save_file, USE_CLOUDINARY, strip_domain_from_url
+from app.services.image_derivative_service import derivative_url, local_path
+from app.tasks.image_tasks import generate_image_derivatives_task
+from app.utils.file_util import save_file, USE_CLOUDINARY
 from app.utils.response_handler import success_response, error_response
 
 router = APIRouter(prefix="/images", tags=["Images"])
@@ -18,6 +23,8 @@ UPLOAD_DIR = "app/uploads/product/images"
 @router.get("/stream/{image_id}")
 def stream_image(
     image_id: str,
+    size: Optional[Literal["thumb", "card", "detail"]] = Query(None, description="รูปย่อ (ไม่ระบุ = รูปต้นฉบับ)"),
+    fmt: Optional[Literal["webp", "jpeg", "avif"]] = Query(None, alias="format", description="format ของรูปย่อ (default: webp)"),
     db: Session = Depends(get_db),
     # auth_user=Depends(authenticate_token())
 ):
@@ -25,22 +32,32 @@ def stream_image(
     if not image or not image.image_url:
         return error_response("ไม่พบรูปภาพ", {}, 404)
 
+    # ✅ ขอรูปย่อ → ใช้รูปย่อถ้า worker สร้างเสร็จแล้ว ไม่งั้นใช้รูปต้นฉบับ
+    image_url = image.image_url
+    if size:
+        image_url = derivative_url(image.image_url, image.derivatives, size, fmt)
+
     # ✅ โหมด CLOUDINARY → redirect ไปที่ URL ของ Cloudinary เลย
     if USE_CLOUDINARY:
-        return RedirectResponse(url=image.image_url)
+        return RedirectResponse(url=image_url)
 
     # ✅ โหมด DISK → อ่านไฟล์จากดิสก์ (รองรับกรณีเก็บเป็น full URL)
     # 1) ถ้า image_url เป็น full URL เช่น http://localhost:8000/uploads/...
     #    ให้ strip_domain_from_url ตัด domain ทิ้ง เหลือเฉพาะ path
     # 2) จาก path เช่น "/uploads/product/images/a.jpg"
     #    แปลงเป็น "app/uploads/product/images/a.jpg"
-    rel_url_or_path = strip_domain_from_url(image.image_url).lstrip("/")
-    file_path = os.path.join("app", rel_url_or_path)
+    file_path = local_path(image_url)
 
     if not os.path.exists(file_path):
         return error_response("ไม่พบไฟล์ในระบบ", {"path": file_path}, 404)
 
-    return FileResponse(path=file_path, media_type="image/jpeg")
+    # ชื่อไฟล์ไม่ถูกเขียนทับ (uuid) → ให้ client / CDN cache ได้นาน
+    media_type = mimetypes.guess_type(file_path)[0] or "image/jpeg"
+    return FileResponse(
+        path=file_path,
+        media_type=media_type,
+        headers={"Cache-Control": "public, max-age=604800"},
+    )
 
 
 @router.post("/upload")
@@ -93,6 +110,12 @@ async def upload_image(
         db.commit()
         db.refresh(image)
 
+        # ✅ สร้างรูปย่อใน worker (ไม่สำเร็จ → ใช้รูปต้นฉบับไปก่อน, backfill ทีหลังได้)
+        try:
+            generate_image_derivatives_task.delay(str(image.image_id))
+        except Exception as e:
+            print(f"⚠️ [Images] Could not enqueue derivatives for {image.image_id}: {e}")
+
         return success_response(
             "อัปโหลดรูปภาพสำเร็จ",
             {
@@ -1,18 +1,19 @@
 # app/routes/search_router.py
 from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 
-from app.db.database import get_db
-from app.models.user import User
-from app.models.store import Store
+from app.db.database import get_async_db, get_db
+from app.core.principal import Principal
 from app.services.search_service import SearchService
+from app.utils.pagination import COUNT_MODE_PATTERN
 from app.utils.response_handler import success_response, error_response
 
 router = APIRouter(prefix="/home", tags=["Home"])
 
 
-def _get_optional_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
+def _get_optional_user(request: Request, db: Session = Depends(get_db)) -> Optional[Principal]:
     """ดึง current user แบบ optional (ไม่ต้อง login ก็ใช้ได้)"""
     try:
         from app.core.authz import get_current_user_from_cookie
@@ -22,38 +23,59 @@ def _get_optional_user(request: Request, db: Session = Depends(get_db)) -> Optio
 
 
 @router.get("/search")
-def search_products(
+async def search_products(
     request: Request,
     query: Optional[str] = Query(None, description="คำค้นหา"),
     limit: int = Query(20, ge=1, le=100, description="จำนวนต่อหน้า"),
-    offset: int = Query(0, ge=0, description="เริ่มจากตำแหน่ง"),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(_get_optional_user),
+    offset: int = Query(0, ge=0, description="เริ่มจากตำแหน่ง (OFFSET แบบเดิม)"),
+    cursor: Optional[str] = Query(None, description="next_cursor จากหน้าก่อน (keyset pagination)"),
+    count: Optional[str] = Query(None, pattern=COUNT_MODE_PATTERN, description="exact | estimated | none"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Principal] = Depends(_get_optional_user),
 ):
     """
-    ค้นหาสินค้า — ค้นหาเฉพาะชื่อสินค้า
+    ค้นหาสินค้า — ชื่อสินค้า / หมวดหมู่ / ร้าน / คำอธิบาย (เรียงตามความเกี่ยวข้อง, ทนพิมพ์ผิด)
 
-    - ค้นหาด้วยชื่อสินค้า: ?query=เสื้อ
-    - Infinite scroll: ?limit=20&offset=0 → offset=20 → offset=40 ...
+    - ค้นหา: ?query=เสื้อ
+    - Infinite scroll: ?limit=20 → ?limit=20&cursor=<next_cursor> → ...
+    - แบบเดิม: ?limit=20&offset=0 → offset=20 → offset=40 ...
     """
     try:
         # หา store_id ของ user (กรองสินค้าตัวเองออก)
-        exclude_store_id = None
-        if current_user:
-            user_store = db.query(Store).filter(Store.user_id == current_user.user_id).first()
-            if user_store:
-                exclude_store_id = user_store.store_id
+        exclude_store_id = current_user.store_id if current_user else None
 
-        result = SearchService.search_products(
+        result = await SearchService.search_products(
             db=db,
             query=query,
             limit=limit,
             offset=offset,
             exclude_store_id=exclude_store_id,
+            cursor=cursor,
+            count=count,
         )
 
         return success_response("ค้นหาสำเร็จ", result)
 
+    except ValueError as e:
+        return error_response(str(e), {"cursor": str(e)}, 400)
     except Exception as e:
         print(f"❌ Error in search_products: {e}")
-        return error_response("เกิดข้อผิดพลาด", {"error": str(e)}, 500)
\ No newline at end of file
+        return error_response("เกิดข้อผิดพลาด", {"error": str(e)}, 500)
+
+
+@router.get("/search/suggest")
+def suggest_search_terms(
+    q: Optional[str] = Query(None, description="ข้อความที่พิมพ์อยู่"),
+    limit: int = Query(10, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    """
+    Autocomplete ชื่อสินค้าแบบ prefix: ?q=เสื้อ
+    """
+    try:
+        suggestions = SearchService.suggest(db, q, limit)
+        return success_response("ดึงคำแนะนำสำเร็จ", {"suggestions": suggestions})
+
+    except Exception as e:
+        print(f"❌ Error in suggest_search_terms: {e}")
+        return error_response("เกิดข้อผิดพลาด", {"error": str(e)}, 500)
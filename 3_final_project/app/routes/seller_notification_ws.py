@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.realtime.socket_manager import manager
 from app.models.store import Store
-from app.models.user import User
+from app.core.principal import Principal, get_principal
 from jose import JWTError, jwt
 from app.core.config import settings
 import json
@@ -12,16 +12,16 @@ import json
 router = APIRouter(prefix="/ws/seller", tags=["WebSocket Seller"])
 
 
-async def verify_token(token: str, db: Session) -> User | None:
+async def verify_token(token: str, db: Session) -> Principal | None:
     """
-    ตรวจสอบ JWT token และคืนค่า User object
+    ตรวจสอบ JWT token และคืนค่า Principal (ข้อมูลผู้ใช้จาก principal cache)
     
     Args:
         token: JWT token string
         db: Database session
         
     Returns:
-        User object ถ้า token ถูกต้อง, None ถ้าไม่ถูกต้อง
+        Principal ถ้า token ถูกต้อง, None ถ้าไม่ถูกต้อง
     """
     try:
         # Decode JWT token
@@ -37,8 +37,8 @@ async def verify_token(token: str, db: Session) -> User | None:
             print(f"[Token Verify] No user_id in token payload")
             return None
         
-        # ค้นหา user ในฐานข้อมูล
-        user = db.query(User).filter(User.user_id == user_id).first()
+        # ค้นหา user (cache ก่อน แล้วค่อย DB)
+        user = get_principal(db, user_id)
         if not user:
             print(f"[Token Verify] User not found: {user_id}")
             return None
@@ -86,8 +86,8 @@ async def seller_notification_websocket(
             await websocket.close(code=4001, reason="Invalid token")
             return
         
-        # ตรวจสอบว่ามีร้านค้าหรือไม่
-        store = db.query(Store).filter(Store.user_id == user.user_id).first()
+        # ตรวจสอบว่ามีร้านค้าหรือไม่ (store_id อยู่ใน principal แล้ว)
+        store = db.get(Store, user.store_id) if user.store_id else None
         if not store:
             await websocket.close(code=4003, reason="No store found")
             return
@@ -113,6 +113,7 @@ async def seller_notification_websocket(
         while True:
             try:
                 data = await websocket.receive_text()
+                manager.touch(websocket)
                 message = json.loads(data)
                 
                 # รองรับ ping-pong เพื่อเช็คว่า connection ยังมีชีวิตอยู่
@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
+from datetime import date
 from app.db.database import get_db
 from app.core.authz import authenticate_token
 from app.models.order import Order
@@ -11,8 +12,11 @@ from app.models.return_order import ReturnOrder, ReturnStatus
 # from app.models.seller_notification import SellerNotification
 from app.models.user import User
 from app.models.store import Store
+from app.repositories import daily_sales_repository, product_listing_repository
+from app.services import catalog_cache_service
 from app.services.order_service import OrderService
 from app.services.seller_service import SellerService
+from app.utils.pagination import COUNT_MODE_PATTERN
 from app.schemas.seller import ConfirmShipmentRequest, HandleReturnRequest, RejectOrderRequest
 
 router = APIRouter(prefix="/seller", tags=["Seller"])
@@ -30,28 +34,40 @@ def get_user_store(db: Session, user_id: str) -> Store:
 @router.get("/dashboard", response_model=dict)
 async def get_seller_dashboard(
     month: Optional[str] = Query(None, description="YYYY-MM format"),
+    start: Optional[date] = Query(None, description="วันเริ่มของกราฟ (YYYY-MM-DD)"),
+    end: Optional[date] = Query(None, description="วันสุดท้ายของกราฟ (YYYY-MM-DD)"),
+    granularity: str = Query("day", regex="^(day|week|month)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(authenticate_token())
 ):
     """
     ดึงข้อมูล Dashboard สำหรับร้านค้า
     
-    - **month**: เดือนที่ต้องการดูข้อมูล (YYYY-MM) ถ้าไม่ระบุจะใช้เดือนปัจจุบัน
+    - **month**: เดือนที่ต้องการดูกราฟ (YYYY-MM) ถ้าไม่ระบุจะใช้ 7 วันล่าสุด
+    - **start / end**: ช่วงวันที่ของกราฟ (เวลาไทย) ใช้แทน month ได้
+    - **granularity**: day / week / month
     """
     store = get_user_store(db, str(current_user.user_id))
     
     dashboard_data = SellerService.get_seller_dashboard(
         db=db,
         store_id=str(store.store_id),
-        month=month
+        month=month,
+        start=start,
+        end=end,
+        granularity=granularity
     )
     
     return {"data": dashboard_data}
 
 
 @router.get("/orders", response_model=dict)
-async def get_seller_orders(
-    status: Optional[str] = Query(None, description="Filter by order status"),
+def get_seller_orders(
+    status: Optional[List[str]] = Query(None, description="Filter by order status (ส่งหลายค่า หรือคั่นด้วย , ได้)"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="ไม่ส่ง limit / cursor → ทุกออเดอร์ (client เดิม)"),
+    cursor: Optional[str] = Query(None, description="next_cursor จากหน้าก่อน (keyset pagination)"),
+    count: str = Query("none", regex=COUNT_MODE_PATTERN),
+    compact: bool = Query(False, description="ไม่ส่งที่อยู่ / รายการสินค้า (หน้า inbox)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(authenticate_token())
 ):
@@ -59,16 +75,33 @@ async def get_seller_orders(
     ดึงรายการออเดอร์ของร้าน
     
     - **status**: กรองตามสถานะ (PREPARING, SHIPPED, DELIVERED, COMPLETED)
+    - **limit**: ส่งมา (หรือส่ง cursor) = แบ่งหน้า ไม่ส่งทั้งคู่ = ทุกออเดอร์ในครั้งเดียวเหมือนเดิม
+    - **cursor**: next_cursor จากหน้าก่อน
+    - **count**: exact / estimated / none
     """
     store = get_user_store(db, str(current_user.user_id))
+    statuses = [s.strip() for value in status or [] for s in value.split(",") if s.strip()]
     
-    orders = SellerService.get_seller_orders(
-        db=db,
-        store_id=str(store.store_id),
-        status=status
-    )
+    try:
+        orders, next_cursor, total = SellerService.get_seller_orders(
+            db=db,
+            store_id=str(store.store_id),
+            status=statuses,
+            # cursor โดยไม่มี limit → หน้าละ 20
+            limit=limit if limit is not None or cursor is None else 20,
+            cursor=cursor,
+            count=count,
+            compact=compact
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"data": {"orders": orders}}
+    return {"data": {
+        "orders": orders,
+        "total": total,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }}
 
 
 # @router.post("/orders/{order_id}/approve", response_model=dict)
@@ -261,6 +294,12 @@ async def reject_order(
             if variant:
                 variant.stock = (variant.stock or 0) + item.quantity
 
+    # stock กลับมา → sync read model ของหน้า listing
+    restocked_product_ids = {item.product_id for item in order.order_items if item.variant_id}
+    product_listing_repository.refresh_products(db, restocked_product_ids)
+    catalog_cache_service.invalidate_products(db, restocked_product_ids)
+    daily_sales_repository.refresh_orders(db, [order.order_id])
+
     # 5. คืนเงิน Stripe
     refund_result = None
     payment = order.payment
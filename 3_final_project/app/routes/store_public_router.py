@@ -13,6 +13,7 @@ from app.services.store_public_service import (
     get_store_products_by_category_service,
     get_store_categories_service
 )
+from app.utils.pagination import COUNT_MODE_PATTERN
 from app.utils.response_handler import success_response, error_response
 
 router = APIRouter(prefix="/public/stores", tags=["Public Store"])
@@ -50,6 +51,8 @@ def get_store_products(
     category_id: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),  # ← default 10
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", pattern=COUNT_MODE_PATTERN),
     db: Session = Depends(get_db)
 ):
     """
@@ -57,21 +60,24 @@ def get_store_products(
     
     Query Parameters:
         - category_id: กรองตามหมวดหมู่ (optional)
-        - skip: pagination offset
+        - skip: pagination offset (แบบเดิม)
         - limit: จำนวนสินค้าต่อหน้า
+        - cursor: next_cursor จากหน้าก่อน (keyset pagination)
+        - count: exact | estimated | none
     
     Returns:
         - products: รายการสินค้า
-        - total: จำนวนสินค้าทั้งหมด
+        - total: จำนวนสินค้าทั้งหมด (None ถ้า count=none)
+        - next_cursor, has_more
         - skip, limit
     """
     if category_id:
         data, error = get_store_products_by_category_service(
-            db, store_id, category_id, skip, limit
+            db, store_id, category_id, skip, limit, cursor, count
         )
     else:
         data, error = get_store_products_service(
-            db, store_id, skip, limit
+            db, store_id, skip, limit, cursor, count
         )
 
     if error:
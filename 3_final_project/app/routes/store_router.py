@@ -17,7 +17,8 @@ from app.services.store_service import (
     update_store_service,
     delete_store_service
 )
-from app.repositories import store_repository
+from app.repositories import product_listing_repository, store_repository
+from app.services import catalog_cache_service
 from app.utils.file_util import USE_CLOUDINARY, strip_domain_from_url, update_file, delete_file
 from app.utils.response_handler import error_response, success_response
 
@@ -241,6 +242,8 @@ def stripe_connect_success(store_id: str, db: Session = Depends(get_db)):
 
         store.is_active = True
         store.is_stripe_verified = True
+        product_listing_repository.refresh_store(db, store.store_id)
+        catalog_cache_service.invalidate_store(db, store.store_id, with_products=True)
         db.commit()
 
         print(f"[ROUTE] Store {store_id} activated successfully")
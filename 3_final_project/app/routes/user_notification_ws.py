@@ -12,7 +12,7 @@ from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from app.core.config import settings
 from app.db.database import get_db
-from app.models.user import User
+from app.core.principal import Principal, get_principal
 from app.realtime.socket_manager import manager
 import json
 
@@ -23,9 +23,9 @@ router = APIRouter(prefix="/ws/user", tags=["WebSocket User Notification"])
 # Helper: ตรวจสอบ JWT token จาก query string
 # (เดียวกับ pattern ใน seller_notification_ws.py)
 # ─────────────────────────────────────────────
-async def _verify_token(token: str, db: Session) -> User | None:
+async def _verify_token(token: str, db: Session) -> Principal | None:
     """
-    Decode JWT → ค้นหา User → คืน User object
+    Decode JWT → ค้นหา User (principal cache) → คืน Principal
     คืน None ถ้า token ผิดหรือ user ไม่พบ
     """
     try:
@@ -34,7 +34,7 @@ async def _verify_token(token: str, db: Session) -> User | None:
         if not user_id:
             return None
 
-        user = db.query(User).filter(User.user_id == user_id).first()
+        user = get_principal(db, user_id)
         if not user or not user.is_active:
             return None
 
@@ -64,6 +64,8 @@ async def user_notification_websocket(
 
     Ping/Pong:
       client ส่ง { type: "ping" } → server คืน { type: "pong" }
+      server ส่ง { type: "ping" } เมื่อเงียบนาน → client ตอบ { type: "pong" }
+      (ไม่มีข้อความจาก client เกิน WS_IDLE_TIMEOUT_SECONDS → server ปิด connection)
     """
     room: str | None = None
 
@@ -90,6 +92,7 @@ async def user_notification_websocket(
         # 4. Loop รอรับข้อความ (ping / keep-alive)
         while True:
             raw = await websocket.receive_text()
+            manager.touch(websocket)
             try:
                 msg = json.loads(raw)
                 if msg.get("type") == "ping":
@@ -174,7 +174,9 @@ def create_vton_session(
     user: User = Depends(authenticate_token())
 ):
     """
-    สร้าง VTON Session (ลองเสื้อ)
+    สร้าง VTON Session (ลองเสื้อ) → ตอบ 202 พร้อม session_id สถานะ PENDING ทันที
+    ภาพสร้างใน worker: poll GET /vton/sessions/{session_id} หรือรอ event "vton_session"
+    ทาง WebSocket room user:<user_id>
     
     Parameters:
     - user_image_id: ID ของรูปโมเดลผู้ใช้ (Required)
@@ -218,6 +220,16 @@ def get_vton_sessions(
     """ดึงประวัติการลองเสื้อ"""
     return VTONService.get_vton_sessions(db, user, limit)
 
+@router.get("/sessions/{session_id}")
+def get_vton_session(
+    session_id: UUID,
+    db: Session = Depends(get_db),
+    user: User = Depends(authenticate_token())
+):
+    """สถานะ / ผลลัพธ์ของงานลองเสื้อ (PENDING → PROCESSING → COMPLETED / FAILED)"""
+    return VTONService.get_vton_session(db, user, session_id)
+
+
 @router.delete("/sessions/{session_id}")
 def delete_vton_session(
     session_id: UUID,
@@ -27,6 +27,8 @@ class TopProduct(BaseModel):
 class SalesChartData(BaseModel):
     date: str
     sales: float
+    bucket: Optional[str] = None
+    orders: Optional[int] = None
 
 
 class OrderStatusCount(BaseModel):
@@ -0,0 +1,29 @@
+# app/scripts/backfill_daily_sales.py
+"""
+คำนวณ rollup daily_store_sales ใหม่จาก orders / return_orders
+
+    python -m app.scripts.backfill_daily_sales                    # ทั้งหมด
+    python -m app.scripts.backfill_daily_sales --since 2025-01-01 # ตั้งแต่วันที่ (เวลาไทย)
+"""
+import argparse
+from datetime import date
+
+import app.models  # noqa: F401  (register mapper ทั้งหมดก่อน query)
+from app.db.database import AdminSessionLocal
+from app.repositories.daily_sales_repository import rebuild_daily_sales
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild daily_store_sales rollup")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="YYYY-MM-DD")
+    args = parser.parse_args()
+
+    db = AdminSessionLocal()
+    try:
+        rebuild_daily_sales(db, since=args.since)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# app/scripts/backfill_image_derivatives.py
+"""
+สร้างรูปย่อ (thumb / card / detail) ให้ ProductImage ที่ยังไม่มี
+
+    python -m app.scripts.backfill_image_derivatives              # สร้างใน process นี้
+    python -m app.scripts.backfill_image_derivatives --enqueue    # ส่งงานให้ celery worker
+    python -m app.scripts.backfill_image_derivatives --all        # สร้างใหม่ทุกรูป (เปลี่ยนขนาด / format)
+"""
+import argparse
+
+import app.models  # noqa: F401  (register mapper ทั้งหมดก่อน query)
+from app.db.database import WorkerSessionLocal
+from app.models.product import ProductImage
+from app.services.image_derivative_service import generate_for_image
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill product image derivatives")
+    parser.add_argument("--all", action="store_true", help="สร้างใหม่ทุกรูป ไม่ใช่แค่รูปที่ยังไม่มี")
+    parser.add_argument("--enqueue", action="store_true", help="ส่งงานให้ worker แทนการสร้างใน process นี้")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    db = WorkerSessionLocal()
+    try:
+        query = db.query(ProductImage.image_id).order_by(ProductImage.uploaded_at.desc())
+        if not args.all:
+            query = query.filter(ProductImage.derivatives == None)
+        if args.limit:
+            query = query.limit(args.limit)
+        image_ids = [image_id for (image_id,) in query.all()]
+        print(f"[Derivatives] {len(image_ids)} image(s)")
+
+        if args.enqueue:
+            from app.tasks.image_tasks import generate_image_derivatives_task
+
+            for image_id in image_ids:
+                generate_image_derivatives_task.delay(str(image_id))
+            print(f"✅ Enqueued {len(image_ids)} job(s)")
+            return
+
+        done = failed = 0
+        for image_id in image_ids:
+            try:
+                generate_for_image(db, image_id)
+                done += 1
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                print(f"❌ {image_id}: {e}")
+        print(f"✅ Generated {done}, failed {failed}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# app/scripts/replay_stripe_events.py
+"""
+ส่ง Stripe webhook event กลับเข้าคิว stripe_events (replay)
+
+    python -m app.scripts.replay_stripe_events --list                   # ดู event ใน dead-letter
+    python -m app.scripts.replay_stripe_events                          # replay ทุก event ที่ DEAD
+    python -m app.scripts.replay_stripe_events --status FAILED --status DEAD --since 2025-01-01
+    python -m app.scripts.replay_stripe_events --event-id evt_123 --event-id evt_456
+    python -m app.scripts.replay_stripe_events --event-id evt_123 --now  # ประมวลผลใน process นี้เลย
+
+ไม่ใส่ --now → worker (process_stripe_events) ดึงไปประมวลผลในรอบถัดไป
+"""
+import argparse
+from datetime import date, datetime, timezone
+
+import app.models  # noqa: F401  (register mapper ทั้งหมดก่อน query)
+from app.core.config import settings
+from app.db.database import WorkerSessionLocal
+from app.models.stripe_event import StripeEvent, StripeEventStatus
+from app.repositories.stripe_event_repository import requeue_events
+from app.services.stripe_event_service import process_pending_events
+
+
+def _list(db, statuses, since) -> None:
+    query = db.query(StripeEvent).filter(StripeEvent.status.in_(statuses))
+    if since:
+        query = query.filter(StripeEvent.created_at >= since)
+    for e in query.order_by(StripeEvent.event_created_at, StripeEvent.event_id):
+        print(f"{e.event_id}  {e.event_type:<45} {e.status:<7} attempts={e.attempts}  {e.last_error or ''}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay Stripe webhook events")
+    parser.add_argument("--event-id", action="append", dest="event_ids", help="replay เฉพาะ event นี้ (ใส่ซ้ำได้)")
+    parser.add_argument(
+        "--status",
+        action="append",
+        dest="statuses",
+        choices=[StripeEventStatus.DEAD, StripeEventStatus.FAILED, StripeEventStatus.PROCESSED],
+        help="สถานะที่จะ replay (default: DEAD)",
+    )
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="YYYY-MM-DD (วันที่รับ event)")
+    parser.add_argument("--list", action="store_true", help="แสดงรายการ ไม่ replay")
+    parser.add_argument("--now", action="store_true", help="ประมวลผลคิวใน process นี้หลัง replay")
+    args = parser.parse_args()
+
+    statuses = args.statuses or [StripeEventStatus.DEAD]
+    since = datetime.combine(args.since, datetime.min.time(), tzinfo=timezone.utc) if args.since else None
+
+    db = WorkerSessionLocal()
+    try:
+        if args.list:
+            _list(db, statuses, since)
+            return
+
+        requeued = requeue_events(db, event_ids=args.event_ids, statuses=statuses, since=since)
+        print(f"✅ Requeued {len(requeued)} event(s)")
+        for event_id in requeued:
+            print(f"   {event_id}")
+
+        if args.now and requeued:
+            stats = process_pending_events(
+                db,
+                batch_size=settings.STRIPE_EVENT_BATCH_SIZE,
+                max_batches=settings.STRIPE_EVENT_MAX_BATCHES,
+                lease_seconds=settings.STRIPE_EVENT_LEASE_SECONDS,
+                max_attempts=settings.STRIPE_EVENT_MAX_ATTEMPTS,
+                retry_base_seconds=settings.STRIPE_EVENT_RETRY_BASE_SECONDS,
+            )
+            print(f"✅ Processed: {stats}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
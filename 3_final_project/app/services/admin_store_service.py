@@ -11,7 +11,8 @@ from typing import Optional, List, Dict, Any
 from app.models.store import Store
 from app.models.product import Product, ProductImage
 from app.models.user import User
-from app.repositories import store_repository, product_repository
+from app.repositories import product_listing_repository, search_index_repository, store_repository, product_repository
+from app.services import catalog_cache_service
 from app.utils.response_handler import success_response, error_response
 
 
@@ -209,6 +210,8 @@ def toggle_store_status_admin(
         
         old_status = store.is_active
         store.is_active = is_active
+        product_listing_repository.refresh_store(db, store.store_id)
+        catalog_cache_service.invalidate_store(db, store.store_id, with_products=True)
         db.commit()
         db.refresh(store)
         
@@ -342,6 +345,9 @@ def toggle_product_status_admin(
         
         old_status = product.is_active
         product.is_active = is_active
+        product_listing_repository.refresh_products(db, [product.product_id])
+        search_index_repository.index_product(db, product)
+        catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
         db.commit()
         db.refresh(product)
         
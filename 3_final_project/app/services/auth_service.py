@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.repositories import user_repository
 from app.core.security import verify_password, create_access_token, decode_access_token, hash_password
 from app.core.config import settings
+from app.core.principal import invalidate_principal
 # from app.utils.generate_numeric_otp import generate_numeric_otp
 from app.utils.now_utc import now_utc
 from app.schemas.user import UserLogin
@@ -85,6 +86,7 @@ def login_service(db: Session,  user_data):
 
         # print(f"user is active in service: {user.is_active}")
         user.is_active = True
+        invalidate_principal(db, user.user_id)
         # print(f"user is active ture in service: {user.is_active}")
 
         # print(f"service access_token: {access_token}")
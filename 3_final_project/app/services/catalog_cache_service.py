@@ -0,0 +1,85 @@
+# app/services/catalog_cache_service.py
+"""
+Cache key + invalidation ของข้อมูล catalog (หมวดหมู่ / ร้านค้า / สินค้า)
+
+ฝั่งอ่านใช้ cached(key, loader) กับ key จากไฟล์นี้
+ฝั่งเขียนเรียก invalidate_* ก่อน db.commit() → key ถูกลบหลัง commit สำเร็จ
+"""
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import cache, invalidate_on_commit
+from app.models.product import Product
+
+CATEGORY_PREFIX = "catalog:categories:"
+cache.track_prefix(CATEGORY_PREFIX)
+STORE_TTL = 120
+PRODUCT_TTL = 60   # มี stock ของ variant อยู่ด้วย → อายุสั้นกว่า
+CATEGORY_TTL = 600
+
+
+def home_categories_key() -> str:
+    return f"{CATEGORY_PREFIX}home"
+
+
+def categories_key(active_only: bool) -> str:
+    return f"{CATEGORY_PREFIX}all:{'active' if active_only else 'any'}"
+
+
+def category_key(category_id) -> str:
+    return f"{CATEGORY_PREFIX}{category_id}"
+
+
+def store_detail_key(store_id) -> str:
+    return f"catalog:store:{store_id}"
+
+
+def product_detail_key(product_id) -> str:
+    return f"catalog:product:{product_id}"
+
+
+def invalidate_categories(db: Session) -> None:
+    """หมวดหมู่เปลี่ยน หรือจำนวนสินค้าในหมวดเปลี่ยน"""
+    invalidate_on_commit(db, prefixes=[CATEGORY_PREFIX])
+
+
+def invalidate_store(db: Session, store_id: Optional[UUID], with_products: bool = False) -> None:
+    """
+    ข้อมูลร้านเปลี่ยน
+    with_products=True → ลบ product detail ของทั้งร้านด้วย (เปิด/ปิดร้าน, เปลี่ยนชื่อร้าน)
+    """
+    if not store_id:
+        return
+
+    keys = [store_detail_key(store_id)]
+    if with_products:
+        keys += [
+            product_detail_key(pid)
+            for (pid,) in db.query(Product.product_id).filter(Product.store_id == store_id)
+        ]
+    invalidate_on_commit(db, keys=keys, prefixes=[CATEGORY_PREFIX] if with_products else [])
+
+
+def invalidate_products(
+    db: Session,
+    product_ids: Iterable[UUID],
+    store_id: Optional[UUID] = None,
+) -> None:
+    """
+    สินค้าเปลี่ยน → ลบ product detail + store detail (จำนวนสินค้า / เรตติ้ง)
+    + จำนวนสินค้าในหมวดหมู่
+    """
+    product_ids = {pid for pid in product_ids if pid}
+    if not product_ids:
+        return
+
+    store_ids = {store_id} if store_id else {
+        sid for (sid,) in db.query(Product.store_id).filter(Product.product_id.in_(product_ids)).distinct()
+    }
+    invalidate_on_commit(
+        db,
+        keys=[product_detail_key(pid) for pid in product_ids] + [store_detail_key(sid) for sid in store_ids],
+        prefixes=[CATEGORY_PREFIX],
+    )
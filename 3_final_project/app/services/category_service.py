@@ -2,6 +2,7 @@
 """
 Category Service - Updated with SVG Image Upload Support
 """
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException
 from typing import Optional
@@ -10,7 +11,9 @@ import uuid
 
 from app.models.category import Category
 from app.models.product import Product
-from app.repositories import category_repository
+from app.core.cache import cached
+from app.repositories import category_repository, search_index_repository
+from app.services import catalog_cache_service
 from app.utils.response_handler import success_response, error_response
 from app.utils.file_util import (
     save_file, 
@@ -102,6 +105,7 @@ def create_category_service(
             is_active=True
         )
         
+        catalog_cache_service.invalidate_categories(db)
         category = category_repository.create_category(db, category)
         
         return success_response(
@@ -122,67 +126,93 @@ def create_category_service(
         return error_response("เกิดข้อผิดพลาดขณะสร้างหมวดหมู่", {"error": str(e)}, 500)
 
 
+def _load_all_categories(db: Session, active_only: bool) -> list:
+    categories = category_repository.get_all_categories(
+        db, 
+        active_only=active_only
+    )
+
+    # นับจำนวนสินค้าของทุกหมวดหมู่ใน query เดียว
+    count_rows = (
+        db.query(Product.category_id, func.count(Product.product_id))
+        .filter(
+            Product.category_id.in_([cat.category_id for cat in categories]),
+            Product.is_active == True
+        )
+        .group_by(Product.category_id)
+        .all()
+    ) if categories else []
+    product_counts = dict(count_rows)
+
+    result = []
+    for cat in categories:
+        result.append({
+            "category_id": str(cat.category_id),
+            "name": cat.name,
+            "slug": cat.slug,
+            "description": cat.description,
+            "image": cat.image,
+            "is_active": cat.is_active,
+            "product_count": product_counts.get(cat.category_id, 0),
+            "created_at": cat.created_at.isoformat() if cat.created_at else None,
+            "updated_at": cat.updated_at.isoformat() if cat.updated_at else None
+        })
+    return result
+
+
 def get_all_categories_service(db: Session, active_only: bool = True):
     """
-    ดึงหมวดหมู่ทั้งหมด
+    ดึงหมวดหมู่ทั้งหมด (cache — ลบเมื่อหมวดหมู่ / สินค้าเปลี่ยน)
     """
     try:
-        categories = category_repository.get_all_categories(
-            db, 
-            active_only=active_only
+        result = cached(
+            catalog_cache_service.categories_key(active_only),
+            lambda: _load_all_categories(db, active_only),
+            catalog_cache_service.CATEGORY_TTL,
         )
-        
-        result = []
-        for cat in categories:
-            # นับจำนวนสินค้าในแต่ละหมวดหมู่
-            product_count = db.query(Product).filter(
-                Product.category_id == cat.category_id,
-                Product.is_active == True
-            ).count()
-            
-            result.append({
-                "category_id": str(cat.category_id),
-                "name": cat.name,
-                "slug": cat.slug,
-                "description": cat.description,
-                "image": cat.image,
-                "is_active": cat.is_active,
-                "product_count": product_count,
-                "created_at": cat.created_at.isoformat() if cat.created_at else None,
-                "updated_at": cat.updated_at.isoformat() if cat.updated_at else None
-            })
-        
         return success_response("ดึงหมวดหมู่ทั้งหมดสำเร็จ", result)
     except Exception as e:
         print(f"❌ [get_all_categories_service] Error: {e}")
         return error_response("เกิดข้อผิดพลาดขณะดึงหมวดหมู่", {"error": str(e)}, 500)
 
 
+def _load_category(db: Session, category_id: str) -> Optional[dict]:
+    category = category_repository.get_category_by_id(db, category_id)
+    if not category:
+        return None
+
+    product_count = db.query(Product).filter(
+        Product.category_id == category.category_id,
+        Product.is_active == True
+    ).count()
+
+    return {
+        "category_id": str(category.category_id),
+        "name": category.name,
+        "slug": category.slug,
+        "description": category.description,
+        "image": category.image,
+        "is_active": category.is_active,
+        "product_count": product_count,
+        "created_at": category.created_at.isoformat() if category.created_at else None,
+        "updated_at": category.updated_at.isoformat() if category.updated_at else None
+    }
+
+
 def get_category_by_id_service(db: Session, category_id: str):
     """
     ดึงข้อมูลหมวดหมู่ตาม ID
     """
     try:
-        category = category_repository.get_category_by_id(db, category_id)
-        if not category:
+        data = cached(
+            catalog_cache_service.category_key(category_id),
+            lambda: _load_category(db, category_id),
+            catalog_cache_service.CATEGORY_TTL,
+        )
+        if not data:
             return error_response("ไม่พบหมวดหมู่", {}, 404)
-        
-        product_count = db.query(Product).filter(
-            Product.category_id == category.category_id,
-            Product.is_active == True
-        ).count()
-        
-        return success_response("ดึงข้อมูลหมวดหมู่สำเร็จ", {
-            "category_id": str(category.category_id),
-            "name": category.name,
-            "slug": category.slug,
-            "description": category.description,
-            "image": category.image,
-            "is_active": category.is_active,
-            "product_count": product_count,
-            "created_at": category.created_at.isoformat() if category.created_at else None,
-            "updated_at": category.updated_at.isoformat() if category.updated_at else None
-        })
+
+        return success_response("ดึงข้อมูลหมวดหมู่สำเร็จ", data)
     except Exception as e:
         print(f"❌ [get_category_by_id_service] Error: {e}")
         return error_response("เกิดข้อผิดพลาดขณะดึงหมวดหมู่", {"error": str(e)}, 500)
@@ -264,8 +294,14 @@ def update_category_service(
         if is_active is not None:
             category.is_active = is_active
         
+        catalog_cache_service.invalidate_categories(db)
         category = category_repository.update_category(db, category)
         
+        # ชื่อหมวดหมู่อยู่ใน search index ของสินค้า → sync
+        if name is not None:
+            search_index_repository.reindex_category(db, category.category_id)
+            db.commit()
+        
         return success_response("อัพเดทหมวดหมู่สำเร็จ", {
             "category_id": str(category.category_id),
             "name": category.name,
@@ -311,9 +347,11 @@ def delete_category_service(db: Session, category_id: str, hard_delete: bool = F
                 except Exception as e:
                     print(f"⚠️ [delete_category] Failed to delete image: {e}")
             
+            catalog_cache_service.invalidate_categories(db)
             category_repository.hard_delete_category(db, category)
             message = "ลบหมวดหมู่ถาวรสำเร็จ"
         else:
+            catalog_cache_service.invalidate_categories(db)
             category_repository.delete_category(db, category)
             message = "ปิดการใช้งานหมวดหมู่สำเร็จ"
         
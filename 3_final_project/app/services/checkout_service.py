@@ -14,14 +14,12 @@ from app.models.order import Order
 from app.models.payment import Payment, PaymentStatus
 from app.models.shipping_address import ShippingAddress
 from app.models.store import Store
-from app.models.stock_reservation import StockReservation
 from app.models.user import User
 
 from app.schemas.checkout import CheckoutRequest, CheckoutItem, CheckoutResponse
-from app.repositories.stock_reservation_repository import get_active_reserved_quantity
+from app.repositories.stock_reservation_repository import bulk_create_reservations, lock_available_stock
 from app.utils.now_utc import now_utc
 from app.core.config import settings
-from app.utils.order_task import check_order_timeout
 
 
 RESERVATION_MINUTES = 5
@@ -150,34 +148,40 @@ class CheckoutService:
 
     @staticmethod
     def _validate_stock_only(db: Session, items: List[dict]) -> None:
-        now = now_utc()
+        """
+        เช็ค stock ของทุก variant ใน statement เดียว + lock แถว variant จนกว่าจะ commit
+        (reservation ถูก insert ใน transaction เดียวกัน → checkout พร้อมกันขายเกิน stock ไม่ได้)
+        """
+        requested: Dict[UUID, int] = {}
+        variants: Dict[UUID, ProductVariant] = {}
         for item in items:
             variant: ProductVariant = item["variant"]
-            qty = item["quantity"]
+            requested[variant.variant_id] = requested.get(variant.variant_id, 0) + item["quantity"]
+            variants[variant.variant_id] = variant
+
+        stock_by_variant = lock_available_stock(db, requested.keys())
 
-            reserved_qty = get_active_reserved_quantity(db, variant.variant_id, now)
-            available = (variant.stock or 0) - reserved_qty
+        for variant_id, qty in requested.items():
+            stock, reserved_qty = stock_by_variant.get(variant_id, (0, 0))
+            available = stock - reserved_qty
 
             if available < qty:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"สินค้า {variant.sku} คงเหลือไม่พอ (available={available}, requested={qty})",
+                    detail=f"สินค้า {variants[variant_id].sku} คงเหลือไม่พอ (available={available}, requested={qty})",
                 )
 
     @staticmethod
     def _create_reservations(db: Session, items: List[dict], expires_at: datetime) -> None:
-        for item in items:
-            variant: ProductVariant = item["variant"]
-            qty = item["quantity"]
-            order: Order = item["order"]
-
-            reservation = StockReservation(
-                order_id=order.order_id,
-                variant_id=variant.variant_id,
-                quantity=qty,
-                expires_at=expires_at,
-            )
-            db.add(reservation)
+        bulk_create_reservations(db, [
+            {
+                "order_id": item["order"].order_id,
+                "variant_id": item["variant"].variant_id,
+                "quantity": item["quantity"],
+                "expires_at": expires_at,
+            }
+            for item in items
+        ])
 
     @staticmethod
     def checkout(db: Session, user: User, payload: CheckoutRequest) -> CheckoutResponse:
@@ -308,9 +312,7 @@ class CheckoutService:
             payment.stripe_checkout_url = session.url  # Issue #6
             db.commit()
 
-            timeout_seconds = RESERVATION_MINUTES * 60
-            for order in orders:
-                check_order_timeout.apply_async(args=[str(order.order_id)], countdown=timeout_seconds)
+            # หมดเวลาชำระเงิน → sweep_expired_reservations (Celery beat) ยกเลิกให้เป็นชุด
 
             return CheckoutResponse(
                 order_ids=[o.order_id for o in orders],
@@ -0,0 +1,143 @@
+# app/services/image_derivative_service.py
+"""
+รูปย่อของ ProductImage (thumb / card / detail) สร้างใน celery worker หลังอัปโหลด
+
+- แต่ละขนาดบันทึกทุก format ใน IMAGE_DERIVATIVE_FORMATS (default webp + jpeg)
+  ไว้ที่เดียวกับรูปต้นฉบับ: <ชื่อเดิม>_<ขนาด>.<format>
+- ProductImage.derivatives = {"card": {"width": 480, "height": 640, "webp": url, "jpeg": url}, ...}
+  ยังไม่สร้าง / สร้างไม่ได้ → NULL (ใช้รูปต้นฉบับแทน)
+- ไม่ขยายรูปที่เล็กกว่าขนาดที่กำหนด
+"""
+import os
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from PIL import Image, ImageOps, features
+from sqlalchemy.orm import Session
+
+from app.core import http_client
+from app.core.config import settings
+from app.models.product import ProductImage
+from app.repositories.product_listing_repository import refresh_products
+from app.services import catalog_cache_service
+from app.utils.file_util import USE_CLOUDINARY, save_stream, strip_domain_from_url
+
+# ด้านที่ยาวที่สุดของแต่ละขนาด (px)
+DERIVATIVE_SIZES = {
+    "thumb": 200,
+    "card": 480,
+    "detail": 1200,
+}
+FORMAT_OPTIONS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+    "avif": ("AVIF", {"quality": 60}),
+}
+UPLOAD_DIR = "app/uploads/product/images"
+
+
+def enabled_formats():
+    # AVIF ต้องใช้ Pillow ที่ build พร้อม libavif
+    return [
+        f for f in settings.IMAGE_DERIVATIVE_FORMATS
+        if f in FORMAT_OPTIONS and (f != "avif" or features.check("avif"))
+    ]
+
+
+def local_path(image_url: str) -> str:
+    """image_url ของโหมด DISK ("/uploads/..." หรือ full URL) → path บนดิสก์ "app/uploads/..." """
+    rel = strip_domain_from_url(image_url).lstrip("/")
+    return rel if rel.startswith("app/") else os.path.join("app", rel)
+
+
+def derivative_url(image_url: Optional[str], derivatives: Optional[dict], size: str, fmt: Optional[str] = None) -> Optional[str]:
+    """URL ของรูปขนาด size (format ที่ขอ → format แรกที่มี) ไม่มี → รูปต้นฉบับ"""
+    entry = (derivatives or {}).get(size) or {}
+    for f in ([fmt] if fmt else []) + enabled_formats():
+        if entry.get(f):
+            return entry[f]
+    return image_url
+
+
+def _read_original(image_url: str) -> bytes:
+    path = local_path(image_url)
+    if not USE_CLOUDINARY and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    if image_url.startswith(("http://", "https://")):
+        response = http_client.request("image_fetch", "GET", image_url, timeout=30)
+        response.raise_for_status()
+        return response.content
+    raise FileNotFoundError(path)
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    pil_format, options = FORMAT_OPTIONS[fmt]
+    if fmt == "jpeg" and img.mode != "RGB":
+        # JPEG ไม่มี alpha → วางบนพื้นขาว
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A") if "A" in img.getbands() else None)
+        img = background
+    buf = BytesIO()
+    img.save(buf, pil_format, **options)
+    return buf.getvalue()
+
+
+def build_derivatives(data: bytes) -> Dict[str, Tuple[int, int, Dict[str, bytes]]]:
+    """bytes ของรูปต้นฉบับ → {size: (width, height, {format: bytes})}"""
+    with Image.open(BytesIO(data)) as original:
+        # หมุนตาม EXIF ของกล้องมือถือ แล้วแปลงเป็น RGB / RGBA
+        img = ImageOps.exif_transpose(original)
+        img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+
+    result = {}
+    for size, max_edge in DERIVATIVE_SIZES.items():
+        resized = img.copy()
+        resized.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        result[size] = (
+            resized.width,
+            resized.height,
+            {fmt: _encode(resized, fmt) for fmt in enabled_formats()},
+        )
+    return result
+
+
+def _public_url(stored: str) -> str:
+    """ผลของ save_stream → รูปแบบเดียวกับ image_url ของ /images/upload"""
+    if USE_CLOUDINARY:
+        return stored
+    return "/" + os.path.relpath(stored, start="app").replace("\\", "/")
+
+
+def generate_for_image(db: Session, image_id: UUID) -> Optional[dict]:
+    """
+    สร้างรูปย่อของ ProductImage แล้วบันทึก derivatives + refresh product_listing ของสินค้า (commit)
+    คืน derivatives หรือ None ถ้าไม่พบรูป
+    """
+    image = db.query(ProductImage).filter(ProductImage.image_id == image_id).first()
+    if not image or not image.image_url:
+        return None
+
+    data = _read_original(image.image_url)
+    upload_dir = UPLOAD_DIR if USE_CLOUDINARY else os.path.dirname(local_path(image.image_url))
+    stem = os.path.splitext(os.path.basename(strip_domain_from_url(image.image_url)))[0]
+
+    derivatives = {}
+    for size, (width, height, encoded) in build_derivatives(data).items():
+        entry = {"width": width, "height": height}
+        for fmt, payload in encoded.items():
+            stored, _ = save_stream(upload_dir, [payload], f"{stem}_{size}.{'jpg' if fmt == 'jpeg' else fmt}")
+            entry[fmt] = _public_url(stored)
+        derivatives[size] = entry
+
+    image.derivatives = derivatives
+    db.commit()
+
+    # รูปอาจถูกผูกกับสินค้าระหว่างสร้าง → อ่าน product_id ล่าสุดก่อน refresh
+    product_id = db.query(ProductImage.product_id).filter(ProductImage.image_id == image_id).scalar()
+    if product_id:
+        refresh_products(db, [product_id])
+        catalog_cache_service.invalidate_products(db, [product_id])
+        db.commit()
+    return derivatives
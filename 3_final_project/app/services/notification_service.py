@@ -1,4 +1,7 @@
 # app/services/notification_service.py
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from uuid import UUID
@@ -101,9 +104,13 @@ class NotificationService:
                 receiver_role=receiver_role,
                 is_read=False
             )
-            db.add(notification)
-            db.commit()
-            db.refresh(notification)
+            # db เป็น sync Session (มาจาก service อื่น) → ทำงาน DB ใน threadpool ไม่ block event loop
+            def _save():
+                db.add(notification)
+                db.commit()
+                db.refresh(notification)
+
+            await run_in_threadpool(_save)
             
             print(f"[NOTIFICATION_SERVICE] ✅ Notification saved to DB")
             print(f"  - notification_id: {notification.notification_id}")
@@ -114,7 +121,7 @@ class NotificationService:
             print(f"[NOTIFICATION_SERVICE] Exception type: {type(e).__name__}")
             import traceback
             print(f"[NOTIFICATION_SERVICE] Traceback:\n{traceback.format_exc()}")
-            db.rollback()
+            await run_in_threadpool(db.rollback)
             raise
 
         # 2. Broadcast ผ่าน WebSocket
@@ -122,7 +129,7 @@ class NotificationService:
         print(f"[NOTIFICATION_SERVICE] Target room: user:{user_id}")
         
         try:
-            unread_count = await NotificationService.get_unread_count(db=db, user_id=user_id)
+            unread_count = await run_in_threadpool(NotificationService._count_unread, db, user_id)
             print(f"[NOTIFICATION_SERVICE] Current unread_count: {unread_count}")
             
             serialized = NotificationService._serialize_notification(notification)
@@ -161,79 +168,108 @@ class NotificationService:
     # ─────────────────────────────────────────
     # READ: ดึงรายการ / นับ unread
     # ─────────────────────────────────────────
+    @staticmethod
+    def _count_unread(db: Session, user_id: UUID) -> int:
+        """นับ unread ด้วย sync Session (ใช้ตอน broadcast หลังสร้าง notification)"""
+        return db.query(func.count(Notification.notification_id)).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).scalar() or 0
+
     @staticmethod
     async def get_user_notifications(
-        db: Session,
+        db: AsyncSession,
         user_id: UUID,
         limit: int = 50,
         offset: int = 0,
         receiver_role: Optional[str] = None
     ) -> tuple[list[Notification], int]:
         """ดึงการแจ้งเตือนของผู้ใช้ (เรียงล่าสุดก่อน)"""
-        query = db.query(Notification).filter(
-            Notification.user_id == user_id
-        )
+        conditions = [Notification.user_id == user_id]
         if receiver_role:
-            query = query.filter(Notification.receiver_role == receiver_role)
-        query = query.order_by(Notification.created_at.desc())
+            conditions.append(Notification.receiver_role == receiver_role)
 
-        total = query.count()
-        notifications = query.limit(limit).offset(offset).all()
-        return notifications, total
+        total = await db.scalar(
+            select(func.count(Notification.notification_id)).where(*conditions)
+        )
+        result = await db.execute(
+            select(Notification)
+            .where(*conditions)
+            .order_by(Notification.created_at.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        return list(result.scalars().all()), total or 0
 
     @staticmethod
-    async def get_unread_count(db: Session, user_id: UUID, receiver_role: Optional[str] = None) -> int:
+    async def get_unread_count(db: AsyncSession, user_id: UUID, receiver_role: Optional[str] = None) -> int:
         """นับจำนวน notification ที่ยังไม่อ่าน"""
-        query = db.query(Notification).filter(
+        stmt = select(func.count(Notification.notification_id)).where(
             Notification.user_id == user_id,
             Notification.is_read == False
         )
         if receiver_role:
-            query = query.filter(Notification.receiver_role == receiver_role)
-        return query.count()
+            stmt = stmt.where(Notification.receiver_role == receiver_role)
+        return await db.scalar(stmt) or 0
+
+    @staticmethod
+    async def get_unread_counts_by_role(db: AsyncSession, user_id: UUID) -> dict:
+        """นับ unread แยก role ใน query เดียว (badge)"""
+        result = await db.execute(
+            select(Notification.receiver_role, func.count(Notification.notification_id))
+            .where(
+                Notification.user_id == user_id,
+                Notification.is_read == False
+            )
+            .group_by(Notification.receiver_role)
+        )
+        return dict(result.all())
 
     # ─────────────────────────────────────────
     # UPDATE: อ่านแล้ว / อ่านทั้งหมด
     # ─────────────────────────────────────────
     @staticmethod
-    async def mark_as_read(db: Session, notification_id: UUID, user_id: UUID) -> bool:
-        notification = db.query(Notification).filter(
-            Notification.notification_id == notification_id,
-            Notification.user_id == user_id
-        ).first()
-        if not notification:
-            return False
-        notification.is_read = True
-        notification.read_at = now_utc()
-        db.commit()
-        return True
+    async def mark_as_read(db: AsyncSession, notification_id: UUID, user_id: UUID) -> bool:
+        result = await db.execute(
+            update(Notification)
+            .where(
+                Notification.notification_id == notification_id,
+                Notification.user_id == user_id
+            )
+            .values(is_read=True, read_at=now_utc())
+        )
+        await db.commit()
+        return result.rowcount > 0
 
     @staticmethod
-    async def mark_all_as_read(db: Session, user_id: UUID, receiver_role: Optional[str] = None) -> int:
-        query = db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.is_read == False
+    async def mark_all_as_read(db: AsyncSession, user_id: UUID, receiver_role: Optional[str] = None) -> int:
+        stmt = (
+            update(Notification)
+            .where(
+                Notification.user_id == user_id,
+                Notification.is_read == False
+            )
+            .values(is_read=True, read_at=now_utc())
         )
         if receiver_role:
-            query = query.filter(Notification.receiver_role == receiver_role)
-        updated = query.update({"is_read": True, "read_at": now_utc()})
-        db.commit()
-        return updated
+            stmt = stmt.where(Notification.receiver_role == receiver_role)
+        result = await db.execute(stmt)
+        await db.commit()
+        return result.rowcount
 
     # ─────────────────────────────────────────
     # DELETE
     # ─────────────────────────────────────────
     @staticmethod
-    async def delete_notification(db: Session, notification_id: UUID, user_id: UUID) -> bool:
-        notification = db.query(Notification).filter(
-            Notification.notification_id == notification_id,
-            Notification.user_id == user_id
-        ).first()
-        if not notification:
-            return False
-        db.delete(notification)
-        db.commit()
-        return True
+    async def delete_notification(db: AsyncSession, notification_id: UUID, user_id: UUID) -> bool:
+        result = await db.execute(
+            delete(Notification).where(
+                Notification.notification_id == notification_id,
+                Notification.user_id == user_id
+            )
+        )
+        await db.commit()
+        return result.rowcount > 0
 
     # ============================================================
     # 🔔 GENERIC NOTIFY — ฟังก์ชันเดียวแจ้งเตือนได้ทุก Event
@@ -14,6 +14,7 @@ from fastapi import HTTPException, UploadFile
 from sqlalchemy.orm import Session
 
 from app.models.order import Order, OrderStatus
+from app.repositories import daily_sales_repository
 from app.models.return_order import ReturnOrder, ReturnImage, ReturnStatus, ReturnReason
 from app.models.user import User
 from app.utils.file_util import rollback_and_cleanup, save_file, delete_file
@@ -261,6 +262,7 @@ class OrderReturnService:
             
             # ✅ อัปเดตสถานะ order เป็น RETURNING
             order.order_status = OrderStatus.RETURNING
+            daily_sales_repository.refresh_orders(db, [order.order_id])
             db.commit()
             
             db.refresh(return_order)
@@ -13,10 +13,11 @@
 from sqlalchemy.orm import Session, joinedload
 from fastapi import HTTPException
 from uuid import UUID
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
 from app.models.order import Order, OrderStatus
+from app.repositories import daily_sales_repository
 from app.models.order_item import OrderItem
 from app.models.cart import Cart, CartItem
 from app.models.return_order import ReturnOrder
@@ -25,6 +26,7 @@ from app.models.store import Store
 from app.services.notification_service import NotificationService
 from app.services.payout_service import PayoutService
 from app.utils.now_utc import now_utc
+from app.utils.pagination import keyset_page, offset_page
 
 
 class OrderService:
@@ -200,8 +202,17 @@ class OrderService:
         user_id: UUID, 
         status: Optional[List[str]] = None,  # ← เปลี่ยนเป็น List
         skip: int = 0,
-        limit: int = 10
-    ) -> List[Dict]:
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        รายการคำสั่งซื้อของ user
+        - มี cursor หรือหน้าแรก → keyset (created_at, order_id)
+        - skip > 0 แบบไม่มี cursor → OFFSET แบบเดิม
+
+        Returns:
+            (orders, next_cursor)
+        """
         query = (
             db.query(Order)
             .options(
@@ -217,8 +228,14 @@ class OrderService:
         if status:
             query = query.filter(Order.order_status.in_(status))  # ← ใช้ in_()
         
-        orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-        return [OrderService.format_order_response(order) for order in orders]
+        next_cursor = None
+        if cursor or not skip:
+            orders, next_cursor = keyset_page(query, Order.created_at, Order.order_id, limit, cursor)
+        else:
+            orders, _ = offset_page(
+                query.order_by(Order.created_at.desc(), Order.order_id.desc()), skip, limit
+            )
+        return [OrderService.format_order_response(order) for order in orders], next_cursor
     
     @staticmethod
     def get_order_detail(db: Session, order_id: UUID, user_id: UUID) -> Optional[Dict]:
@@ -304,6 +321,7 @@ class OrderService:
             print(f"[ORDER_SERVICE] Total transferred: ${payout_result['total_amount_transferred']:.2f}")
             
         except Exception as e:
+            db.rollback()
             print(f"[ORDER_SERVICE] ❌ Payout failed: {str(e)}")
             # ไม่ throw error เพื่อให้ order status ยังอัปเดตได้
             payout_result = {
@@ -312,6 +330,14 @@ class OrderService:
                 "failed_transfers": 0
             }
 
+        # โอนไม่สำเร็จบางร้าน → ออเดอร์ยัง DELIVERED → ให้ worker ลองโอนใหม่
+        if "error" in payout_result or payout_result["failed_transfers"]:
+            from app.tasks.order_tasks import schedule_payout_retry
+            try:
+                schedule_payout_retry(str(order_id), 0)
+            except Exception as e:
+                print(f"[ORDER_SERVICE] ⚠️ Could not schedule payout retry: {e}")
+
         # 4. Refresh order (PayoutService อาจจะอัปเดต order status แล้ว)
         db.refresh(order)
         
@@ -471,6 +497,8 @@ class OrderService:
         elif new_status == "COMPLETED" and not order.completed_at:
             order.completed_at = now_utc()
             print(f"[ORDER_SERVICE] Set completed_at: {order.completed_at}")
+
+        daily_sales_repository.refresh_orders(db, [order.order_id])
         
         try:
             db.commit()
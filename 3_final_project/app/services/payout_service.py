@@ -4,20 +4,25 @@
 #          รองรับหลายร้านในออเดอร์เดียว (multi-vendor)
 # =============================================================
 
-import stripe
+import asyncio
+import time
+import uuid
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, insert, update
 from typing import Dict, List, Optional
 from uuid import UUID
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, ROUND_DOWN
 
+from app.core.config import settings
 from app.core.stripe_client import stripe
 from app.models.order import Order, OrderStatus
 from app.models.order_item import OrderItem
 from app.models.payment import Payment, PaymentStatus
 from app.models.store import Store
 from app.models.store_payout import StorePayout
+from app.models.store_settlement import StoreSettlement
 from app.utils.now_utc import now_utc
 from fastapi import HTTPException
 
@@ -34,6 +39,22 @@ class PayoutService:
     # ค่าธรรมเนียมแพลตฟอร์ม (5%)
     DEFAULT_PLATFORM_FEE_RATE = 0.05
 
+    # PAYOUT_MODE: instant = โอนทันทีทุกออเดอร์, batched = สะสมยอดแล้วโอนรวมเป็นรอบ
+    MODE_INSTANT = "instant"
+    MODE_BATCHED = "batched"
+    # StorePayout ที่นับว่าร้านได้/จะได้เงินของออเดอร์นั้นแล้ว
+    PAID_STATUSES = ("completed", "accrued", "settled")
+    # error_message ของ StorePayout failed ที่ Stripe ตอบกลับมาแล้ว (ผลถูก cache ตาม idempotency_key)
+    STRIPE_RESPONSE_ERROR_PREFIX = "HTTP "
+
+    @staticmethod
+    def _stripe_responded(error: Exception) -> bool:
+        """
+        Stripe ตอบ error กลับมาแล้ว → ผล (รวม error) ถูก cache ตาม idempotency_key 24 ชม.
+        network error / timeout ไม่มี response → ไม่รู้ว่าโอนไปหรือยัง ต้องใช้ key เดิม
+        """
+        return isinstance(error, stripe.StripeError) and error.http_status is not None
+
     @staticmethod
     def calculate_store_amounts(
         db: Session,
@@ -68,6 +89,21 @@ class PayoutService:
             .all()
         )
 
+        # ร้าน + รายการสินค้าของทุกร้านในออเดอร์ ดึงครั้งเดียว
+        store_ids = [store_id for store_id, _ in store_groups if store_id is not None]
+        stores = {
+            store.store_id: store
+            for store in db.query(Store).filter(Store.store_id.in_(store_ids)).all()
+        } if store_ids else {}
+        items_by_store: Dict[UUID, List[OrderItem]] = {}
+        if store_ids:
+            for item in (
+                db.query(OrderItem)
+                .filter(OrderItem.order_id == order_id, OrderItem.store_id.in_(store_ids))
+                .all()
+            ):
+                items_by_store.setdefault(item.store_id, []).append(item)
+
         result = []
         for store_id, subtotal in store_groups:
             # ✅ ถ้า store_id เป็น NULL (ร้านถูกลบ) ให้ข้ามไป ไม่ต้องโอนเงิน
@@ -75,8 +111,7 @@ class PayoutService:
                 print(f"[PAYOUT] ⚠️ Skipping items with deleted store (store_id=NULL), subtotal={subtotal}")
                 continue
 
-            # ดึงข้อมูลร้าน
-            store = db.query(Store).filter(Store.store_id == store_id).first()
+            store = stores.get(store_id)
 
             if not store:
                 # ร้านถูกลบออกจาก DB แล้ว (ไม่ใช่แค่ SET NULL) → skip เหมือนกัน
@@ -93,16 +128,6 @@ class PayoutService:
             platform_fee = Decimal(str(subtotal)) * Decimal(str(platform_fee_rate))
             transfer_amount = Decimal(str(subtotal)) - platform_fee
 
-            # ดึงรายการสินค้าของร้านนี้
-            items = (
-                db.query(OrderItem)
-                .filter(
-                    OrderItem.order_id == order_id,
-                    OrderItem.store_id == store_id
-                )
-                .all()
-            )
-
             result.append({
                 "store_id": store_id,
                 "store_name": store.name,
@@ -110,11 +135,50 @@ class PayoutService:
                 "subtotal": subtotal,
                 "platform_fee": platform_fee,
                 "transfer_amount": transfer_amount,
-                "items": items
+                "items": items_by_store.get(store_id, [])
             })
 
         return result
 
+    @staticmethod
+    def _create_transfer(
+        order_id: UUID,
+        store_data: Dict,
+        transfer_group: str,
+        source_transaction: Optional[str],
+        key_seq: int = 0,
+    ):
+        """
+        สร้าง Stripe Transfer ของร้านเดียว (blocking → รันใน threadpool)
+        idempotency_key ผูกกับ (order_id, store_id, key_seq)
+        - key_seq = จำนวนครั้งที่ Stripe ตอบ error กลับมาแล้ว → ครั้งใหม่หลัง error ได้ key ใหม่ (ไม่ได้ error เดิมจาก cache)
+        - network error ไม่เพิ่ม key_seq → retry ได้ transfer เดิมถ้าครั้งก่อนโอนสำเร็จไปแล้ว ไม่โอนซ้ำ
+        """
+        # แปลงเป็นสตางค์ (cents) ตัดเศษแบบเดิม แต่ไม่ผ่าน float
+        amount_cents = int((Decimal(str(store_data['transfer_amount'])) * 100).to_integral_value(rounding=ROUND_DOWN))
+
+        transfer_params = {
+            "amount": amount_cents,
+            "currency": "sgd",  # ✅ ใช้ currency เดียวกับที่ checkout ตั้ง
+            "destination": store_data['stripe_account_id'],
+            "transfer_group": transfer_group,
+            "description": f"Payout for Order {order_id} - {store_data['store_name']}",
+            "metadata": {
+                "order_id": str(order_id),
+                "store_id": str(store_data['store_id']),
+                "store_name": store_data['store_name'],
+                "platform_fee": str(store_data['platform_fee'])
+            }
+        }
+        # ✅ ใส่ source_transaction เพื่อให้ Stripe ดึงเงินจาก charge นั้นโดยตรง
+        if source_transaction:
+            transfer_params["source_transaction"] = source_transaction
+
+        idempotency_key = f"payout-{order_id}-{store_data['store_id']}"
+        if key_seq:
+            idempotency_key += f"-r{key_seq}"
+        return stripe.Transfer.create(**transfer_params, idempotency_key=idempotency_key)
+
     @staticmethod
     async def process_payout_on_delivery_confirmation(
         db: Session,
@@ -130,7 +194,10 @@ class PayoutService:
         3. คำนวณยอดเงินแต่ละร้าน
         4. โอนเงินผ่าน Stripe Transfer (ใช้ transfer_group)
         5. บันทึกประวัติการโอน
-        6. อัปเดต order status -> COMPLETED
+        6. อัปเดต order status -> COMPLETED (โอนไม่สำเร็จบางร้าน → คง DELIVERED ไว้ให้ retry)
+
+        เรียกซ้ำได้: ร้านที่โอน / บันทึกยอดแล้วจะถูกข้าม ร้านที่เคย failed โอนใหม่
+        (Stripe ตอบ error ไปแล้ว → idempotency_key ใหม่, network error → key เดิม ดู _create_transfer)
         
         Args:
             db: Database session
@@ -147,9 +214,11 @@ class PayoutService:
         print(f"{'='*80}\n")
 
         # 1. ตรวจสอบออเดอร์
+        # lock ออเดอร์ → ลูกค้ากดยืนยันพร้อม auto_confirm retry ไม่โอน / บันทึกซ้ำกัน
         order = (
             db.query(Order)
             .filter(Order.order_id == order_id)
+            .with_for_update()
             .first()
         )
         
@@ -202,94 +271,125 @@ class PayoutService:
         transfer_group = f"payment_{payment.payment_id}"  # ✅ ตรงกับที่ checkout ตั้งไว้
         print(f"\n[PAYOUT_SERVICE] 📦 Transfer Group: {transfer_group}")
 
-        # 5. โอนเงินให้แต่ละร้าน
-        transfer_results = []
-        
-        for store_data in store_amounts:
-            try:
-                print(f"\n[PAYOUT_SERVICE] 💸 Creating transfer for: {store_data['store_name']}")
-                
-                # แปลงเป็นสตางค์ (cents)
-                amount_cents = int(float(store_data['transfer_amount']) * 100)
-                
-                # สร้าง Stripe Transfer
-                transfer_params = {
-                    "amount": amount_cents,
-                    "currency": "sgd",  # ✅ ใช้ currency เดียวกับที่ checkout ตั้ง
-                    "destination": store_data['stripe_account_id'],
-                    "transfer_group": transfer_group,
-                    "description": f"Payout for Order {order_id} - {store_data['store_name']}",
-                    "metadata": {
-                        "order_id": str(order_id),
-                        "store_id": str(store_data['store_id']),
-                        "store_name": store_data['store_name'],
-                        "platform_fee": str(store_data['platform_fee'])
-                    }
-                }
-                # ✅ ใส่ source_transaction เพื่อให้ Stripe ดึงเงินจาก charge นั้นโดยตรง
-                if payment.stripe_charge_id:
-                    transfer_params["source_transaction"] = payment.stripe_charge_id
-                transfer = stripe.Transfer.create(**transfer_params)
-                
-                print(f"[PAYOUT_SERVICE] ✅ Transfer created: {transfer.id}")
-                
-                # บันทึกประวัติการโอนเงิน
-                payout_record = StorePayout(
-                    store_id=store_data['store_id'],
-                    order_id=order_id,
-                    transfer_id=transfer.id,
-                    transfer_group=transfer_group,
-                    amount=store_data['subtotal'],
-                    platform_fee=store_data['platform_fee'],
-                    net_amount=store_data['transfer_amount'],
-                    status="completed",
-                    transferred_at=now_utc()
+        # 5. โอนเงินให้แต่ละร้านพร้อมกัน (จำกัดจำนวนด้วย PAYOUT_MAX_CONCURRENCY)
+        #    หรือ PAYOUT_MODE=batched → บันทึกยอดค้างโอน (accrued) ให้ job settlement โอนรวมเป็นรอบ
+        #    ร้านที่เคยโอน / บันทึกยอดแล้ว (retry / เรียกซ้ำ) → ไม่ทำซ้ำ
+        paid_store_ids = {
+            store_id
+            for (store_id,) in db.query(StorePayout.store_id).filter(
+                StorePayout.order_id == order_id,
+                StorePayout.status.in_(PayoutService.PAID_STATUSES),
+            )
+        }
+        pending_stores = [s for s in store_amounts if s["store_id"] not in paid_store_ids]
+        if paid_store_ids:
+            print(f"[PAYOUT_SERVICE] ⏭️ Skipping {len(paid_store_ids)} store(s) already paid out")
+
+        # ครั้งที่ Stripe ตอบ error กลับมาแล้วของแต่ละร้าน → key_seq ของ idempotency_key รอบนี้
+        key_seqs = dict(
+            db.query(StorePayout.store_id, func.count(StorePayout.payout_id))
+            .filter(
+                StorePayout.order_id == order_id,
+                StorePayout.status == "failed",
+                StorePayout.error_message.like(PayoutService.STRIPE_RESPONSE_ERROR_PREFIX + "%"),
+            )
+            .group_by(StorePayout.store_id)
+            .all()
+        )
+
+        semaphore = asyncio.Semaphore(settings.PAYOUT_MAX_CONCURRENCY)
+
+        async def _transfer(store_data: Dict):
+            async with semaphore:
+                return await run_in_threadpool(
+                    PayoutService._create_transfer,
+                    order_id,
+                    store_data,
+                    transfer_group,
+                    payment.stripe_charge_id,
+                    key_seqs.get(store_data["store_id"], 0),
                 )
-                db.add(payout_record)
-                
-                transfer_results.append({
-                    "store_id": str(store_data['store_id']),
-                    "store_name": store_data['store_name'],
-                    "transfer_id": transfer.id,
-                    "amount": float(store_data['transfer_amount']),
-                    "platform_fee": float(store_data['platform_fee']),
-                    "status": "success"
+
+        batched = settings.PAYOUT_MODE == PayoutService.MODE_BATCHED
+        if batched:
+            outcomes = [None] * len(pending_stores)
+        else:
+            outcomes = await asyncio.gather(
+                *(_transfer(store_data) for store_data in pending_stores),
+                return_exceptions=True,
+            )
+
+        transfer_results = []
+        payout_rows = []
+        for store_data, outcome in zip(pending_stores, outcomes):
+            row = {
+                "store_id": store_data['store_id'],
+                "order_id": order_id,
+                "transfer_group": transfer_group,
+                "amount": store_data['subtotal'],
+                "platform_fee": store_data['platform_fee'],
+                "net_amount": store_data['transfer_amount'],
+            }
+            result = {
+                "store_id": str(store_data['store_id']),
+                "store_name": store_data['store_name'],
+                "amount": float(store_data['transfer_amount']),
+                "platform_fee": float(store_data['platform_fee']),
+            }
+
+            if outcome is None:
+                # สะสมยอดไว้ โอนรวมใน settle_store_payouts
+                payout_rows.append({
+                    **row,
+                    "transfer_id": None,
+                    "status": "accrued",
+                    "error_message": None,
+                    "transferred_at": None,
                 })
-                
-            except Exception as e:
-                import traceback
-                print(f"[PAYOUT_SERVICE] ❌ Transfer error type: {type(e).__name__}")
-                print(f"[PAYOUT_SERVICE] ❌ Transfer error: {repr(e)}")
-                print(f"[PAYOUT_SERVICE] ❌ Traceback:\n{traceback.format_exc()}")
-                
-                # บันทึกความล้มเหลว
-                payout_record = StorePayout(
-                    store_id=store_data['store_id'],
-                    order_id=order_id,
-                    transfer_group=transfer_group,
-                    amount=store_data['subtotal'],
-                    platform_fee=store_data['platform_fee'],
-                    net_amount=store_data['transfer_amount'],
-                    status="failed",
-                    error_message=str(e)
-                )
-                db.add(payout_record)
-                
-                transfer_results.append({
-                    "store_id": str(store_data['store_id']),
-                    "store_name": store_data['store_name'],
+                transfer_results.append({**result, "transfer_id": None, "status": "accrued"})
+                continue
+
+            if isinstance(outcome, Exception):
+                print(f"[PAYOUT_SERVICE] ❌ Transfer error ({store_data['store_name']}): {repr(outcome)}")
+                # บันทึกความล้มเหลว (Stripe ตอบกลับแล้ว → ขึ้นต้นด้วย "HTTP <status>: " ให้รอบหน้าใช้ key ใหม่)
+                error_message = str(outcome)
+                if PayoutService._stripe_responded(outcome):
+                    error_message = f"{PayoutService.STRIPE_RESPONSE_ERROR_PREFIX}{outcome.http_status}: {outcome}"
+                payout_rows.append({
+                    **row,
                     "transfer_id": None,
-                    "amount": float(store_data['transfer_amount']),
-                    "platform_fee": float(store_data['platform_fee']),
                     "status": "failed",
-                    "error": str(e)
+                    "error_message": error_message,
+                    "transferred_at": None,
                 })
+                transfer_results.append({**result, "transfer_id": None, "status": "failed", "error": str(outcome)})
+                continue
+
+            print(f"[PAYOUT_SERVICE] ✅ Transfer created: {outcome.id} ({store_data['store_name']})")
+            # บันทึกประวัติการโอนเงิน
+            payout_rows.append({
+                **row,
+                "transfer_id": outcome.id,
+                "status": "completed",
+                "error_message": None,
+                "transferred_at": now_utc(),
+            })
+            transfer_results.append({**result, "transfer_id": outcome.id, "status": "success"})
+
+        # บันทึกผลทุกร้านใน insert เดียว
+        if payout_rows:
+            db.execute(insert(StorePayout), payout_rows)
 
         # 6. อัปเดตสถานะออเดอร์เป็น COMPLETED
-        order.order_status = "COMPLETED"
-        order.order_text_status = "ได้รับสินค้าแล้ว"
-        order.completed_at = now_utc()
-        order.updated_at = now_utc()
+        #    มีร้านที่โอนไม่สำเร็จ → คง DELIVERED ไว้ (เรียกซ้ำผ่าน gate ด้านบนได้ → โอนเฉพาะร้านที่ค้าง)
+        has_failed = any(r["status"] == "failed" for r in transfer_results)
+        if has_failed:
+            print("[PAYOUT_SERVICE] ⚠️ Some transfers failed, order stays DELIVERED for retry")
+        else:
+            order.order_status = "COMPLETED"
+            order.order_text_status = "ได้รับสินค้าแล้ว"
+            order.completed_at = now_utc()
+            order.updated_at = now_utc()
         
         db.commit()
         
@@ -300,6 +400,7 @@ class PayoutService:
         # สรุปผลลัพธ์
         successful_transfers = [r for r in transfer_results if r["status"] == "success"]
         failed_transfers = [r for r in transfer_results if r["status"] == "failed"]
+        accrued_payouts = [r for r in transfer_results if r["status"] == "accrued"]
         
         total_transferred = sum(r["amount"] for r in successful_transfers)
         total_platform_fee = sum(r["platform_fee"] for r in successful_transfers)
@@ -310,13 +411,182 @@ class PayoutService:
             "completed_at": order.completed_at.isoformat() if order.completed_at else None,
             "transfer_group": transfer_group,
             "total_stores": len(store_amounts),
+            "skipped_already_paid": len(paid_store_ids),
             "successful_transfers": len(successful_transfers),
             "failed_transfers": len(failed_transfers),
+            "payout_mode": settings.PAYOUT_MODE,
+            "accrued_payouts": len(accrued_payouts),
             "total_amount_transferred": total_transferred,
             "total_platform_fee": total_platform_fee,
             "transfers": transfer_results
         }
 
+    # ─────────────────────────────────────────
+    # Settlement (PAYOUT_MODE=batched): โอนรวมต่อร้านเป็นรอบ
+    # ─────────────────────────────────────────
+
+    @staticmethod
+    def _open_settlements(db: Session, cutoff: datetime) -> Dict[str, int]:
+        """
+        รวม StorePayout accrued ที่ยังไม่อยู่ในรอบใด (สร้างก่อน cutoff) เป็น StoreSettlement ละ 1 ร้าน
+        lock แถวด้วย SKIP LOCKED → job ที่รันซ้อนกันไม่นับแถวเดียวกัน 2 รอบ
+        """
+        accrued = (
+            db.query(
+                StorePayout.payout_id,
+                StorePayout.store_id,
+                StorePayout.amount,
+                StorePayout.platform_fee,
+                StorePayout.net_amount,
+            )
+            .filter(
+                StorePayout.status == "accrued",
+                StorePayout.settlement_id.is_(None),
+                StorePayout.created_at < cutoff,
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not accrued:
+            return {"settlements_opened": 0, "payouts_included": 0}
+
+        totals: Dict[UUID, Dict] = {}
+        for payout_id, store_id, amount, platform_fee, net_amount in accrued:
+            t = totals.setdefault(store_id, {
+                "settlement_id": uuid.uuid4(),
+                "amount": Decimal("0"),
+                "platform_fee": Decimal("0"),
+                "net_amount": Decimal("0"),
+                "payout_count": 0,
+            })
+            t["amount"] += Decimal(str(amount))
+            t["platform_fee"] += Decimal(str(platform_fee))
+            t["net_amount"] += Decimal(str(net_amount))
+            t["payout_count"] += 1
+
+        db.execute(insert(StoreSettlement), [
+            {
+                "settlement_id": t["settlement_id"],
+                "store_id": store_id,
+                "amount": float(t["amount"]),
+                "platform_fee": float(t["platform_fee"]),
+                "net_amount": float(t["net_amount"]),
+                "payout_count": t["payout_count"],
+                "status": "processing",
+                "attempts": 0,
+            }
+            for store_id, t in totals.items()
+        ])
+        db.execute(
+            update(StorePayout)
+            .where(StorePayout.payout_id.in_([row.payout_id for row in accrued]))
+            .values(settlement_id=case(
+                {store_id: t["settlement_id"] for store_id, t in totals.items()},
+                value=StorePayout.store_id,
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return {"settlements_opened": len(totals), "payouts_included": len(accrued)}
+
+    @staticmethod
+    def _settle_one(db: Session, settlement_id: UUID) -> Optional[str]:
+        """
+        โอนเงินของ settlement เดียว (lock แถวระหว่างเรียก Stripe)
+        คืนสถานะใหม่ หรือ None ถ้า job อื่นกำลังทำ / ทำเสร็จไปแล้ว
+        """
+        settlement = (
+            db.query(StoreSettlement)
+            .filter(
+                StoreSettlement.settlement_id == settlement_id,
+                StoreSettlement.status.in_(["processing", "failed"]),
+            )
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not settlement:
+            db.rollback()
+            return None
+
+        store = db.query(Store).filter(Store.store_id == settlement.store_id).first()
+        settlement.attempts += 1
+        try:
+            if not store or not store.stripe_account_id:
+                raise ValueError("ร้านยังไม่เชื่อมต่อกับ Stripe Connect")
+
+            amount_cents = int((Decimal(str(settlement.net_amount)) * 100).to_integral_value(rounding=ROUND_DOWN))
+            # idempotency_key ผูกกับ settlement → retry รอบถัดไปได้ transfer เดิม ไม่โอนซ้ำ
+            transfer = stripe.Transfer.create(
+                amount=amount_cents,
+                currency="sgd",  # ✅ ใช้ currency เดียวกับที่ checkout ตั้ง
+                destination=store.stripe_account_id,
+                transfer_group=f"settlement_{settlement.settlement_id}",
+                description=f"Settlement of {settlement.payout_count} order(s) - {store.name}",
+                metadata={
+                    "settlement_id": str(settlement.settlement_id),
+                    "store_id": str(store.store_id),
+                    "store_name": store.name,
+                    "payout_count": str(settlement.payout_count),
+                    "platform_fee": str(settlement.platform_fee),
+                },
+                idempotency_key=f"settlement-{settlement.settlement_id}",
+            )
+        except Exception as e:
+            print(f"[PAYOUT_SERVICE] ❌ Settlement {settlement_id} failed (attempt {settlement.attempts}): {repr(e)}")
+            settlement.status = "failed"
+            settlement.error_message = str(e)
+            db.commit()
+            return "failed"
+
+        now = now_utc()
+        settlement.status = "completed"
+        settlement.transfer_id = transfer.id
+        settlement.error_message = None
+        settlement.transferred_at = now
+        db.execute(
+            update(StorePayout)
+            .where(StorePayout.settlement_id == settlement.settlement_id)
+            .values(status="settled", transferred_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        print(f"[PAYOUT_SERVICE] ✅ Settlement {settlement_id}: {transfer.id} ({settlement.payout_count} payout(s))")
+        return "completed"
+
+    @staticmethod
+    def settle_store_payouts(
+        db: Session,
+        cutoff: Optional[datetime] = None,
+        max_attempts: int = 5,
+    ) -> Dict:
+        """
+        รอบโอนเงินรวม (PAYOUT_MODE=batched) — เรียกจาก celery beat
+        1. รวมยอด accrued ถึง cutoff เป็น 1 settlement ต่อร้าน
+        2. โอน settlement ที่ยังไม่สำเร็จทั้งหมด (รวมรอบก่อนที่ fail, ไม่เกิน max_attempts ครั้ง)
+        จำนวนครั้งที่เรียก Stripe = จำนวนร้านที่มียอด ไม่ขึ้นกับจำนวนออเดอร์
+        """
+        started = time.perf_counter()
+        stats = PayoutService._open_settlements(db, cutoff or now_utc())
+
+        unfinished = [
+            settlement_id
+            for (settlement_id,) in db.query(StoreSettlement.settlement_id)
+            .filter(
+                StoreSettlement.status.in_(["processing", "failed"]),
+                StoreSettlement.attempts < max_attempts,
+            )
+            .order_by(StoreSettlement.created_at)
+        ]
+        db.rollback()  # ไม่ถือ transaction ค้างระหว่างเรียก Stripe
+
+        stats.update({"transfers": 0, "failed": 0, "skipped": 0})
+        for settlement_id in unfinished:
+            status = PayoutService._settle_one(db, settlement_id)
+            stats[{"completed": "transfers", "failed": "failed"}.get(status, "skipped")] += 1
+
+        stats["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return stats
+
     @staticmethod
     def get_payout_history(
         db: Session,
@@ -348,6 +618,7 @@ class PayoutService:
                 "order_id": str(payout.order_id),
                 "transfer_id": payout.transfer_id,
                 "transfer_group": payout.transfer_group,
+                "settlement_id": str(payout.settlement_id) if payout.settlement_id else None,
                 "amount": float(payout.amount),
                 "platform_fee": float(payout.platform_fee),
                 "net_amount": float(payout.net_amount),
@@ -7,12 +7,15 @@ import uuid
 import time
 
 from fastapi import UploadFile
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy import and_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
+from app.core.cache import cached
 from app.models.product import ImageType, Product, ProductImage, ProductVariant
-from app.repositories import product_repository, store_repository
+from app.repositories import product_listing_repository, product_repository, search_index_repository, store_repository
+from app.services import catalog_cache_service
 from app.utils.file_util import delete_file, save_multiple_files
 from app.utils.response_handler import success_response, error_response
 
@@ -190,6 +193,12 @@ def create_product_with_variants_service(
                             500
                         )
 
+        # ✅ sync read model ของหน้า listing
+        product_listing_repository.refresh_products(db, [product.product_id])
+        search_index_repository.index_product(db, product)
+        catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
+        db.commit()
+
         return success_response(
             "สร้างสินค้าและตัวเลือกสำเร็จ",
             {"product_id": str(product.product_id)},
@@ -251,9 +260,19 @@ def get_all_products_service(db: Session):
         )
 
 
+def _load_product(db: Session, product_id: str):
+    product = product_repository.get_product_by_id(db, product_id)
+    return jsonable_encoder(product) if product else None
+
+
 def get_product_by_id_service(db: Session, product_id: str):
     try:
-        product = product_repository.get_product_by_id(db, product_id)
+        # cache ค่าที่ encode แล้ว (ลบเมื่อสินค้า / stock / รีวิวเปลี่ยน)
+        product = cached(
+            catalog_cache_service.product_detail_key(product_id),
+            lambda: _load_product(db, product_id),
+            catalog_cache_service.PRODUCT_TTL,
+        )
         if not product:
             return error_response("ไม่พบสินค้า", {}, 404)
         return success_response("ดึงข้อมูลสินค้าสำเร็จ", product)
@@ -472,6 +491,12 @@ def update_product_service(
             db.commit()
             print(f"💾 Committed all changes successfully")
 
+        # ✅ sync read model ของหน้า listing (ราคา / stock / รูปหลัก / ชื่อ)
+        product_listing_repository.refresh_products(db, [product.product_id])
+        search_index_repository.index_product(db, product)
+        catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
+        db.commit()
+
         return success_response(
             "อัปเดตสินค้าสำเร็จ",
             {"product_id": str(product.product_id)},
@@ -494,6 +519,9 @@ def delete_product_service(db: Session, product_id: str):
         if not product:
             return error_response("ไม่พบสินค้า", {}, 404)
         product.is_active = False
+        product_listing_repository.refresh_products(db, [product.product_id])
+        search_index_repository.index_product(db, product)
+        catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
         db.commit()
         return success_response("ปิดการขายสินค้าสำเร็จ")
     except SQLAlchemyError as e:
@@ -517,6 +545,9 @@ def close_sale_product_service(db, user_data, product_id: str):
 
     product.is_active = False
     product.closed_by = "seller"   # ✅ บันทึกว่า seller เป็นคนปิด
+    product_listing_repository.refresh_products(db, [product.product_id])
+    search_index_repository.index_product(db, product)
+    catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
     db.commit()
     return success_response("ปิดการขายสินค้าสำเร็จ", {"product_id": str(product.product_id)})
 
@@ -539,5 +570,8 @@ def open_sale_product_service(db, user_data, product_id: str):
 
     product.is_active = True
     product.closed_by = None   # ✅ เคลียร์ค่า closed_by เมื่อเปิดการขาย
+    product_listing_repository.refresh_products(db, [product.product_id])
+    search_index_repository.index_product(db, product)
+    catalog_cache_service.invalidate_products(db, [product.product_id], product.store_id)
     db.commit()
     return success_response("เปิดการขายสินค้าสำเร็จ", {"product_id": str(product.product_id)})
\ No newline at end of file
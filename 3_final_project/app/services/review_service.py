@@ -10,6 +10,8 @@ from app.models.review import Review, ReviewImage
 from app.models.product import Product
 from app.models.order import Order
 from app.models.user import User
+from app.repositories import product_listing_repository
+from app.services import catalog_cache_service
 from app.schemas.review import (
     CreateReviewRequest,
     UpdateReviewRequest,
@@ -177,6 +179,9 @@ class ReviewService:
                 )
                 self.db.add(review_image)
 
+        # rating ของสินค้าเปลี่ยน → sync read model ของหน้า listing
+        product_listing_repository.refresh_products(self.db, [new_review.product_id])
+        catalog_cache_service.invalidate_products(self.db, [new_review.product_id])
         self.db.commit()
         self.db.refresh(new_review)
 
@@ -226,6 +231,9 @@ class ReviewService:
                 )
                 self.db.add(review_image)
 
+        if payload.rating is not None:
+            product_listing_repository.refresh_products(self.db, [review.product_id])
+            catalog_cache_service.invalidate_products(self.db, [review.product_id])
         self.db.commit()
         self.db.refresh(review)
 
@@ -254,7 +262,10 @@ class ReviewService:
             self.db.delete(img)
 
         # ลบรีวิว (cascade จะลบ ReviewImage อัตโนมัติ)
+        product_id = review.product_id
         self.db.delete(review)
+        product_listing_repository.refresh_products(self.db, [product_id])
+        catalog_cache_service.invalidate_products(self.db, [product_id])
         self.db.commit()
 
     def upload_review_image(self, file: UploadFile) -> dict:
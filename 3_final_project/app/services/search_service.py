@@ -1,97 +1,109 @@
 # app/services/search_service.py
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
-from app.models.product import Product, ProductImage, ImageType, ProductVariant
-from app.models.store import Store
+from app.models.product_listing import ProductListing
+from app.repositories import search_index_repository
+from app.repositories.product_listing_repository import listing_select
+from app.services.image_derivative_service import derivative_url
+from app.utils.pagination import (
+    count_rows_async,
+    decode_offset_cursor,
+    encode_offset_cursor,
+    keyset_page_async,
+    offset_page_async,
+)
 
 
 class SearchService:
 
     @staticmethod
-    def search_products(
-        db: Session,
+    async def search_products(
+        db: AsyncSession,
         query: Optional[str] = None,
         limit: int = 20,
         offset: int = 0,
         exclude_store_id: Optional[UUID] = None,
+        cursor: Optional[str] = None,
+        count: Optional[str] = None,
     ) -> dict:
         """
-        ค้นหาสินค้า - ค้นหาเฉพาะชื่อสินค้าเท่านั้น
-        """
-        base_query = (
-            db.query(Product, ProductImage, Store)
-            .join(Store, Product.store_id == Store.store_id)
-            .join(                                              # เพิ่ม
-                ProductVariant,
-                and_(
-                    ProductVariant.product_id == Product.product_id,
-                    ProductVariant.is_active == True,
-                    ProductVariant.stock > 0,
-                )
-            )
-            .outerjoin(
-                ProductImage,
-                and_(
-                    Product.product_id == ProductImage.product_id,
-                    ProductImage.variant_id == None,
-                    ProductImage.is_main == True,
-                    ProductImage.image_type == ImageType.NORMAL,
-                ),
-            )
-            .filter(
-                Product.is_active == True,
-                Product.is_draft == False,
-                Store.is_active == True,
-            )
-            .group_by(Product.product_id, ProductImage.image_id, Store.store_id)  # เพิ่ม
-        )
+        ค้นหาสินค้า — full-text + trigram ครอบคลุมชื่อสินค้า / หมวดหมู่ / ร้าน / คำอธิบาย
 
-        # กรอง store ของ user ตัวเองออก
-        if exclude_store_id:
-            base_query = base_query.filter(Product.store_id != exclude_store_id)
+        - มีคำค้นหา: เรียงตามความเกี่ยวข้อง (rank) → cursor เป็นตำแหน่งในผลลัพธ์
+        - ไม่มีคำค้นหา: เรียงตามความใหม่ → keyset pagination (created_at, product_id)
+        - offset: OFFSET แบบเดิม (ใช้เมื่อไม่ได้ส่ง cursor)
+        - count: exact | estimated | none
+          (ค่าเริ่มต้น: exact สำหรับ offset แบบเดิม, none สำหรับ cursor)
+        """
+        # อ่านจาก read model product_listing (ไม่ต้อง join / group by) ผ่าน AsyncSession
+        base_query = listing_select(exclude_store_id=exclude_store_id)
 
-        # ค้นหาด้วยชื่อสินค้าเท่านั้น
+        search = None
         if query and query.strip():
-            search_term = f"%{query.strip()}%"
-            base_query = base_query.filter(
-                Product.product_name.ilike(search_term)
-            )
-
-        # นับจำนวนทั้งหมด (ก่อน limit/offset)
-        total = base_query.count()
+            search = search_index_repository.ranked_search(base_query, query)
 
-        # เรียงลำดับตามความใหม่
-        base_query = base_query.order_by(Product.created_at.desc())
+        count_mode = count or ("none" if cursor else "exact")
 
-        # Pagination
-        rows = base_query.limit(limit).offset(offset).all()
+        next_cursor = None
+        if search is not None:
+            ranked_query, rank = search
+            total = await count_rows_async(db, ranked_query, count_mode)
+            start = decode_offset_cursor(cursor) if cursor else offset
+            rows, has_more = await offset_page_async(
+                db,
+                ranked_query.order_by(
+                    rank.desc(), ProductListing.created_at.desc(), ProductListing.product_id.desc()
+                ),
+                start,
+                limit,
+            )
+            if has_more:
+                next_cursor = encode_offset_cursor(start + limit)
+        elif cursor or not offset:
+            total = await count_rows_async(db, base_query, count_mode)
+            rows, next_cursor = await keyset_page_async(
+                db, base_query, ProductListing.created_at, ProductListing.product_id, limit, cursor
+            )
+            has_more = next_cursor is not None
+        else:
+            # เรียงลำดับตามความใหม่ + OFFSET แบบเดิม
+            total = await count_rows_async(db, base_query, count_mode)
+            rows, has_more = await offset_page_async(
+                db,
+                base_query.order_by(ProductListing.created_at.desc(), ProductListing.product_id.desc()),
+                offset,
+                limit,
+            )
 
         products = []
-        for p, img, store in rows:
+        for row in rows:
             products.append({
-                "id": str(p.product_id),
-                "title": p.product_name,
-                "price": float(
-                    db.query(func.min(ProductVariant.price))
-                    .filter(ProductVariant.product_id == p.product_id, ProductVariant.is_active == True)
-                    .scalar() or 0
-                ),
-                "rating": p.average_rating or 0,
-                "image_url": img.image_url if img else None,
-                "image_id": str(img.image_id) if img else None,
-                "store_name": store.name if store else None,
-                "category_id": str(p.category_id) if p.category_id else None,
+                "id": str(row.product_id),
+                "title": row.product_name,
+                "price": float(row.min_price or 0),
+                "rating": row.rating or 0,
+                "image_url": derivative_url(row.main_image_url, row.main_image_derivatives, "card"),
+                "image_sizes": row.main_image_derivatives,
+                "image_id": str(row.main_image_id) if row.main_image_id else None,
+                "store_name": row.store_name,
+                "category_id": str(row.category_id) if row.category_id else None,
             })
 
-        has_more = (offset + limit) < total
-
         return {
             "total": total,
             "products": products,
             "has_more": has_more,
+            "next_cursor": next_cursor,
             "limit": limit,
             "offset": offset,
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def suggest(db: Session, prefix: Optional[str], limit: int = 10) -> List[str]:
+        """autocomplete ชื่อสินค้าจาก prefix ที่พิมพ์"""
+        if not prefix or not prefix.strip():
+            return []
+        return search_index_repository.suggest_terms(db, prefix, limit)
@@ -1,9 +1,10 @@
 # app/services/seller_service.py
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract, case
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, and_, extract, case, select
 from typing import List, Optional
-from datetime import datetime, timedelta
-from app.models.order import Order, OrderStatus
+from datetime import date, datetime, timedelta
+from app.models.order import Order, OrderStatus, SALES_STATUSES
+from app.repositories import daily_sales_repository
 from app.models.order_item import OrderItem
 from app.models.return_order import ReturnOrder, ReturnStatus
 # from app.models.seller_notification import SellerNotification, NotificationType
@@ -11,20 +12,57 @@ from app.models.product import Product, ProductImage
 from app.models.user import User
 from app.models.shipping_address import ShippingAddress
 from app.tasks.order_tasks import simulate_delivery
-from app.utils.now_utc import now_utc
+from app.utils.now_utc import now_thai, now_utc
 from fastapi import HTTPException
 from app.core.stripe_client import stripe  # ใช้ stripe ที่ตั้ง api_key แล้ว
 from app.models.payment import Payment, PaymentStatus
 from app.services.notification_service import NotificationService
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from app.models.order_item import OrderItem
-from app.models.product import Product
+from app.models.product import Product, ProductVariant
+from app.utils.pagination import count_rows, keyset_page
 
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+CHART_GRANULARITIES = ("day", "week", "month")
+DEFAULT_CHART_DAYS = 7
+MAX_CHART_BUCKETS = 400
+THAI_DAYS = ['จ', 'อ', 'พ', 'พฤ', 'ศ', 'ส', 'อา']
+
+
+def _chart_buckets(start: date, end: date, granularity: str) -> List[date]:
+    """วันเริ่มของทุก bucket ในช่วง (ตรงกับ date_trunc ของ Postgres: สัปดาห์เริ่มวันจันทร์)"""
+    if granularity == "week":
+        current = start - timedelta(days=start.weekday())
+    elif granularity == "month":
+        current = start.replace(day=1)
+    else:
+        current = start
+
+    buckets = []
+    while current <= end:
+        buckets.append(current)
+        if granularity == "day":
+            current += timedelta(days=1)
+        elif granularity == "week":
+            current += timedelta(days=7)
+        else:
+            current = (current + timedelta(days=32)).replace(day=1)
+        if len(buckets) > MAX_CHART_BUCKETS:
+            break
+    return buckets
+
+
+def _bucket_label(bucket: date, granularity: str, total: int) -> str:
+    if granularity == "month":
+        return bucket.strftime("%m/%Y")
+    if granularity == "day" and total <= 7:
+        return THAI_DAYS[bucket.weekday()]
+    return bucket.strftime("%d/%m")
+
 
 class SellerService:
     # app/services/seller_service.py - ส่วนแก้ไข
@@ -79,70 +117,66 @@ class SellerService:
         }
     
     @staticmethod
-    def get_seller_dashboard(db: Session, store_id: str, month: Optional[str] = None):
-        """ดึงข้อมูล Dashboard สำหรับร้านค้า"""
-        
-        # กำหนดช่วงเวลา
-        now = datetime.utcnow()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = today_start - timedelta(days=today_start.weekday())
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # ช่วงเวลาก่อนหน้า (สำหรับคำนวณการเปลี่ยนแปลง)
-        yesterday_start = today_start - timedelta(days=1)
-        last_week_start = week_start - timedelta(days=7)
+    def get_seller_dashboard(
+        db: Session,
+        store_id: str,
+        month: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        granularity: str = "day",
+    ):
+        """
+        ดึงข้อมูล Dashboard สำหรับร้านค้า
+
+        - ยอดขาย (วันนี้/สัปดาห์/เดือน + ช่วงก่อนหน้า) → query เดียวบน rollup daily_store_sales
+        - จำนวนออเดอร์ตามสถานะ, ลูกค้า, คำขอคืน → query เดียว (COUNT ... FILTER)
+        - กราฟยอดขาย → rollup รวมตาม day / week / month ช่วงวันที่เลือกได้
+          ไม่ระบุ → 7 วันล่าสุดรายวัน, ระบุ month (YYYY-MM) → ทั้งเดือนนั้น
+        """
+        if granularity not in CHART_GRANULARITIES:
+            raise HTTPException(status_code=400, detail="granularity must be day, week or month")
+
+        # ยอดขายรายช่วง อ่านจาก rollup รายวัน (วันตามเวลาไทย)
+        today = now_thai().date()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
         last_month_start = (month_start - timedelta(days=1)).replace(day=1)
-        
-        # คำนวณยอดขายวันนี้
-        today_sales = db.query(func.sum(Order.total_price)).filter(
-            Order.store_id == store_id,
-            Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-            Order.created_at >= today_start
-        ).scalar() or 0
-        
-        # คำนวณยอดขายเมื่อวาน
-        yesterday_sales = db.query(func.sum(Order.total_price)).filter(
-            Order.store_id == store_id,
-            Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-            Order.created_at >= yesterday_start,
-            Order.created_at < today_start
-        ).scalar() or 0
-        
-        # คำนวณยอดขายสัปดาห์นี้
-        week_sales = db.query(func.sum(Order.total_price)).filter(
-            Order.store_id == store_id,
-            Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-            Order.created_at >= week_start
-        ).scalar() or 0
-        
-        # คำนวณยอดขายสัปดาห์ที่แล้ว
-        last_week_sales = db.query(func.sum(Order.total_price)).filter(
-            Order.store_id == store_id,
-            Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-            Order.created_at >= last_week_start,
-            Order.created_at < week_start
-        ).scalar() or 0
-        
-        # คำนวณยอดขายเดือนนี้
-        month_sales = db.query(func.sum(Order.total_price)).filter(
-            Order.store_id == store_id,
-            Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-            Order.created_at >= month_start
-        ).scalar() or 0
-        
-        # คำนวณยอดขายเดือนที่แล้ว
-        last_month_sales = db.query(func.sum(Order.total_price)).filter(
-            Order.store_id == store_id,
-            Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-            Order.created_at >= last_month_start,
-            Order.created_at < month_start
-        ).scalar() or 0
-        
-        # คำนวณ % การเปลี่ยนแปลง
-        change_today = ((today_sales - yesterday_sales) / yesterday_sales * 100) if yesterday_sales > 0 else 0
-        change_week = ((week_sales - last_week_sales) / last_week_sales * 100) if last_week_sales > 0 else 0
-        change_month = ((month_sales - last_month_sales) / last_month_sales * 100) if last_month_sales > 0 else 0
-        
+        sales = daily_sales_repository.store_revenue_between(db, store_id, {
+            "today": (today, today),
+            "yesterday": (today - timedelta(days=1), today - timedelta(days=1)),
+            "week": (week_start, today),
+            "last_week": (week_start - timedelta(days=7), week_start - timedelta(days=1)),
+            "month": (month_start, today),
+            "last_month": (last_month_start, month_start - timedelta(days=1)),
+        })
+
+        # จำนวนออเดอร์ตามสถานะ / ลูกค้า / คำขอคืน → query เดียว
+        def count_status(status):
+            return func.count(Order.order_id).filter(Order.order_status == status)
+
+        return_order = aliased(Order)
+        pending_returns_sq = (
+            select(func.count(ReturnOrder.return_id))
+            .join(return_order, return_order.order_id == ReturnOrder.order_id)
+            .where(
+                return_order.store_id == store_id,
+                ReturnOrder.status == ReturnStatus.PENDING
+            )
+            .scalar_subquery()
+        )
+
+        summary = db.query(
+            count_status("PREPARING").label("preparing"),
+            count_status("SHIPPED").label("shipped"),
+            count_status("DELIVERED").label("delivered"),
+            count_status("COMPLETED").label("completed"),
+            func.count(func.distinct(Order.user_id)).label("customers"),
+            pending_returns_sq.label("pending_returns"),
+        ).filter(Order.store_id == store_id).one()
+
+        def change(current, previous):
+            return ((current - previous) / previous * 100) if previous > 0 else 0
+
         # ─────────────────────────────────────────────────────────────
         # สินค้าขายดี Top 3
         # ✅ เปลี่ยนจาก join Product มาใช้ snapshot product_name จาก order_items
@@ -160,7 +194,7 @@ class SellerService:
             .join(Order, Order.order_id == OrderItem.order_id)
             .filter(
                 Order.store_id == store_id,
-                Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED'])
+                Order.order_status.in_(SALES_STATUSES)
             )
             .group_by(OrderItem.product_id, OrderItem.product_name, OrderItem.product_image_url)
             .order_by(func.sum(OrderItem.quantity).desc())
@@ -168,159 +202,183 @@ class SellerService:
             .all()
         )
 
-        top_products = []
-        for row in top_raw:
-            # ถ้า product ยังอยู่ ลองดึงรูปล่าสุดจาก DB มาแทน snapshot
-            image_url = row.product_image_url or ''
-            if row.product_id and not image_url:
-                img = db.query(ProductImage).filter(
-                    ProductImage.product_id == row.product_id,
+        # ถ้า product ยังอยู่แต่ snapshot ไม่มีรูป → ดึงรูปหลักล่าสุดจาก DB (query เดียว)
+        missing_image_ids = [row.product_id for row in top_raw if row.product_id and not row.product_image_url]
+        main_images = {}
+        if missing_image_ids:
+            main_images = dict(
+                db.query(ProductImage.product_id, ProductImage.image_url)
+                .filter(
+                    ProductImage.product_id.in_(missing_image_ids),
                     ProductImage.is_main == True,
                     ProductImage.variant_id == None,
-                ).first()
-                if img:
-                    image_url = img.image_url or ''
+                )
+                .all()
+            )
 
-            top_products.append({
+        top_products = [
+            {
                 'product_id': str(row.product_id) if row.product_id else None,
                 'product_name': row.product_name or 'สินค้าถูกลบออกจากระบบ',
-                'image_url': image_url,
+                'image_url': row.product_image_url or main_images.get(row.product_id) or '',
                 'sold_count': row.sold_count,
                 'revenue': float(row.revenue),
-            })
-        
-        # ข้อมูลกราฟยอดขาย 7 วันย้อนหลัง
+            }
+            for row in top_raw
+        ]
+
+        # ─────────────────────────────────────────────────────────────
+        # กราฟยอดขาย
+        # ─────────────────────────────────────────────────────────────
+        if month and not (start or end):
+            try:
+                month_first = datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+            start = month_first
+            end = (month_first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        end = end or today
+        start = start or end - timedelta(days=DEFAULT_CHART_DAYS - 1)
+        if start > end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+
+        buckets = _chart_buckets(start, end, granularity)
+        if len(buckets) > MAX_CHART_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Chart range too large (max {MAX_CHART_BUCKETS} buckets)")
+
+        chart_rows = daily_sales_repository.sales_by_bucket(
+            db, start, end, granularity, store_id=store_id
+        )
+        by_bucket = {row.bucket.date(): row for row in chart_rows}
+
         sales_chart = []
-        thai_days = ['จ', 'อ', 'พ', 'พฤ', 'ศ', 'ส', 'อา']
-        
-        for i in range(6, -1, -1):
-            day_start = today_start - timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-            
-            daily_sales = db.query(func.sum(Order.total_price)).filter(
-                Order.store_id == store_id,
-                Order.order_status.in_(['PAID', 'PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']),
-                Order.created_at >= day_start,
-                Order.created_at < day_end
-            ).scalar() or 0
-            
-            day_name = thai_days[day_start.weekday()]
+        for bucket in buckets:
+            row = by_bucket.get(bucket)
             sales_chart.append({
-                'date': day_name,
-                'sales': float(daily_sales)
+                'date': _bucket_label(bucket, granularity, len(buckets)),
+                'bucket': bucket.isoformat(),
+                'sales': float(row.revenue) if row else 0.0,
+                'orders': int(row.order_count) if row else 0,
             })
-        
-        # นับจำนวนออเดอร์แต่ละสถานะ
-        order_counts = db.query(
-            Order.order_status,
-            func.count(Order.order_id).label('count')
-        ).filter(Order.store_id == store_id)\
-        .group_by(Order.order_status).all()
-        
-        status_counts = {status: 0 for status in ['PREPARING', 'SHIPPED', 'DELIVERED', 'COMPLETED']}
-        for status, count in order_counts:
-            if status in status_counts:
-                status_counts[status] = count
-        
-        # นับจำนวนลูกค้า
-        total_customers = db.query(func.count(func.distinct(Order.user_id))).filter(
-            Order.store_id == store_id
-        ).scalar() or 0
-        
-        # นับคำขอคืนสินค้าที่รอดำเนินการ
-        pending_returns = db.query(func.count(ReturnOrder.return_id)).join(
-            Order, Order.order_id == ReturnOrder.order_id
-        ).filter(
-            Order.store_id == store_id,
-            ReturnOrder.status == ReturnStatus.PENDING
-        ).scalar() or 0
-        
+
         return {
             'sales_stats': {
-                'today': float(today_sales),
-                'week': float(week_sales),
-                'month': float(month_sales),
-                'change_today': round(change_today, 2),
-                'change_week': round(change_week, 2),
-                'change_month': round(change_month, 2)
+                'today': float(sales.today),
+                'week': float(sales.week),
+                'month': float(sales.month),
+                'change_today': round(change(sales.today, sales.yesterday), 2),
+                'change_week': round(change(sales.week, sales.last_week), 2),
+                'change_month': round(change(sales.month, sales.last_month), 2)
             },
             'top_products': top_products,
             'sales_chart': sales_chart,
+            'chart_range': {
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'granularity': granularity,
+            },
             'order_status_count': {
-                'preparing': status_counts['PREPARING'],
-                'shipped': status_counts['SHIPPED'],
-                'delivered': status_counts['DELIVERED'],
-                'completed': status_counts['COMPLETED']
+                'preparing': summary.preparing,
+                'shipped': summary.shipped,
+                'delivered': summary.delivered,
+                'completed': summary.completed
             },
-            'total_customers': total_customers,
-            'pending_returns': pending_returns
+            'total_customers': summary.customers,
+            'pending_returns': summary.pending_returns or 0
         }
     
     @staticmethod
-    def get_seller_orders(db: Session, store_id: str, status: Optional[str] = None):
-        """ดึงรายการออเดอร์ของร้าน"""
-        query = db.query(Order).filter(Order.store_id == store_id)
+    def get_seller_orders(
+        db: Session,
+        store_id: str,
+        status: Optional[List[str]] = None,
+        limit: Optional[int] = 20,
+        cursor: Optional[str] = None,
+        count: str = "none",
+        compact: bool = False,
+    ):
+        """
+        ดึงรายการออเดอร์ของร้าน (keyset pagination เรียงใหม่สุดก่อน)
+        limit=None → ทุกออเดอร์ (ไม่แบ่งหน้า, next_cursor = None)
+
+        ข้อมูลที่เกี่ยวข้องโหลดเป็นชุดต่อหน้า (selectinload / IN) ไม่ query ทีละออเดอร์:
+            orders → order_items → users (เบอร์โทร) → shipping_addresses
+            → products (+ images) / variants เฉพาะรายการที่ไม่มี snapshot
+        compact=True → ไม่ส่งที่อยู่และรายการสินค้า (ส่งจำนวนชิ้น + รูป/ชื่อตัวอย่างแทน)
 
+        Returns:
+            (orders, next_cursor, total)
+        """
+        options = [
+            selectinload(Order.order_items),
+            selectinload(Order.user).load_only(User.user_id, User.phone_number),
+        ]
+        if not compact:
+            options.append(selectinload(Order.shipping_address))
+
+        query = db.query(Order).options(*options).filter(Order.store_id == store_id)
         if status:
-            query = query.filter(Order.order_status == status)
+            query = query.filter(Order.order_status.in_(status))
+
+        total = count_rows(db, query, count)
+        if limit is None:
+            orders = query.order_by(Order.created_at.desc(), Order.order_id.desc()).all()
+            next_cursor = None
+        else:
+            orders, next_cursor = keyset_page(query, Order.created_at, Order.order_id, limit, cursor)
+
+        # fallback ของสินค้าที่ไม่มี snapshot (ออเดอร์เก่า) → โหลดรวมครั้งเดียว
+        items = [item for order in orders for item in order.order_items]
+        product_ids = {
+            item.product_id for item in items
+            if item.product_id and not (item.product_name and item.product_image_url)
+        }
+        variant_ids = {item.variant_id for item in items if item.variant_id and not item.variant_name}
+
+        products = {}
+        if product_ids:
+            products = {
+                p.product_id: p
+                for p in (
+                    db.query(Product)
+                    .options(selectinload(Product.images))
+                    .filter(Product.product_id.in_(product_ids))
+                    .all()
+                )
+            }
+        variant_names = {}
+        if variant_ids and not compact:
+            variant_names = dict(
+                db.query(ProductVariant.variant_id, ProductVariant.name_option)
+                .filter(ProductVariant.variant_id.in_(variant_ids))
+                .all()
+            )
 
-        orders = query.order_by(Order.created_at.desc()).all()
+        def item_image(item):
+            # ✅ image_url: อ่าน snapshot ก่อน look for is_main first, ถ้าไม่มีเอารูปแรก
+            if item.product_image_url:
+                return item.product_image_url
+            product = products.get(item.product_id)
+            if not product or not product.images:
+                return None
+            main_img = next((img for img in product.images if img.is_main), None)
+            return (main_img or product.images[0]).image_url
+
+        def item_name(item):
+            # ✅ product name: อ่าน snapshot ก่อน fallback product
+            product = products.get(item.product_id)
+            return (
+                item.product_name
+                or (product.product_name if product else None)
+                or 'สินค้าถูกลบออกจากระบบ'
+            )
 
         result = []
         for order in orders:
-            # ดึงข้อมูลลูกค้า (user_id อาจเป็น null ถ้า user ถูกลบ)
-            user = db.query(User).filter(User.user_id == order.user_id).first() if order.user_id else None
-
-            # ดึงที่อยู่จัดส่ง (ship_addr_id อาจเป็น null ถ้า address ถูกลบ)
-            shipping_addr = db.query(ShippingAddress).filter(
-                ShippingAddress.ship_addr_id == order.ship_addr_id
-            ).first() if order.ship_addr_id else None
-
-            # build order_items
-            order_items = []
-            for item in order.order_items:
-                product = getattr(item, 'product', None)
-                variant = getattr(item, 'variant', None)
-
-                # ✅ product name: อ่าน snapshot ก่อน fallback relationship
-                product_name = (
-                    item.product_name
-                    or (getattr(product, 'product_name', None) if product else None)
-                    or 'สินค้าถูกลบออกจากระบบ'
-                )
-
-                # ✅ variant name: อ่าน snapshot ก่อน fallback relationship
-                variant_name = (
-                    item.variant_name
-                    or (variant.name_option if variant and getattr(variant, 'name_option', None) else None)
-                    or ''
-                )
-
-                # ✅ image_url: อ่าน snapshot ก่อน
-                # look for is_main first, ถ้าไม่มีเอารูปแรก
-                image_url = item.product_image_url
-                if not image_url and product and getattr(product, 'images', None):
-                    main_img = next((img for img in product.images if getattr(img, 'is_main', False)), None)
-                    if main_img and getattr(main_img, 'image_url', None):
-                        image_url = main_img.image_url
-                    else:
-                        first_img = product.images[0] if product.images else None
-                        image_url = getattr(first_img, 'image_url', None)
-
-                order_items.append({
-                    'order_item_id': str(item.order_item_id),
-                    'product_id': str(item.product_id) if item.product_id else None,
-                    'product_name': product_name,
-                    'variant_name': variant_name,
-                    'quantity': item.quantity,
-                    'unit_price': float(item.unit_price),
-                    'image_url': image_url
-                })
-
-            result.append({
+            data = {
                 'order_id': str(order.order_id),
                 'customer_name': order.customer_name,
-                'customer_phone': user.phone_number if user else None,
+                'customer_phone': order.user.phone_number if order.user else None,
                 'order_status': order.order_status,
                 'order_text_status': order.order_text_status,
                 'total_price': float(order.total_price),
@@ -331,20 +389,44 @@ class SellerService:
                 'paid_at': order.paid_at.isoformat() if order.paid_at else None,
                 'delivered_at': order.delivered_at.isoformat() if order.delivered_at else None,
                 'completed_at': order.completed_at.isoformat() if order.completed_at else None,
+            }
+
+            if compact:
+                first_item = order.order_items[0] if order.order_items else None
+                data.update({
+                    'item_count': sum(item.quantity for item in order.order_items),
+                    'preview_name': item_name(first_item) if first_item else None,
+                    'preview_image_url': item_image(first_item) if first_item else None,
+                })
+                result.append(data)
+                continue
 
-                'order_items': order_items,
-                'shipping_address': {
-                    'full_name': shipping_addr.full_name,
-                    'phone_number': shipping_addr.phone_number,
-                    'address_line': shipping_addr.address_line,
-                    'sub_district': shipping_addr.sub_district,
-                    'district': shipping_addr.district,
-                    'province': shipping_addr.province,
-                    'postal_code': shipping_addr.postal_code
-                } if shipping_addr else None
-            })
-
-        return result
+            shipping_addr = order.shipping_address
+            data['order_items'] = [
+                {
+                    'order_item_id': str(item.order_item_id),
+                    'product_id': str(item.product_id) if item.product_id else None,
+                    'product_name': item_name(item),
+                    # ✅ variant name: อ่าน snapshot ก่อน fallback variant
+                    'variant_name': item.variant_name or variant_names.get(item.variant_id) or '',
+                    'quantity': item.quantity,
+                    'unit_price': float(item.unit_price),
+                    'image_url': item_image(item)
+                }
+                for item in order.order_items
+            ]
+            data['shipping_address'] = {
+                'full_name': shipping_addr.full_name,
+                'phone_number': shipping_addr.phone_number,
+                'address_line': shipping_addr.address_line,
+                'sub_district': shipping_addr.sub_district,
+                'district': shipping_addr.district,
+                'province': shipping_addr.province,
+                'postal_code': shipping_addr.postal_code
+            } if shipping_addr else None
+            result.append(data)
+
+        return result, next_cursor, total
     
     @staticmethod
     async def confirm_order_shipped(
@@ -563,6 +645,7 @@ class SellerService:
             ret.updated_at = now_utc()
             if ret.order:
                 ret.order.updated_at = now_utc()
+                daily_sales_repository.refresh_orders(db, [ret.order.order_id])
             db.commit()
 
             # ── notify หลัง commit เท่านั้น ──
@@ -1,10 +1,20 @@
 # app/services/stock_service.py
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
 from uuid import UUID
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import exists, select, update
 from sqlalchemy.orm import noload
+from app.core.stripe_client import stripe
+from app.models.order import Order
+from app.models.payment import Payment, PaymentStatus
 from app.models.stock_reservation import StockReservation
 from app.models.product import ProductVariant
+from app.repositories import product_listing_repository
+from app.repositories.stock_reservation_repository import release_reservations
+from app.utils.now_utc import now_utc
+from app.services import catalog_cache_service
 
 def commit_stock_for_order(db: Session, order_id: UUID) -> None:
     """
@@ -25,11 +35,12 @@ def commit_stock_for_order(db: Session, order_id: UUID) -> None:
     for r in reservations:
         qty_by_variant[r.variant_id] = qty_by_variant.get(r.variant_id, 0) + int(r.quantity)
 
-    # lock แถว variant กัน race (Postgres)
+    # lock แถว variant กัน race (Postgres) — เรียงตาม variant_id เหมือน checkout กัน deadlock
     variants = (
         db.query(ProductVariant)
         .options(noload('*'))
         .filter(ProductVariant.variant_id.in_(list(qty_by_variant.keys())))
+        .order_by(ProductVariant.variant_id)
         .with_for_update()
         .all()
     )
@@ -50,6 +61,8 @@ def commit_stock_for_order(db: Session, order_id: UUID) -> None:
             raise ValueError(f"Stock negative for variant {variant_id}: {current} - {qty}")
 
         v.stock = new_stock
+        # reservation ถูกใช้แล้ว → คืน reserved_qty
+        v.reserved_qty = max(int(v.reserved_qty or 0) - qty, 0)
 
     # ลบ reservation ของ order นี้ทิ้ง
     (
@@ -57,3 +70,195 @@ def commit_stock_for_order(db: Session, order_id: UUID) -> None:
         .filter(StockReservation.order_id == order_id)
         .delete(synchronize_session=False)
     )
+
+    # stock เปลี่ยน → sync read model (สินค้าที่ stock หมดจะหลุดจากหน้า listing)
+    product_listing_repository.refresh_products(db, {v.product_id for v in variants})
+    catalog_cache_service.invalidate_products(db, {v.product_id for v in variants})
+
+
+EXPIRED_ORDER_TEXT = "ยกเลิกอัตโนมัติ (หมดเวลาชำระเงิน)"
+
+
+def _close_stripe_session(session_id: str) -> Optional[str]:
+    """
+    ปิด checkout session ก่อนยกเลิกออเดอร์ (กันลูกค้าจ่ายเงินเข้ามาหลังยกเลิก)
+    คืน "expired" = ยกเลิกได้, "paid" = จ่ายแล้ว (รอ webhook), None = ยังไม่แน่ใจ (รอบหน้าลองใหม่)
+    """
+    try:
+        session = stripe.checkout.Session.expire(session_id)
+    except stripe.InvalidRequestError:
+        # session ไม่ได้ open แล้ว (complete / expired ไปก่อน) → ดูสถานะจริง
+        try:
+            session = stripe.checkout.Session.retrieve(session_id)
+        except Exception as e:
+            print(f"⚠️ [Sweeper] Could not retrieve Stripe session {session_id}: {e}")
+            return None
+    except Exception as e:
+        print(f"⚠️ [Sweeper] Could not expire Stripe session {session_id}: {e}")
+        return None
+
+    if session.get("payment_status") == "paid":
+        return "paid"
+    if session.get("status") == "expired":
+        return "expired"
+    # complete แต่ยังไม่ paid (async payment) → รอ async_payment_succeeded / failed
+    return None
+
+
+def _cancel_expired_orders_batch(
+    db: Session,
+    cutoff: datetime,
+    batch_size: int,
+    skip_order_ids: Set[UUID],
+) -> Dict[str, Any]:
+    """
+    1 batch: ยกเลิกออเดอร์ UNPAID ที่ reservation หมดอายุ + ลบ reservation + payment → FAILED
+
+    ไม่ถือ lock ระหว่างถาม Stripe:
+    1) เลือกออเดอร์ที่เข้าเงื่อนไข (ไม่ lock) แล้วจบ transaction
+    2) expire / ตรวจ Stripe session นอก transaction
+    3) ยกเลิกด้วย UPDATE เดียว (lock + ตรวจสถานะซ้ำใน WHERE) → ออเดอร์ที่ webhook ย้ายไปแล้วระหว่างนั้นจะไม่โดน
+    session ที่จ่ายแล้ว / ถาม Stripe ไม่ได้ → ข้าม (ใส่ skip_order_ids) ปล่อยให้ webhook / รอบหน้าจัดการ
+    """
+    has_expired_reservation = exists().where(
+        StockReservation.order_id == Order.order_id,
+        StockReservation.expires_at < cutoff,
+    )
+    query = (
+        select(Order.order_id, Payment.stripe_session_id)
+        .outerjoin(Payment, Payment.payment_id == Order.payment_id)
+        .where(Order.order_status == "UNPAID", has_expired_reservation)
+        .limit(batch_size)
+    )
+    if skip_order_ids:
+        query = query.where(Order.order_id.notin_(skip_order_ids))
+    candidates = db.execute(query).all()
+    db.commit()
+
+    # หลายออเดอร์ (หลายร้าน) ใช้ session เดียวกัน → ถาม Stripe ครั้งเดียวต่อ session
+    session_state: Dict[str, Optional[str]] = {}
+    for _, session_id in candidates:
+        if session_id and session_id not in session_state:
+            session_state[session_id] = _close_stripe_session(session_id)
+
+    to_cancel = []
+    paid = 0
+    for order_id, session_id in candidates:
+        state = session_state.get(session_id) if session_id else "expired"
+        if state == "expired":
+            to_cancel.append(order_id)
+            continue
+        skip_order_ids.add(order_id)
+        if state == "paid":
+            paid += 1
+            print(f"⚠️ [Sweeper] Order {order_id} already paid on Stripe, waiting for webhook")
+
+    cancelled = []
+    if to_cancel:
+        cancelled = db.execute(
+            update(Order)
+            .where(
+                Order.order_id.in_(to_cancel),
+                Order.order_status == "UNPAID",
+                has_expired_reservation,
+            )
+            .values(order_status="CANCELLED", order_text_status=EXPIRED_ORDER_TEXT, updated_at=now_utc())
+            .returning(Order.order_id, Order.payment_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    order_ids = [order_id for order_id, _ in cancelled]
+    payment_ids = {payment_id for _, payment_id in cancelled if payment_id}
+
+    released = release_reservations(db, StockReservation.order_id.in_(order_ids)) if order_ids else {}
+
+    payments_failed = 0
+    if payment_ids:
+        payments_failed = db.execute(
+            update(Payment)
+            .where(
+                Payment.payment_id.in_(payment_ids),
+                Payment.status == PaymentStatus.PENDING,
+            )
+            .values(status=PaymentStatus.FAILED)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    db.commit()
+    return {
+        "scanned": len(candidates),
+        "orders": len(order_ids),
+        "orders_paid_pending": paid,
+        "reservations_qty": sum(released.values()),
+        "payments": payments_failed,
+    }
+
+
+def _release_stale_reservations_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """reservation หมดอายุที่ไม่มีออเดอร์ UNPAID รออยู่แล้ว (ยกเลิก / ชำระไปแล้ว) → ลบ + คืน reserved_qty"""
+    stale = (
+        select(StockReservation.reservation_id)
+        .where(
+            StockReservation.expires_at < cutoff,
+            # ออเดอร์ UNPAID ปล่อยให้ _cancel_expired_orders_batch จัดการ (ยกเลิกพร้อมกัน)
+            ~exists().where(
+                Order.order_id == StockReservation.order_id,
+                Order.order_status == "UNPAID",
+            ),
+        )
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    released = release_reservations(db, StockReservation.reservation_id.in_(stale))
+    db.commit()
+    return sum(released.values())
+
+
+def sweep_expired_reservations(
+    db: Session,
+    batch_size: int = 500,
+    max_batches: int = 20,
+    grace_seconds: int = 60,
+) -> Dict[str, int]:
+    """
+    ยกเลิกออเดอร์ที่หมดเวลาชำระเงิน + คืน stock ที่จองไว้ เป็นชุด (batch ละ 1 transaction)
+    - grace_seconds: รอ webhook ที่มาช้าเล็กน้อยก่อนยกเลิก
+    - ก่อนยกเลิก expire / ตรวจ Stripe session ก่อนทุกครั้ง: จ่ายแล้ว → ไม่ยกเลิก (webhook ย้ายไป PREPARING)
+      ไม่ refund เงินของออเดอร์ที่จ่ายช้ากว่า grace window
+    - หยุดเมื่อ batch ไม่เต็ม หรือครบ max_batches (รอบถัดไปทำต่อ)
+
+    Returns:
+        จำนวนแถวที่จัดการในรอบนี้ (ใช้เป็น metrics)
+    """
+    started = time.perf_counter()
+    cutoff = now_utc() - timedelta(seconds=grace_seconds)
+    stats = {
+        "batches": 0,
+        "orders_cancelled": 0,
+        "orders_skipped": 0,
+        "orders_paid_pending": 0,
+        "payments_failed": 0,
+        "reserved_qty_released": 0,
+    }
+    # ออเดอร์ที่ยังยกเลิกไม่ได้ในรอบนี้ → ไม่หยิบซ้ำใน batch ถัดไป
+    skip_order_ids: Set[UUID] = set()
+
+    for _ in range(max_batches):
+        result = _cancel_expired_orders_batch(db, cutoff, batch_size, skip_order_ids)
+        stats["batches"] += 1
+        stats["orders_cancelled"] += result["orders"]
+        stats["orders_paid_pending"] += result["orders_paid_pending"]
+        stats["payments_failed"] += result["payments"]
+        stats["reserved_qty_released"] += result["reservations_qty"]
+        if result["scanned"] < batch_size:
+            break
+    stats["orders_skipped"] = len(skip_order_ids)
+
+    for _ in range(max_batches):
+        released = _release_stale_reservations_batch(db, cutoff, batch_size)
+        stats["reserved_qty_released"] += released
+        if not released:
+            break
+
+    stats["duration_ms"] = int((time.perf_counter() - started) * 1000)
+    return stats
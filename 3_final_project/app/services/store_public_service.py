@@ -2,7 +2,7 @@
 """
 Store Public Service - ดูข้อมูลร้านค้าสาธารณะ
 """
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, desc
 from typing import Optional, Tuple, Dict, List
 
@@ -10,6 +10,49 @@ from app.models.store import Store
 from app.models.product import Product
 from app.models.category import Category
 from app.models.review import Review
+from app.core.cache import cached
+from app.repositories.product_card_repository import get_review_stats_map, get_variant_stats_map
+from app.services import catalog_cache_service
+from app.services.image_derivative_service import derivative_url
+from app.utils.pagination import count_rows, keyset_page, offset_page
+
+
+def _load_public_store_detail(db: Session, store_id: str) -> Optional[Dict]:
+    store = db.query(Store).filter(
+        Store.store_id == store_id,
+        Store.is_active == True
+    ).first()
+    
+    if not store:
+        return None
+    
+    # นับจำนวนสินค้า
+    total_products = db.query(func.count(Product.product_id)).filter(
+        Product.store_id == store_id,
+        Product.is_active == True
+    ).scalar() or 0
+    
+    # นับจำนวนรีวิว + เรตติ้งเฉลี่ยใน query เดียว
+    total_reviews, avg_rating = db.query(
+        func.count(Review.review_id),
+        func.avg(Review.rating),
+    ).join(
+        Product, Review.product_id == Product.product_id
+    ).filter(
+        Product.store_id == store_id
+    ).one()
+    
+    return {
+        'store_id': str(store.store_id),
+        'name': store.name,
+        'description': store.description,
+        'address': store.address,
+        'logo': store.logo_path,
+        'rating': float(avg_rating) if avg_rating else 0.0,
+        'total_reviews': total_reviews or 0,
+        'total_products': total_products,
+        'is_active': store.is_active,
+    }
 
 
 def get_public_store_detail_service(
@@ -17,52 +60,21 @@ def get_public_store_detail_service(
     store_id: str
 ) -> Tuple[Optional[Dict], Optional[str]]:
     """
-    ดึงข้อมูลร้านค้าสาธารณะ
+    ดึงข้อมูลร้านค้าสาธารณะ (cache — ลบเมื่อร้าน / สินค้า / รีวิวเปลี่ยน)
     
     Returns:
         (store_data, error)
     """
     try:
-        store = db.query(Store).filter(
-            Store.store_id == store_id,
-            Store.is_active == True
-        ).first()
+        store_data = cached(
+            catalog_cache_service.store_detail_key(store_id),
+            lambda: _load_public_store_detail(db, store_id),
+            catalog_cache_service.STORE_TTL,
+        )
         
-        if not store:
+        if not store_data:
             return None, "ไม่พบร้านค้าหรือร้านค้าถูกปิดการใช้งาน"
         
-        # นับจำนวนสินค้า
-        total_products = db.query(func.count(Product.product_id)).filter(
-            Product.store_id == store_id,
-            Product.is_active == True
-        ).scalar() or 0
-        
-        # นับจำนวนรีวิว
-        total_reviews = db.query(func.count(Review.review_id)).join(
-            Product, Review.product_id == Product.product_id
-        ).filter(
-            Product.store_id == store_id
-        ).scalar() or 0
-        
-        # คำนวณเรตติ้งเฉลี่ย
-        avg_rating = db.query(func.avg(Review.rating)).join(
-            Product, Review.product_id == Product.product_id
-        ).filter(
-            Product.store_id == store_id
-        ).scalar() or 0.0
-        
-        store_data = {
-            'store_id': str(store.store_id),
-            'name': store.name,
-            'description': store.description,
-            'address': store.address,
-            'logo': store.logo_path,
-            'rating': float(avg_rating) if avg_rating else 0.0,
-            'total_reviews': total_reviews,
-            'total_products': total_products,
-            'is_active': store.is_active,
-        }
-        
         return store_data, None
         
     except Exception as e:
@@ -70,14 +82,94 @@ def get_public_store_detail_service(
         return None, f"เกิดข้อผิดพลาด: {str(e)}"
 
 
+def _build_store_product_cards(db: Session, products: List[Product]) -> List[Dict]:
+    """
+    แปลงสินค้าทั้งหน้าเป็นการ์ดสินค้า
+    ราคา/สต็อก/รีวิว ดึงแบบ batch (query ละ 1 ครั้งต่อหน้า) แทนการ query ทีละสินค้า
+    """
+    product_ids = [product.product_id for product in products]
+    variant_stats = get_variant_stats_map(db, product_ids)
+    review_stats = get_review_stats_map(db, product_ids)
+
+    products_list = []
+    for product in products:
+        stats = variant_stats.get(product.product_id, {})
+        reviews = review_stats.get(product.product_id, {})
+
+        # ดึงรูปแรก (is_main=True หรือรูปแรก) — images โหลดมาพร้อม product แล้ว (lazy="joined")
+        main_image = None
+        if product.images:
+            main_image = next((img for img in product.images if img.is_main), None) or product.images[0]
+
+        # ดึงชื่อหมวดหมู่
+        category_name = None
+        if product.category_rel:
+            category_name = product.category_rel.name
+        elif product.category:
+            category_name = product.category
+
+        min_price = stats.get("min_price")
+        products_list.append({
+            'product_id': str(product.product_id),
+            'name': product.product_name,
+            'description': product.description,
+            'price': min_price if min_price is not None else float(product.base_price),
+            'image': derivative_url(main_image.image_url, main_image.derivatives, "card") if main_image else None,
+            'image_sizes': main_image.derivatives if main_image else None,
+            'category_id': str(product.category_id) if product.category_id else None,
+            'category_name': category_name,
+            'stock': stats.get("total_stock", 0),
+            'rating': reviews.get("rating", 0.0),
+            'review_count': reviews.get("review_count", 0),
+            'created_at': product.created_at.isoformat() if product.created_at else None,
+        })
+
+    return products_list
+
+
+def _page_store_products(
+    db: Session,
+    query,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    count: str,
+) -> Dict:
+    """
+    แบ่งหน้าสินค้าในร้าน
+    - มี cursor หรือหน้าแรก → keyset (created_at, product_id)
+    - skip > 0 แบบไม่มี cursor → OFFSET แบบเดิม
+    """
+    total = count_rows(db, query, count)
+    query = query.options(joinedload(Product.category_rel))
+
+    next_cursor = None
+    if cursor or not skip:
+        products, next_cursor = keyset_page(query, Product.created_at, Product.product_id, limit, cursor)
+        has_more = next_cursor is not None
+    else:
+        products, has_more = offset_page(
+            query.order_by(desc(Product.created_at), desc(Product.product_id)), skip, limit
+        )
+
+    return {
+        'products': _build_store_product_cards(db, products),
+        'total': total,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+
 def get_store_products_service(
     db: Session,
     store_id: str,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    count: str = "exact",
 ) -> Tuple[Optional[Dict], Optional[str]]:
     """
-    ดึงสินค้าทั้งหมดในร้าน
+    ดึงสินค้าทั้งหมดในร้าน (รองรับ cursor pagination — ดู _page_store_products)
     
     Returns:
         (data, error)
@@ -98,69 +190,16 @@ def get_store_products_service(
             Product.is_active == True
         )
         
-        total = query.count()
-        
-        products = query.order_by(desc(Product.created_at))\
-                        .offset(skip)\
-                        .limit(limit)\
-                        .all()
-        
-        # Format ข้อมูลสินค้า
-        products_list = []
-        for product in products:
-            # นับจำนวนรีวิว
-            review_count = db.query(func.count(Review.review_id)).filter(
-                Review.product_id == product.product_id
-            ).scalar() or 0
-            
-            # คำนวณเรตติ้งเฉลี่ย
-            avg_rating = db.query(func.avg(Review.rating)).filter(
-                Review.product_id == product.product_id
-            ).scalar() or 0.0
-            
-            # ดึงรูปแรก (is_main=True หรือรูปแรก)
-            main_image = None
-            if product.images and len(product.images) > 0:
-                # หารูป main ก่อน
-                for img in product.images:
-                    if img.is_main:
-                        main_image = img.image_url
-                        break
-                # ถ้าไม่มี main ให้ใช้รูปแรก
-                if not main_image:
-                    main_image = product.images[0].image_url
-            
-            # ดึงชื่อหมวดหมู่
-            category_name = None
-            if product.category_rel:
-                category_name = product.category_rel.name
-            elif product.category:
-                category_name = product.category
-            
-            active_variants = [v for v in product.variants if v.is_active]
-            min_price = min((v.price for v in active_variants), default=float(product.base_price))
-            
-            products_list.append({
-                'product_id': str(product.product_id),
-                'name': product.product_name,
-                'description': product.description,
-                'price': min_price,  # ← เปลี่ยนจาก float(product.base_price)
-                'image': main_image,
-                'category_id': str(product.category_id) if product.category_id else None,
-                'category_name': category_name,
-                'stock': sum(v.stock for v in product.variants if v.is_active),
-                'rating': float(avg_rating) if avg_rating else 0.0,
-                'review_count': review_count,
-                'created_at': product.created_at.isoformat() if product.created_at else None,
-            })
+        page = _page_store_products(db, query, skip, limit, cursor, count)
         
         return {
-            'products': products_list,
-            'total': total,
+            **page,
             'skip': skip,
             'limit': limit,
         }, None
         
+    except ValueError as e:
+        return None, str(e)
     except Exception as e:
         print(f"❌ [get_store_products_service] Error: {e}")
         return None, f"เกิดข้อผิดพลาด: {str(e)}"
@@ -171,10 +210,12 @@ def get_store_products_by_category_service(
     store_id: str,
     category_id: str,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    count: str = "exact",
 ) -> Tuple[Optional[Dict], Optional[str]]:
     """
-    ดึงสินค้าในร้านตามหมวดหมู่
+    ดึงสินค้าในร้านตามหมวดหมู่ (รองรับ cursor pagination — ดู _page_store_products)
     
     Returns:
         (data, error)
@@ -196,68 +237,17 @@ def get_store_products_by_category_service(
             Product.is_active == True
         )
         
-        total = query.count()
-        
-        products = query.order_by(desc(Product.created_at))\
-                        .offset(skip)\
-                        .limit(limit)\
-                        .all()
-        
-        # Format ข้อมูลสินค้า
-        products_list = []
-        for product in products:
-            # นับจำนวนรีวิว
-            review_count = db.query(func.count(Review.review_id)).filter(
-                Review.product_id == product.product_id
-            ).scalar() or 0
-            
-            # คำนวณเรตติ้งเฉลี่ย
-            avg_rating = db.query(func.avg(Review.rating)).filter(
-                Review.product_id == product.product_id
-            ).scalar() or 0.0
-            
-            # ดึงรูปแรก
-            main_image = None
-            if product.images and len(product.images) > 0:
-                for img in product.images:
-                    if img.is_main:
-                        main_image = img.image_url
-                        break
-                if not main_image:
-                    main_image = product.images[0].image_url
-            
-            # ดึงชื่อหมวดหมู่
-            category_name = None
-            if product.category_rel:
-                category_name = product.category_rel.name
-            elif product.category:
-                category_name = product.category
-                
-            active_variants = [v for v in product.variants if v.is_active]
-            min_price = min((v.price for v in active_variants), default=float(product.base_price))
-            
-            products_list.append({
-                'product_id': str(product.product_id),
-                'name': product.product_name,
-                'description': product.description,
-                'price': min_price,
-                'image': main_image,
-                'category_id': str(product.category_id) if product.category_id else None,
-                'category_name': category_name,
-                'stock': sum(v.stock for v in product.variants if v.is_active),
-                'rating': float(avg_rating) if avg_rating else 0.0,
-                'review_count': review_count,
-                'created_at': product.created_at.isoformat() if product.created_at else None,
-            })
+        page = _page_store_products(db, query, skip, limit, cursor, count)
         
         return {
-            'products': products_list,
-            'total': total,
+            **page,
             'skip': skip,
             'limit': limit,
             'category_id': category_id,
         }, None
         
+    except ValueError as e:
+        return None, str(e)
     except Exception as e:
         print(f"❌ [get_store_products_by_category_service] Error: {e}")
         return None, f"เกิดข้อผิดพลาด: {str(e)}"
@@ -6,10 +6,12 @@ import stripe
 from app.models import Store, Product, OrderItem
 from app.models.role import Role
 from app.models.user import User
-from app.repositories import store_application_repository, store_repository, user_repository
+from app.repositories import product_listing_repository, search_index_repository, store_application_repository, store_repository, user_repository
+from app.services import catalog_cache_service
 from app.utils.file_util import save_file, update_file, delete_file, rollback_and_cleanup
 from app.utils.response_handler import success_response, error_response
 from app.core.config import settings
+from app.core.principal import invalidate_principal
 
 UPLOAD_DIR = "app/uploads/store/logo"
 
@@ -62,6 +64,7 @@ def create_store_and_connect_stripe(
         )
         # เปลี่ยนเป็น seller 
         user.role_id = 2
+        invalidate_principal(db, user.user_id)
 
         db.add(store)
         db.commit()
@@ -167,6 +170,12 @@ def update_store_service(
         if address is not None:
             store.address = address
 
+        # ชื่อร้านแสดงบนการ์ดสินค้า → sync read model
+        if name is not None:
+            product_listing_repository.refresh_store(db, store.store_id)
+            search_index_repository.reindex_store(db, store.store_id)
+
+        catalog_cache_service.invalidate_store(db, store.store_id, with_products=name is not None)
         db.commit()
         db.refresh(store)
         
@@ -198,6 +207,7 @@ def delete_store_service(db: Session, user_data):
         return error_response("ไม่เจอชื่อผู้ใช้งาน", {"user": "ไม่เจอชื่อผู้ใช้งาน"}, status_code=404)
         
     user.role_id = 1
+    invalidate_principal(db, user.user_id)
 
     try:
         order_items = (
@@ -0,0 +1,297 @@
+# app/services/stripe_event_service.py
+"""
+ประมวลผล Stripe webhook event จากคิว stripe_events (รันใน Celery worker)
+
+    POST /stripe/webhook → ตรวจ signature → บันทึก event ดิบ → 200 ทันที
+    worker → claim_events → handle_event → mark_processed / mark_failed
+
+- event ของ payment เดียวกันประมวลผลตามลำดับทีละตัว (ordering_key)
+- handler ต้องรันซ้ำได้ (retry / replay) → ทุกขั้นตรวจสถานะก่อนเปลี่ยน
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.stripe_client import stripe
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.payment import Payment, PaymentStatus
+from app.models.product import Product
+from app.models.stripe_event import StripeEventStatus
+from app.repositories import cart_repository, daily_sales_repository
+from app.repositories import stripe_event_repository
+from app.services.notification_service import NotificationService
+from app.services.stock_service import commit_stock_for_order
+from app.services.stripe_webhook_service import StripeWebhookService
+from app.utils.now_utc import now_utc
+
+CHECKOUT_SESSION_EVENTS = (
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+    "checkout.session.async_payment_failed",
+    "checkout.session.expired",
+)
+
+# ✅ อ้างอิงตาม enum ฝั่ง client ที่ให้มา
+# - หลังชำระเงินสำเร็จ => PREPARING (ไม่ใช้ PAID เป็นสถานะหลักแล้ว)
+# - กัน event fail/expired มาทับออเดอร์ที่เลยจุดชำระเงิน/ดำเนินการไปแล้ว
+POST_PAYMENT_ORDER_STATUSES = {
+    "PAID",        # legacy เผื่อ DB มีของเก่า
+    "PREPARING",
+    "SHIPPED",
+    "DELIVERED",
+    "COMPLETED",
+    "RETURNING",
+    "RETURNED",
+}
+
+
+# ─────────────────────────────────────────
+# ingest (เรียกจาก endpoint)
+# ─────────────────────────────────────────
+
+def ordering_key(event: Dict[str, Any]) -> str:
+    """
+    event ที่ต้องประมวลผลตามลำดับกันได้ key เดียวกัน
+    checkout session → payment ของเรา, payment_intent → payment intent, อื่น ๆ → ตัว event เอง
+    """
+    obj = (event.get("data") or {}).get("object") or {}
+    if event.get("type") in CHECKOUT_SESSION_EVENTS:
+        app_payment_id = (obj.get("metadata") or {}).get("app_payment_id")
+        if app_payment_id:
+            return f"payment:{app_payment_id}"
+    if str(event.get("type", "")).startswith("payment_intent.") and obj.get("id"):
+        return f"payment_intent:{obj['id']}"
+    return f"event:{event['id']}"
+
+
+def event_values(event: Dict[str, Any]) -> dict:
+    """แถว stripe_events ของ event ที่ผ่านการตรวจ signature แล้ว"""
+    created = event.get("created")
+    return {
+        "event_id": event["id"],
+        "event_type": event["type"],
+        "payload": event,
+        "ordering_key": ordering_key(event),
+        "event_created_at": datetime.fromtimestamp(created, tz=timezone.utc) if created else now_utc(),
+    }
+
+
+# ─────────────────────────────────────────
+# handlers
+# ─────────────────────────────────────────
+
+def _clear_purchased_cart_items(db: Session, payment: Payment) -> None:
+    if not payment.selected_cart_item_ids:
+        return
+    ids = [UUID(x) for x in payment.selected_cart_item_ids]
+    cart_repository.delete_cart_items(db, payment.user_id, ids)
+    db.commit()
+
+
+def _update_orders_paid(db: Session, payment_id: UUID) -> None:
+    """
+    ✅ เมื่อชำระเงินสำเร็จ -> ให้ Order ไปเป็น PREPARING
+    (แทน PAID ตาม requirement ใหม่)
+    """
+    print("Updating orders to PREPARING for payment_id:", payment_id, flush=True)
+
+    orders = db.query(Order).filter(Order.payment_id == payment_id).all()
+    for o in orders:
+        # ถ้าออเดอร์ไปไกลกว่าเตรียมแล้ว อย่า downgrade
+        if not o.paid_at:
+            o.paid_at = now_utc()
+
+        if o.order_status in {"SHIPPED", "DELIVERED", "COMPLETED", "RETURNING", "RETURNED"}:
+            continue
+
+        # migrate legacy PAID -> PREPARING + revive CANCELLED (ถ้าธุรกิจมึงยอมรับ)
+        o.order_status = "PREPARING"
+        o.order_text_status = "กำลังเตรียมสินค้า"
+
+    daily_sales_repository.refresh_orders(db, [o.order_id for o in orders])
+    db.commit()
+
+
+def _update_orders_failed(db: Session, payment_id: UUID, reason_text: str) -> None:
+    """
+    ✅ failed/expired ไม่ควรมาทับออเดอร์ที่เลยจุดชำระเงิน/กำลังดำเนินการแล้ว
+    """
+    orders = db.query(Order).filter(Order.payment_id == payment_id).all()
+    for o in orders:
+        # กันไม่ให้ทับสถานะที่ผ่านจุดชำระเงินแล้ว
+        if o.order_status in POST_PAYMENT_ORDER_STATUSES:
+            continue
+
+        o.order_status = "CANCELLED"
+        o.order_text_status = reason_text
+
+    daily_sales_repository.refresh_orders(db, [o.order_id for o in orders])
+    db.commit()
+
+
+def _commit_stock_for_payment_orders(db: Session, payment_id: UUID) -> None:
+    orders = db.query(Order).filter(Order.payment_id == payment_id).all()
+    for o in orders:
+        commit_stock_for_order(db, o.order_id)
+    db.commit()
+
+
+async def _notify_orders_created(db: Session, orders) -> None:
+    for order in orders:
+        await NotificationService.notify(db, event="ORDER_CREATED", order=order)
+
+
+def _handle_checkout_session(db: Session, event_type: str, session: Dict[str, Any]) -> None:
+    metadata = session.get("metadata") or {}
+    app_payment_id = metadata.get("app_payment_id")
+
+    print("app_payment_id:", app_payment_id, flush=True)
+
+    if not app_payment_id:
+        return
+
+    try:
+        payment_id = UUID(app_payment_id)
+    except Exception:
+        return
+
+    payment = db.query(Payment).filter(Payment.payment_id == payment_id).first()
+    if not payment:
+        return
+
+    # ✅ SUCCESS
+    if event_type in ("checkout.session.completed", "checkout.session.async_payment_succeeded"):
+        # checkout.session.completed อาจมาแบบยังไม่ paid ได้
+        if event_type == "checkout.session.completed" and session.get("payment_status") != "paid":
+            return
+
+        # ✅ ถ้า orders ถูก CANCELLED ไปแล้วทั้งหมด -> refund และไม่ revive
+        orders = db.query(Order).filter(Order.payment_id == payment_id).all()
+
+        if orders and all(o.order_status == "CANCELLED" for o in orders):
+            if payment.status == PaymentStatus.REFUNDED:
+                return
+            print("⚠️ Order already CANCELLED. Refunding payment...", flush=True)
+
+            if session.get("payment_intent"):
+                try:
+                    # idempotency_key: retry / replay event เดิมไม่ refund ซ้ำ
+                    stripe.Refund.create(
+                        payment_intent=session["payment_intent"],
+                        idempotency_key=f"refund-cancelled-{payment_id}",
+                    )
+                    payment.status = PaymentStatus.REFUNDED
+                    db.commit()
+                except Exception as e:
+                    print(f"❌ Refund failed: {e}", flush=True)
+            return
+
+        # update payment record
+        if payment.status != PaymentStatus.SUCCESS:
+            payment.status = PaymentStatus.SUCCESS
+            payment.paid_at = now_utc()
+            if session.get("payment_intent"):
+                payment.payment_intent_id = session["payment_intent"]
+            db.commit()
+
+        # ✅ เปลี่ยนจาก PAID -> PREPARING
+        _update_orders_paid(db, payment_id)
+
+        # commit stock + clear cart
+        _commit_stock_for_payment_orders(db, payment_id)
+        _clear_purchased_cart_items(db, payment)
+
+        # 🔔 แจ้งเตือน (ดึง orders พร้อม order_items + product สำหรับ preview ชื่อสินค้า + รูป)
+        orders = db.query(Order).options(
+            joinedload(Order.order_items)
+            .joinedload(OrderItem.product)
+            .joinedload(Product.images)
+        ).filter(Order.payment_id == payment_id).all()
+
+        try:
+            asyncio.run(_notify_orders_created(db, orders))
+        except Exception as e:
+            # แจ้งเตือนพลาดไม่ต้อง retry ทั้ง event (ออเดอร์/stock เปลี่ยนไปแล้ว)
+            print(f"⚠️ [StripeEvent] notify failed: {e}", flush=True)
+        return
+
+    # ✅ FAILED
+    if event_type == "checkout.session.async_payment_failed":
+        if payment.status not in (PaymentStatus.SUCCESS, PaymentStatus.FAILED):
+            payment.status = PaymentStatus.FAILED
+            db.commit()
+        _update_orders_failed(db, payment_id, "ชำระเงินไม่สำเร็จ")
+        return
+
+    # ✅ EXPIRED
+    if event_type == "checkout.session.expired":
+        if payment.status != PaymentStatus.SUCCESS:
+            payment.status = PaymentStatus.FAILED
+            db.commit()
+            _update_orders_failed(db, payment_id, "หมดเวลาชำระเงิน")
+
+
+def handle_event(db: Session, event: Dict[str, Any]) -> None:
+    """ประมวลผล event หนึ่งตัว (raise → retry ตามรอบ)"""
+    event_type = event.get("type")
+
+    if event_type in CHECKOUT_SESSION_EVENTS:
+        _handle_checkout_session(db, event_type, event["data"]["object"])
+    elif event_type == "payment_intent.payment_failed":
+        StripeWebhookService.handle_payment_intent_failed(db, event)
+
+
+# ─────────────────────────────────────────
+# worker
+# ─────────────────────────────────────────
+
+def process_pending_events(
+    db: Session,
+    batch_size: int,
+    max_batches: int,
+    lease_seconds: int,
+    max_attempts: int,
+    retry_base_seconds: int,
+) -> Dict[str, Any]:
+    """
+    ดึง event จากคิวเป็นชุดแล้วประมวลผลทีละตัว จนคิวว่างหรือครบ max_batches
+    คืนสถิติของรอบนี้
+    """
+    started = time.perf_counter()
+    stats = {"batches": 0, "processed": 0, "failed": 0, "dead": 0}
+
+    for _ in range(max_batches):
+        claimed = stripe_event_repository.claim_events(db, batch_size, lease_seconds)
+        if not claimed:
+            break
+        stats["batches"] += 1
+
+        for event_id, payload, attempts in claimed:
+            error: Optional[str] = None
+            try:
+                handle_event(db, payload)
+            except Exception as e:
+                db.rollback()
+                error = f"{type(e).__name__}: {e}"
+
+            if error is None:
+                stripe_event_repository.mark_processed(db, event_id)
+                stats["processed"] += 1
+                continue
+
+            status = stripe_event_repository.mark_failed(
+                db, event_id, attempts, error, max_attempts, retry_base_seconds
+            )
+            stats["dead" if status == StripeEventStatus.DEAD else "failed"] += 1
+            print(f"❌ [StripeEvent] {event_id} attempt {attempts} → {status}: {error}", flush=True)
+
+        if len(claimed) < batch_size:
+            break
+
+    stats["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
@@ -10,6 +10,9 @@ from app.models.payment import Payment, PaymentStatus
 from app.models.stock_reservation import StockReservation
 from app.models.product import ProductVariant
 from app.models.cart import Cart, CartItem
+from app.repositories import product_listing_repository
+from app.repositories.stock_reservation_repository import release_reservations
+from app.services import catalog_cache_service
 from app.utils.now_utc import now_utc
 
 
@@ -88,9 +91,11 @@ class StripeWebhookService:
                     if variant.stock < 0:
                         variant.stock = 0
 
-            db.query(StockReservation).filter(
-                StockReservation.order_id == order.order_id
-            ).delete(synchronize_session=False)
+            release_reservations(db, StockReservation.order_id == order.order_id)
+
+            sold_product_ids = {item.product_id for item in order.order_items if item.variant_id}
+            product_listing_repository.refresh_products(db, sold_product_ids)
+            catalog_cache_service.invalidate_products(db, sold_product_ids)
 
         if is_from_cart and cart_id and user_id:
             cart = (
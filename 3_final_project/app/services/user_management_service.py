@@ -7,6 +7,7 @@ from sqlalchemy import func, or_, desc
 from typing import Optional, Tuple, Dict, Any, List
 from datetime import datetime, timedelta
 
+from app.core.principal import invalidate_principal
 from app.models.user import User
 from app.models.role import Role
 from app.models.store import Store
@@ -256,6 +257,7 @@ def update_user_by_admin_service(
                 setattr(user, field, value)
         
         user.updated_at = datetime.utcnow()
+        invalidate_principal(db, user.user_id)
         
         db.commit()
         db.refresh(user)
@@ -292,6 +294,7 @@ def toggle_user_status_service(
         # อัปเดตสถานะ
         user.is_active = status_data.is_active
         user.updated_at = datetime.utcnow()
+        invalidate_principal(db, user.user_id)
         
         db.commit()
         db.refresh(user)
@@ -341,6 +344,7 @@ def change_user_role_service(
         old_role_name = user.role.role_name if user.role else 'user'
         user.role_id = new_role.role_id
         user.updated_at = datetime.utcnow()
+        invalidate_principal(db, user.user_id)
         
         db.commit()
         db.refresh(user)
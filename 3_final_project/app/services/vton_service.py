@@ -3,11 +3,12 @@
 Service สำหรับจัดการระบบ Virtual Try-On (VTON)
 รวมการเรียก IDM VTON API
 """
-import io
 import os
+import json
 import uuid
-import requests
+import hashlib
 import base64
+from datetime import timedelta, timezone
 from typing import Optional
 from uuid import UUID
 from io import BytesIO
@@ -15,17 +16,25 @@ from PIL import Image
 # from rembg import remove
 
 from fastapi import UploadFile
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.core import http_client
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
 from app.models.user import User
-from app.models.product import UserTryOnImage, VTONSession, ProductVariant, ProductImage
+from app.models.product import UserTryOnImage, VTONSession, VTONSessionStatus, ProductVariant, ProductImage
 from app.models.vton_background import VTONBackground
 from app.models.garment_image import GarmentImage
 from app.models.garment_image import user_product_garments
-from app.utils.file_util import save_file, delete_file, rollback_and_cleanup
+from app.repositories import vton_cache_repository
+from app.utils.file_util import save_file, save_stream, delete_file, rollback_and_cleanup
 from app.utils.now_utc import now_utc
 from app.utils.response_handler import success_response, error_response
 
+VTON_CACHE_METRICS_KEY = "closetx:metrics:vton_cache"
+
 
 class VTONService:
     """Service สำหรับจัดการ Virtual Try-On"""
@@ -103,7 +112,7 @@ class VTONService:
                     return f"data:image/jpeg;base64,{base64.b64encode(img_data).decode()}"
             
             # ถ้าเป็น URL ให้ดาวน์โหลด
-            response = requests.get(image_url, timeout=10)
+            response = http_client.request("image_fetch", "GET", image_url, timeout=10)
             response.raise_for_status()
             img_data = response.content
             return f"data:image/jpeg;base64,{base64.b64encode(img_data).decode()}"
@@ -168,46 +177,49 @@ class VTONService:
                 "garment_des": garment_description
             }
             
-            # เรียก API
+            # เรียก API (pool + retry ของ http_client, body ของรูปไม่ถูกอ่านเข้า memory ทั้งก้อน)
             print(f"🔄 Calling IDM VTON API...")
             print(f"[IDM] Payload keys: {payload}")
             
-            response = requests.post(
+            result_filename = f"vton_result_{uuid.uuid4().hex}.jpg"
+            result_dir = "app/uploads/vton/results"
+
+            with http_client.stream(
+                "idm_vton",
+                "POST",
                 config["url"],
                 headers=headers,
                 json=payload,
                 timeout=config["timeout"]
-            )
-            
-            print("[IDM] status:", response.status_code)
-            
-            if response.status_code == 200:
+            ) as response:
+                print("[IDM] status:", response.status_code)
+
+                if response.status_code != 200:
+                    error_msg = f"IDM API error: {response.status_code} - {response.text}"
+                    print(f"❌ {error_msg}")
+                    return {
+                        "success": False,
+                        "image_url": None,
+                        "error": error_msg
+                    }
+
                 ct = (response.headers.get("Content-Type") or "").lower()
                 print("[IDM] content-type:", ct)
 
                 if ct.startswith("image/"):
-                    result_filename = f"vton_result_{uuid.uuid4().hex}.jpg"
-                    result_dir = "app/uploads/vton/results"
-
-                    # 1. แปลง bytes จาก response เป็น File-like object (BytesIO)
-                    content_io = io.BytesIO(response.content)
-
-                    # 2. จำลอง UploadFile object เพื่อให้ใช้กับฟังก์ชัน save_file ได้
-                    # เพราะ save_file ของคุณมีการเรียกใช้ file.file ข้างใน
-                    fake_upload_file = UploadFile(
-                        file=content_io, 
-                        filename=result_filename
+                    # ส่ง body ต่อไปที่ Disk / Cloudinary เป็นชิ้น (ตาม ENV เหมือน save_file)
+                    final_url_or_path, size_bytes = save_stream(
+                        result_dir,
+                        response.iter_content(http_client.CHUNK_SIZE),
+                        result_filename
                     )
 
-                    # 3. เรียกใช้ save_file ที่คุณเขียนไว้ 
-                    # (มันจะจัดการเช็คเองว่าต้องลง Disk หรือ Cloudinary ตาม ENV)
-                    final_url_or_path = save_file(result_dir, fake_upload_file, result_filename)
-
                     print(f"✅ IDM VTON API success - saved to {final_url_or_path}")
                     
                     return {
                         "success": True,
                         "image_url": final_url_or_path,
+                        "size_bytes": size_bytes,
                         "error": None
                     }
                 
@@ -222,44 +234,28 @@ class VTONService:
                         "image_url": None,
                         "error": error_msg
                     }
+            
+            print(f"[IDM] VTON API Response keys: {list(result) if isinstance(result, dict) else type(result)}")
+            
+            # IDM API ส่งผลลัพธ์เป็น base64 image
+            if isinstance(result, dict) and "image" in result and result["image"]:
+                # บันทึกรูปผลลัพธ์
+                result_image_data = base64.b64decode(result["image"])
+                result_path, size_bytes = save_stream(result_dir, [result_image_data], result_filename)
                 
-                print(f"[IDM] VTON API Response: {result}")
+                print(f"✅ IDM VTON API success - saved to {result_path}")
                 
-                # IDM API ส่งผลลัพธ์เป็น base64 image
-                if isinstance(result, dict) and "image" in result and result["image"]:
-                    # บันทึกรูปผลลัพธ์
-                    result_image_data = base64.b64decode(result["image"])
-                    
-                    # สร้าง unique filename
-                    result_filename = f"vton_result_{uuid.uuid4().hex}.jpg"
-                    result_dir = "app/uploads/vton/results"
-                    os.makedirs(result_dir, exist_ok=True)
-                    result_path = os.path.join(result_dir, result_filename)
-                    
-                    # บันทึกไฟล์
-                    with open(result_path, 'wb') as f:
-                        f.write(result_image_data)
-                    
-                    print(f"✅ IDM VTON API success - saved to {result_path}")
-                    
-                    return {
-                        "success": True,
-                        "image_url": result_path,
-                        "error": None
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "image_url": None,
-                        "error": "No image in API response"
-                    }
+                return {
+                    "success": True,
+                    "image_url": result_path,
+                    "size_bytes": size_bytes,
+                    "error": None
+                }
             else:
-                error_msg = f"IDM API error: {response.status_code} - {response.text}"
-                print(f"❌ {error_msg}")
                 return {
                     "success": False,
                     "image_url": None,
-                    "error": error_msg
+                    "error": "No image in API response"
                 }
                 
         except Exception as e:
@@ -272,6 +268,90 @@ class VTONService:
             }
 
 
+    # ==================== VTON RESULT CACHE ====================
+
+    @staticmethod
+    def _vton_cache_key(job_params: dict, model_used: str = "IDM-VTON") -> str:
+        """
+        sha256 ของ input ที่กำหนดภาพผลลัพธ์ (IDM ให้ภาพเดิมเมื่อ input + seed เดิม)
+        รูปคน / รูปเสื้อใช้ URL (ไฟล์ที่อัปโหลดได้ชื่อ / URL ใหม่ทุกครั้ง ไม่ถูกเขียนทับ)
+        """
+        material = json.dumps(
+            {
+                "model": model_used,
+                "human": job_params.get("human_img_url"),
+                "garment": job_params.get("garment_img_url"),
+                "description": job_params.get("garment_description") or "",
+                "category": job_params.get("category"),
+                "steps": job_params.get("steps"),
+                "seed": job_params.get("seed"),
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _record_cache_metric(name: str, amount: int = 1) -> None:
+        """ยอดสะสม hit / miss / evict ใน Redis (รวมทุก process) — ดูได้ที่ /internal/vton-cache"""
+        try:
+            get_redis().hincrby(VTON_CACHE_METRICS_KEY, name, amount)
+        except Exception as e:
+            print(f"⚠️ [VTONCache] Could not record metrics: {e}")
+
+    @staticmethod
+    def _release_result_file(db: Session, result_image_url: Optional[str]) -> None:
+        """ลบไฟล์ผลลัพธ์ ถ้าไม่มี cache และ session ไหนอ้างถึงแล้ว"""
+        if not result_image_url:
+            return
+        if vton_cache_repository.is_cached_url(db, result_image_url):
+            return
+        if vton_cache_repository.urls_in_use(db, [result_image_url]):
+            return
+        try:
+            delete_file(result_image_url)
+            print(f"✅ Deleted result image: {result_image_url}")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not delete result image file: {e}")
+
+    @staticmethod
+    def evict_vton_cache(db: Session, max_bytes: int, max_entries: int) -> dict:
+        """ลบ cache ที่ไม่ได้ใช้นานที่สุดจนไม่เกินขนาด แล้วลบไฟล์ที่ไม่มี session อ้างถึง"""
+        evicted = vton_cache_repository.evict(db, max_bytes, max_entries)
+        in_use = vton_cache_repository.urls_in_use(db, evicted)
+        files_deleted = 0
+        for url in evicted:
+            if url in in_use:
+                continue
+            try:
+                delete_file(url)
+                files_deleted += 1
+            except Exception as e:
+                print(f"⚠️ [VTONCache] Could not delete {url}: {e}")
+        if evicted:
+            VTONService._record_cache_metric("evicted", len(evicted))
+        return {"evicted": len(evicted), "files_deleted": files_deleted}
+
+    @staticmethod
+    def vton_cache_stats(db: Session) -> dict:
+        """ขนาด cache + hit rate ของ create_vton_session (รวมทุก process)"""
+        data = vton_cache_repository.cache_stats(db)
+        try:
+            raw = get_redis().hgetall(VTON_CACHE_METRICS_KEY)
+            metrics = {k.decode(): int(v) for k, v in raw.items()}
+        except Exception as e:
+            metrics = {"redis_error": str(e)}
+        hits = metrics.get("hits", 0)
+        lookups = hits + metrics.get("misses", 0)
+        return {
+            **data,
+            **metrics,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "enabled": settings.VTON_CACHE_ENABLED,
+            "max_bytes": settings.VTON_CACHE_MAX_BYTES,
+            "max_entries": settings.VTON_CACHE_MAX_ENTRIES,
+        }
+
+
     # ==================== USER TRYON IMAGES ====================
 
     @staticmethod
@@ -776,9 +856,11 @@ class VTONService:
         seed: int = 42
     ):
         """
-        สร้าง VTON Session (ลองเสื้อ) โดยเรียก IDM VTON API
+        สร้าง VTON Session (ลองเสื้อ) แล้วส่งงานเรียก IDM VTON API ให้ celery worker
         - รองรับทั้งเสื้อจาก Product (product_id + variant_id)
         - และเสื้อจาก Garment Images (garment_id)
+        - ตอบกลับทันที (202) พร้อม session_id สถานะ PENDING
+          ผลลัพธ์: poll GET /vton/sessions/{session_id} หรือรอ event "vton_session" ใน room user:<user_id>
         """
         try:
             # ✅ Validation
@@ -861,20 +943,82 @@ class VTONService:
                 chosen_img = main_img or images[0]
                 garment_img_url = chosen_img.image_url
 
-            # ✅ เรียก IDM VTON API
-            api_result = VTONService._call_idm_vton_api(
-                human_img_url=user_img.image_url,
-                garment_img_url=garment_img_url,
-                garment_description=garment_description,
-                category=category,
-                steps=steps,
-                seed=seed
-            )
+            job_params = {
+                "human_img_url": user_img.image_url,
+                "garment_img_url": garment_img_url,
+                "garment_description": garment_description,
+                "category": category,
+                "steps": steps,
+                "seed": seed,
+            }
 
-            if not api_result.get("success"):
-                return error_response("สร้างภาพลองเสื้อล้มเหลว", {"error": api_result.get("error")}, 502)
+            # ✅ input เดิม → ใช้ภาพจาก cache ทันที ไม่เรียก IDM API
+            cache_key = None
+            if settings.VTON_CACHE_ENABLED:
+                cache_key = VTONService._vton_cache_key(job_params)
+                job_params["cache_key"] = cache_key
+                cached_url = vton_cache_repository.lookup(db, cache_key)
+                if cached_url:
+                    session = VTONSession(
+                        user_id=user.user_id,
+                        product_id=product_id,
+                        variant_id=variant_id,
+                        garment_id=garment_id,
+                        user_image_id=user_image_id,
+                        background_id=background_id,
+                        result_image_url=cached_url,
+                        model_used="IDM-VTON",
+                        status=VTONSessionStatus.COMPLETED,
+                        job_params=job_params,
+                        generated_at=now_utc(),
+                        completed_at=now_utc()
+                    )
+                    db.add(session)
+                    db.commit()
+                    db.refresh(session)
+                    VTONService._record_cache_metric("hits")
+                    return success_response(
+                        "สร้าง VTON Session สำเร็จ",
+                        {**VTONService._serialize_session(session), "cached": True},
+                        201
+                    )
+                VTONService._record_cache_metric("misses")
 
-            result_image_url = api_result.get("image_url")
+            # ✅ จำกัดงานที่ยังไม่เสร็จต่อ user (lock แถว user กันกดรัว ๆ แล้วนับทันพร้อมกัน)
+            db.query(User.user_id).filter(User.user_id == user.user_id).with_for_update().first()
+            active = (
+                db.query(func.count(VTONSession.session_id))
+                .filter(
+                    VTONSession.user_id == user.user_id,
+                    VTONSession.status.in_(VTONSessionStatus.ACTIVE)
+                )
+                .scalar()
+            )
+            # กดซ้ำระหว่างงานเดิมยังไม่เสร็จ → คืนงานเดิม ไม่สร้างงานใหม่
+            if cache_key:
+                in_flight = (
+                    db.query(VTONSession)
+                    .filter(
+                        VTONSession.user_id == user.user_id,
+                        VTONSession.status.in_(VTONSessionStatus.ACTIVE),
+                        VTONSession.job_params["cache_key"].astext == cache_key
+                    )
+                    .first()
+                )
+                if in_flight:
+                    db.rollback()
+                    return success_response(
+                        "รับงานลองเสื้อแล้ว กำลังประมวลผล",
+                        VTONService._serialize_session(in_flight),
+                        202
+                    )
+            if active >= settings.VTON_MAX_ACTIVE_JOBS_PER_USER:
+                db.rollback()
+                return error_response(
+                    "มีงานลองเสื้อที่กำลังประมวลผลอยู่ กรุณารอให้เสร็จก่อน",
+                    {"active_jobs": active, "limit": settings.VTON_MAX_ACTIVE_JOBS_PER_USER},
+                    429
+                )
 
             session = VTONSession(
                 user_id=user.user_id,
@@ -883,8 +1027,9 @@ class VTONService:
                 garment_id=garment_id,
                 user_image_id=user_image_id,
                 background_id=background_id,
-                result_image_url=result_image_url,
                 model_used="IDM-VTON",
+                status=VTONSessionStatus.PENDING,
+                job_params=job_params,
                 generated_at=now_utc()
             )
 
@@ -892,21 +1037,172 @@ class VTONService:
             db.commit()
             db.refresh(session)
 
+            # ✅ ส่งงานให้ celery worker (เรียก IDM API นานได้หลายนาที ไม่ถือ thread ของ API ไว้)
+            from app.tasks.vton_tasks import generate_vton_task
+
+            try:
+                generate_vton_task.delay(str(session.session_id))
+            except Exception as e:
+                print(f"❌ Could not enqueue VTON job {session.session_id}: {e}")
+                session.status = VTONSessionStatus.FAILED
+                session.error_message = f"enqueue failed: {e}"
+                session.completed_at = now_utc()
+                db.commit()
+                return error_response("ระบบลองเสื้อไม่พร้อมใช้งาน กรุณาลองใหม่อีกครั้ง", {"error": str(e)}, 503)
+
             return success_response(
-                "สร้าง VTON Session สำเร็จ",
-                {
-                    "session_id": str(session.session_id),
-                    "result_image_url": session.result_image_url,
-                    "model_used": session.model_used,
-                    "generated_at": session.generated_at.isoformat() if session.generated_at else None
-                },
-                201
+                "รับงานลองเสื้อแล้ว กำลังประมวลผล",
+                VTONService._serialize_session(session),
+                202
             )
 
         except Exception as e:
             db.rollback()
             print(f"❌ Error creating VTON session: {e}")
             return error_response("เกิดข้อผิดพลาด", {"error": str(e)}, 500)
+
+    @staticmethod
+    def _serialize_session(s: VTONSession) -> dict:
+        return {
+            "session_id": str(s.session_id),
+            "status": s.status,
+            "product_id": str(s.product_id) if s.product_id else None,
+            "variant_id": str(s.variant_id) if s.variant_id else None,
+            "garment_id": str(s.garment_id) if s.garment_id else None,
+            "result_image_url": s.result_image_url,
+            "background_id": str(s.background_id) if s.background_id else None,
+            "model_used": s.model_used,
+            "error": s.error_message,
+            "generated_at": s.generated_at.isoformat() if s.generated_at else None,
+            "completed_at": s.completed_at.isoformat() if s.completed_at else None
+        }
+
+    @staticmethod
+    def get_vton_session(db: Session, user: User, session_id: UUID):
+        """ดูสถานะ / ผลลัพธ์ของงานลองเสื้อ (ใช้ poll ระหว่างรอ)"""
+        session = (
+            db.query(VTONSession)
+            .filter(
+                VTONSession.session_id == session_id,
+                VTONSession.user_id == user.user_id
+            )
+            .first()
+        )
+        if not session:
+            return error_response("ไม่พบ Session", {}, 404)
+        return success_response("ดึงข้อมูลสำเร็จ", VTONService._serialize_session(session))
+
+    # ==================== VTON JOB (CELERY WORKER) ====================
+
+    @staticmethod
+    def run_vton_job(db: Session, session_id: UUID) -> Optional[VTONSession]:
+        """
+        สร้างภาพลองเสื้อของ session ที่ PENDING (เรียกจาก celery worker)
+        - จอง session ด้วย UPDATE ... WHERE status = PENDING → task ซ้ำไม่เรียก IDM API ซ้ำ
+        - ไม่ถือ transaction ระหว่างรอ IDM API
+        คืนค่า session ที่จบแล้ว (COMPLETED / FAILED) หรือ None ถ้าไม่มีงานให้ทำ
+        """
+        claimed = (
+            db.query(VTONSession)
+            .filter(
+                VTONSession.session_id == session_id,
+                VTONSession.status == VTONSessionStatus.PENDING
+            )
+            .update(
+                {"status": VTONSessionStatus.PROCESSING, "started_at": now_utc()},
+                synchronize_session=False
+            )
+        )
+        db.commit()
+        if not claimed:
+            return None
+
+        session = db.query(VTONSession).filter(VTONSession.session_id == session_id).first()
+        params = session.job_params or {}
+        api_result = VTONService._call_idm_vton_api(
+            human_img_url=params.get("human_img_url"),
+            garment_img_url=params.get("garment_img_url"),
+            garment_description=params.get("garment_description", ""),
+            category=params.get("category", "upper_body"),
+            steps=params.get("steps", 30),
+            seed=params.get("seed", 42)
+        )
+
+        # ✅ เก็บผลลัพธ์ลง cache (key ซ้ำ = worker อื่นเก็บไปก่อน → ไฟล์นี้ใช้แค่ session นี้)
+        cached = False
+        cache_key = params.get("cache_key")
+        if api_result.get("success") and cache_key:
+            cached = vton_cache_repository.store(
+                db, cache_key, api_result["image_url"], api_result.get("size_bytes", 0)
+            )
+
+        # user อาจลบ session ไประหว่างรอ
+        db.expire_all()
+        session = db.query(VTONSession).filter(VTONSession.session_id == session_id).first()
+        if not session:
+            db.commit()
+            if api_result.get("image_url") and not cached:
+                delete_file(api_result["image_url"])
+            return None
+
+        if api_result.get("success"):
+            session.status = VTONSessionStatus.COMPLETED
+            session.result_image_url = api_result.get("image_url")
+            session.generated_at = now_utc()
+        else:
+            session.status = VTONSessionStatus.FAILED
+            session.error_message = api_result.get("error")
+        session.completed_at = now_utc()
+        db.commit()
+        db.refresh(session)
+        return session
+
+    @staticmethod
+    def expire_stale_vton_jobs(db: Session, stale_seconds: int) -> list:
+        """
+        งานที่ค้าง PENDING / PROCESSING นานเกิน stale_seconds → FAILED
+        (worker ตายกลางงาน / ส่ง task ไม่ถึง broker) ไม่งั้นจะนับเป็นงานพร้อมกันของ user ตลอดไป
+        """
+        cutoff = now_utc() - timedelta(seconds=stale_seconds)
+        sessions = (
+            db.query(VTONSession)
+            .filter(
+                VTONSession.status.in_(VTONSessionStatus.ACTIVE),
+                func.coalesce(VTONSession.started_at, VTONSession.generated_at) < cutoff
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for s in sessions:
+            s.status = VTONSessionStatus.FAILED
+            s.error_message = "timed out"
+            s.completed_at = now_utc()
+        db.commit()
+        return sessions
+
+    @staticmethod
+    def vton_queue_stats(db: Session) -> dict:
+        """จำนวน session แต่ละสถานะ + งานที่รอนานที่สุด (ดูที่ /internal/vton-jobs)"""
+        counts = dict(
+            db.query(VTONSession.status, func.count(VTONSession.session_id))
+            .filter(VTONSession.status.in_(VTONSessionStatus.ACTIVE))
+            .group_by(VTONSession.status)
+            .all()
+        )
+        oldest = (
+            db.query(func.min(VTONSession.generated_at))
+            .filter(VTONSession.status == VTONSessionStatus.PENDING)
+            .scalar()
+        )
+        if oldest is not None and oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        return {
+            "pending": counts.get(VTONSessionStatus.PENDING, 0),
+            "processing": counts.get(VTONSessionStatus.PROCESSING, 0),
+            "oldest_pending_age_seconds": round((now_utc() - oldest).total_seconds(), 1) if oldest else None,
+            "max_active_jobs_per_user": settings.VTON_MAX_ACTIVE_JOBS_PER_USER,
+        }
+
     @staticmethod
     def delete_vton_session(db: Session, user: User, session_id: UUID):
         """ลบ VTON Session และไฟล์รูปผลลัพธ์"""
@@ -924,18 +1220,14 @@ class VTONService:
             if not session:
                 return error_response("ไม่พบรูปผลลัพธ์หรือไม่มีสิทธิ์ลบ", {}, 404)
 
-            # ✅ ลบไฟล์รูปผลลัพธ์ (ถ้ามี)
-            if session.result_image_url:
-                try:
-                    delete_file(session.result_image_url)
-                    print(f"✅ Deleted result image: {session.result_image_url}")
-                except Exception as e:
-                    print(f"⚠️ Warning: Could not delete result image file: {e}")
-
             # ✅ ลบ record จาก database
+            result_image_url = session.result_image_url
             db.delete(session)
             db.commit()
 
+            # ✅ ลบไฟล์รูปผลลัพธ์ (ถ้าไม่ได้ใช้ร่วมกับ cache / session อื่น)
+            VTONService._release_result_file(db, result_image_url)
+
             return success_response("ลบรูปผลลัพธ์สำเร็จ", {})
 
         except Exception as e:
@@ -1037,16 +1329,7 @@ class VTONService:
                 "ดึงข้อมูลสำเร็จ",
                 {
                     "sessions": [
-                        {
-                            "session_id": str(s.session_id),
-                            "product_id": str(s.product_id) if s.product_id else None,
-                            "variant_id": str(s.variant_id) if s.variant_id else None,
-                            "garment_id": str(getattr(s, "garment_id", None)) if getattr(s, "garment_id", None) else None,
-                            "result_image_url": s.result_image_url,
-                            "background_id": str(s.background_id) if s.background_id else None,
-                            "model_used": s.model_used,
-                            "generated_at": s.generated_at.isoformat() if s.generated_at else None
-                        }
+                        VTONService._serialize_session(s)
                         for s in sessions
                     ]
                 }
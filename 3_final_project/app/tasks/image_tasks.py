@@ -0,0 +1,25 @@
+# app/tasks/image_tasks.py
+from app.core.celery import celery_app
+from app.db.database import WorkerSessionLocal
+from app.services.image_derivative_service import generate_for_image
+
+
+@celery_app.task(name="generate_image_derivatives")
+def generate_image_derivatives_task(image_id: str):
+    """
+    สร้างรูปย่อ (thumb / card / detail) ของ ProductImage
+    endpoint POST /images/upload ส่งงานมาหลังบันทึกรูปต้นฉบับ
+    รูปเก่า / ส่ง task ไม่สำเร็จ: python -m app.scripts.backfill_image_derivatives
+    """
+    db = WorkerSessionLocal()
+    try:
+        derivatives = generate_for_image(db, image_id)
+        if derivatives is None:
+            return {"ok": True, "skipped": True}
+        return {"ok": True, "sizes": list(derivatives)}
+    except Exception as e:
+        db.rollback()
+        print(f"[generate_image_derivatives] ❌ Error for {image_id}: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
@@ -1,8 +1,10 @@
 # app/tasks/order_tasks.py
 from app.core.celery import celery_app
+from app.core.config import settings
 from app.utils.now_utc import now_utc
 from app.models.order import Order, OrderStatus
-from app.db.database import SessionLocal
+from app.db.database import WorkerSessionLocal
+from app.repositories import daily_sales_repository
 import asyncio
 
 
@@ -12,7 +14,7 @@ def simulate_delivery(order_id: str):
     จำลองการจัดส่ง: รอครบเวลาแล้วเปลี่ยนสถานะเป็น DELIVERED
     → Issue #9: schedule auto_confirm_received ต่อเลย (1 นาที)
     """
-    db = SessionLocal()
+    db = WorkerSessionLocal()
     try:
         order: Order = db.query(Order).filter(Order.order_id == order_id).first()
         if not order:
@@ -36,6 +38,7 @@ def simulate_delivery(order_id: str):
         if hasattr(order, "delivered_at") and not order.delivered_at:
             order.delivered_at = now_utc()
 
+        daily_sales_repository.refresh_orders(db, [order.order_id])
         db.commit()
         db.refresh(order)
 
@@ -79,13 +82,29 @@ def simulate_delivery(order_id: str):
         db.close()
 
 
+def schedule_payout_retry(order_id: str, attempt: int) -> bool:
+    """
+    โอนให้ร้านไม่สำเร็จ → ลอง auto_confirm_received ใหม่ (backoff) จนครบ PAYOUT_RETRY_MAX_ATTEMPTS
+    ครบแล้วออเดอร์คง DELIVERED (ลูกค้ากดยืนยันซ้ำ = ลองโอนอีกครั้ง, ดูรายการ failed ที่ /payouts)
+    รอบใหม่หลัง Stripe ตอบ error ใช้ idempotency_key ใหม่ (PayoutService._create_transfer) → ไม่ได้ error เดิมจาก cache
+    """
+    if attempt >= settings.PAYOUT_RETRY_MAX_ATTEMPTS:
+        print(f"[auto_confirm] ❌ Payout retries exhausted for order {order_id}")
+        return False
+    countdown = settings.PAYOUT_RETRY_BASE_SECONDS * (2 ** attempt)
+    auto_confirm_received.apply_async(args=[order_id], kwargs={"attempt": attempt + 1}, countdown=countdown)
+    print(f"[auto_confirm] 🔁 Payout retry {attempt + 1} for order {order_id} in {countdown}s")
+    return True
+
+
 @celery_app.task(name="auto_confirm_received")
-def auto_confirm_received(order_id: str):
+def auto_confirm_received(order_id: str, attempt: int = 0):
     """
     Issue #9: Auto-confirm ถ้าลูกค้าไม่กดยืนยันรับสินค้าภายใน 1 นาที
     DELIVERED → COMPLETED พร้อม payout ให้ร้านค้า
+    โอนไม่สำเร็จบางร้าน → ออเดอร์คง DELIVERED แล้วตั้งเวลาลองใหม่ (schedule_payout_retry)
     """
-    db = SessionLocal()
+    db = WorkerSessionLocal()
     try:
         order: Order = db.query(Order).filter(Order.order_id == order_id).first()
         if not order:
@@ -114,7 +133,14 @@ def auto_confirm_received(order_id: str):
             )
             print(f"[auto_confirm] 💰 Payout done: {payout_result}")
         except Exception as e:
-            print(f"[auto_confirm] ⚠️ Payout failed (non-blocking): {e}")
+            db.rollback()
+            print(f"[auto_confirm] ⚠️ Payout failed: {e}")
+            payout_result = None
+
+        if payout_result is None or payout_result["failed_transfers"]:
+            # ยังไม่ COMPLETED → retry ผ่าน gate DELIVERED ได้ (ร้านที่โอนแล้วถูกข้าม)
+            retrying = schedule_payout_retry(order_id, attempt)
+            return {"ok": False, "order_id": order_id, "status": "DELIVERED", "payout_retry_scheduled": retrying}
 
         # เปลี่ยนเป็น COMPLETED หลัง payout
         # (payout_service อาจเปลี่ยนให้แล้ว แต่ set ซ้ำได้ไม่มีผลเสีย)
@@ -124,6 +150,7 @@ def auto_confirm_received(order_id: str):
             order.order_text_status = "ยืนยันรับสินค้าอัตโนมัติ"
             order.completed_at = now_utc()
             order.updated_at = now_utc()
+            daily_sales_repository.refresh_orders(db, [order.order_id])
             db.commit()
 
         print(f"[auto_confirm] ✅ Order {order_id} → COMPLETED")
@@ -0,0 +1,27 @@
+# app/tasks/payout_tasks.py
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.db.database import WorkerSessionLocal
+from app.services.payout_service import PayoutService
+
+
+@celery_app.task(name="settle_store_payouts")
+def settle_store_payouts_task():
+    """
+    รอบโอนเงินรวมให้ร้านค้า (PAYOUT_MODE=batched)
+    ยอด accrued ของแต่ละร้าน → Stripe Transfer 1 ครั้งต่อร้านต่อรอบ
+    """
+    db = WorkerSessionLocal()
+    try:
+        stats = PayoutService.settle_store_payouts(
+            db, max_attempts=settings.PAYOUT_SETTLEMENT_MAX_ATTEMPTS
+        )
+        if stats["settlements_opened"] or stats["transfers"] or stats["failed"]:
+            print(f"[settle_store_payouts] ✅ {stats}")
+        return {"ok": True, **stats}
+    except Exception as e:
+        db.rollback()
+        print(f"[settle_store_payouts] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
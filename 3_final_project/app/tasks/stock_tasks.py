@@ -0,0 +1,83 @@
+# app/tasks/stock_tasks.py
+import json
+import time
+
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.db.database import WorkerSessionLocal
+from app.repositories.stock_reservation_repository import reconcile_reserved_qty
+from app.services.stock_service import sweep_expired_reservations
+
+SWEEPER_METRICS_KEY = "closetx:metrics:reservation_sweeper"
+
+
+def _record_sweep_metrics(stats: dict) -> None:
+    """ยอดสะสม + ผลรอบล่าสุดของ sweeper ใน Redis (รวมทุก worker) — ดูได้ที่ /internal/sweeper-stats"""
+    try:
+        pipe = get_redis().pipeline()
+        for key in (
+            "batches", "orders_cancelled", "orders_skipped", "orders_paid_pending",
+            "payments_failed", "reserved_qty_released",
+        ):
+            pipe.hincrby(SWEEPER_METRICS_KEY, f"total_{key}", stats[key])
+        pipe.hincrby(SWEEPER_METRICS_KEY, "runs", 1)
+        pipe.hset(SWEEPER_METRICS_KEY, "last_run", json.dumps({**stats, "at": time.time()}))
+        pipe.execute()
+    except Exception as e:
+        print(f"⚠️ [sweep_expired_reservations] Could not record metrics: {e}")
+
+
+def get_sweep_metrics() -> dict:
+    raw = get_redis().hgetall(SWEEPER_METRICS_KEY)
+    data = {k.decode(): v.decode() for k, v in raw.items()}
+    return {
+        key: json.loads(value) if key == "last_run" else int(value)
+        for key, value in data.items()
+    }
+
+
+@celery_app.task(name="sweep_expired_reservations")
+def sweep_expired_reservations_task():
+    """
+    ยกเลิกออเดอร์ UNPAID ที่หมดเวลาชำระเงิน + คืน stock ที่จองไว้ เป็นชุด
+    รันตามรอบผ่าน celery beat (หลาย worker รันพร้อมกันได้ เพราะใช้ SKIP LOCKED)
+    """
+    db = WorkerSessionLocal()
+    try:
+        stats = sweep_expired_reservations(
+            db,
+            batch_size=settings.RESERVATION_SWEEP_BATCH_SIZE,
+            max_batches=settings.RESERVATION_SWEEP_MAX_BATCHES,
+            grace_seconds=settings.RESERVATION_SWEEP_GRACE_SECONDS,
+        )
+        _record_sweep_metrics(stats)
+        if stats["orders_cancelled"] or stats["reserved_qty_released"]:
+            print(f"[sweep_expired_reservations] ✅ {stats}")
+        return {"ok": True, **stats}
+    except Exception as e:
+        db.rollback()
+        print(f"[sweep_expired_reservations] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="reconcile_reserved_qty")
+def reconcile_reserved_qty_task():
+    """
+    ตรวจ reserved_qty ของทุก variant เทียบกับผลรวม stock_reservations
+    ค่าเพี้ยน → log + แก้ให้ตรง (รันตามรอบผ่าน celery beat)
+    """
+    db = WorkerSessionLocal()
+    try:
+        drifted = reconcile_reserved_qty(db)
+        if drifted:
+            print(f"[reconcile_reserved_qty] ⚠️ fixed {drifted} variant(s)")
+        return {"ok": True, "drifted": drifted}
+    except Exception as e:
+        db.rollback()
+        print(f"[reconcile_reserved_qty] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
@@ -0,0 +1,34 @@
+# app/tasks/stripe_tasks.py
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.db.database import WorkerSessionLocal
+from app.services.stripe_event_service import process_pending_events
+
+
+@celery_app.task(name="process_stripe_events")
+def process_stripe_events_task():
+    """
+    ประมวลผล Stripe webhook event ที่ค้างในคิว stripe_events
+    - webhook endpoint เรียกทันทีหลังบันทึก event
+    - celery beat เรียกตามรอบ (retry event ที่ FAILED + กรณีส่ง task ไม่สำเร็จ)
+    หลาย worker รันพร้อมกันได้ (จอง event ด้วย SKIP LOCKED)
+    """
+    db = WorkerSessionLocal()
+    try:
+        stats = process_pending_events(
+            db,
+            batch_size=settings.STRIPE_EVENT_BATCH_SIZE,
+            max_batches=settings.STRIPE_EVENT_MAX_BATCHES,
+            lease_seconds=settings.STRIPE_EVENT_LEASE_SECONDS,
+            max_attempts=settings.STRIPE_EVENT_MAX_ATTEMPTS,
+            retry_base_seconds=settings.STRIPE_EVENT_RETRY_BASE_SECONDS,
+        )
+        if stats["batches"]:
+            print(f"[process_stripe_events] ✅ {stats}")
+        return {"ok": True, **stats}
+    except Exception as e:
+        db.rollback()
+        print(f"[process_stripe_events] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
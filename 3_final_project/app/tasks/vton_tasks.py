@@ -0,0 +1,82 @@
+# app/tasks/vton_tasks.py
+import asyncio
+
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.db.database import WorkerSessionLocal
+from app.realtime.socket_manager import manager
+from app.services.vton_service import VTONService
+
+
+def _notify(session) -> None:
+    """ส่งผลลัพธ์ไปที่ room user:<user_id> (ผ่าน backplane ถึง web worker ที่ user ต่ออยู่)"""
+    try:
+        asyncio.run(manager.broadcast(
+            f"user:{session.user_id}",
+            {"type": "vton_session", "session": VTONService._serialize_session(session)}
+        ))
+    except Exception as e:
+        # client ยัง poll GET /vton/sessions/{session_id} ได้
+        print(f"[generate_vton] ⚠️ WebSocket broadcast failed: {e}")
+
+
+@celery_app.task(name="generate_vton")
+def generate_vton_task(session_id: str):
+    """
+    สร้างภาพลองเสื้อของ VTON session (เรียก IDM API) แล้วแจ้งผลทาง WebSocket
+    endpoint POST /vton/sessions ส่งงานมาหลังบันทึก session สถานะ PENDING
+    """
+    db = WorkerSessionLocal()
+    try:
+        session = VTONService.run_vton_job(db, session_id)
+        if session is None:
+            return {"ok": True, "skipped": True}
+        _notify(session)
+        print(f"[generate_vton] {session.status} {session_id}")
+        return {"ok": True, "status": session.status}
+    except Exception as e:
+        db.rollback()
+        print(f"[generate_vton] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="expire_stale_vton_jobs")
+def expire_stale_vton_jobs_task():
+    """งานลองเสื้อที่ค้างนานเกิน VTON_JOB_STALE_SECONDS → FAILED + แจ้ง user (celery beat)"""
+    db = WorkerSessionLocal()
+    try:
+        sessions = VTONService.expire_stale_vton_jobs(db, settings.VTON_JOB_STALE_SECONDS)
+        for session in sessions:
+            _notify(session)
+        if sessions:
+            print(f"[expire_stale_vton_jobs] ✅ Expired {len(sessions)} job(s)")
+        return {"ok": True, "expired": len(sessions)}
+    except Exception as e:
+        db.rollback()
+        print(f"[expire_stale_vton_jobs] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="evict_vton_cache")
+def evict_vton_cache_task():
+    """ลบ cache ผลลัพธ์ลองเสื้อที่ไม่ได้ใช้นานที่สุด เมื่อเกิน VTON_CACHE_MAX_BYTES / VTON_CACHE_MAX_ENTRIES"""
+    db = WorkerSessionLocal()
+    try:
+        stats = VTONService.evict_vton_cache(
+            db,
+            max_bytes=settings.VTON_CACHE_MAX_BYTES,
+            max_entries=settings.VTON_CACHE_MAX_ENTRIES,
+        )
+        if stats["evicted"]:
+            print(f"[evict_vton_cache] ✅ {stats}")
+        return {"ok": True, **stats}
+    except Exception as e:
+        db.rollback()
+        print(f"[evict_vton_cache] ❌ Error: {e}")
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.close()
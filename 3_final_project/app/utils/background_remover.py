@@ -0,0 +1,162 @@
+# app/utils/background_remover.py
+"""
+ลบพื้นหลัง (rembg) ใน process pool แยกจาก API / celery worker
+
+- แต่ละ process โหลด ONNX model ครั้งเดียวตอนเริ่ม (initializer) แล้วใช้ซ้ำทุกรูป
+- งานทั้งหมด (ลบพื้นหลัง → crop → resize → padding) ทำใน process ของ pool
+  ส่งกลับเป็น PIL Image (pickle แบบ raw ไม่ต้อง encode / decode PNG ระหว่างทาง)
+- process_many: ส่งหลายรูปเป็นชุดเดียว (แบ่ง chunk ให้แต่ละ process)
+- ฝั่ง async ใช้ process_async / process_many_async (ไม่ block event loop)
+
+    image, size = background_remover.process(data, max_size=1024, padding=30)
+    results = background_remover.process_many([a, b, c])
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from app.core.config import settings
+
+ImageInput = Union[bytes, Image.Image]
+Result = Tuple[Optional[Image.Image], Optional[Tuple[int, int]]]
+
+# ---------- ฝั่ง process ของ pool ----------
+
+_session = None
+
+
+def _init_worker(model_name: str) -> None:
+    """โหลด model ครั้งเดียวต่อ process (import rembg ที่นี่ → API process ไม่ต้องโหลด onnxruntime)"""
+    global _session
+    from rembg import new_session
+
+    _session = new_session(model_name)
+
+
+def _ping() -> bool:
+    return _session is not None
+
+
+def _standardize(source: ImageInput, max_size: int, padding: int) -> Result:
+    """ลบพื้นหลัง → crop ตามวัตถุ → ย่อให้ด้านยาวสุดไม่เกิน max_size (รวม padding) → วางกึ่งกลาง"""
+    from rembg import remove
+
+    img = Image.open(BytesIO(source)) if isinstance(source, bytes) else source
+    subject = remove(img, session=_session).convert("RGBA")
+
+    bbox = subject.getbbox()
+    if not bbox:
+        # โปร่งใสทั้งรูป → ไม่พบวัตถุ
+        return None, None
+    cropped = subject.crop(bbox)
+
+    inner_max = max_size - (padding * 2)
+    cropped.thumbnail((inner_max, inner_max), Image.Resampling.LANCZOS)
+
+    size = (cropped.width + padding * 2, cropped.height + padding * 2)
+    final = Image.new("RGBA", size, (0, 0, 0, 0))
+    final.paste(cropped, (padding, padding), cropped)
+    return final, size
+
+
+def _standardize_batch(args: Tuple[ImageInput, int, int]) -> Result:
+    return _standardize(*args)
+
+
+# ---------- ฝั่งผู้เรียก ----------
+
+
+class BackgroundRemover:
+    def __init__(self, workers: int, model_name: str):
+        self.workers = workers
+        self.model_name = model_name
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: ไม่ fork process ที่มี thread / connection pool อยู่แล้ว
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.model_name,),
+                    )
+        return self._pool
+
+    def start(self) -> None:
+        """สร้าง process ครบทุกตัว + โหลด model ล่วงหน้า (รูปแรกไม่ต้องรอโหลด model)"""
+        pool = self._executor()
+        try:
+            for future in [pool.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+        print(f"✅ [BackgroundRemover] {self.workers} worker(s) ready ({self.model_name})")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        """process ใน pool ตาย (OOM / rembg import ไม่ได้) → ทิ้ง pool นี้ ครั้งถัดไปสร้างใหม่"""
+        with self._lock:
+            if self._pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def process(self, source: ImageInput, max_size: int = 1024, padding: int = 30) -> Result:
+        pool = self._executor()
+        try:
+            return pool.submit(_standardize, source, max_size, padding).result()
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+    async def process_async(self, source: ImageInput, max_size: int = 1024, padding: int = 30) -> Result:
+        pool = self._executor()
+        try:
+            return await asyncio.wrap_future(pool.submit(_standardize, source, max_size, padding))
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+    def process_many(self, sources: Iterable[ImageInput], max_size: int = 1024, padding: int = 30) -> List[Result]:
+        """หลายรูปพร้อมกัน คืนผลตามลำดับเดิม"""
+        sources = list(sources)
+        if not sources:
+            return []
+        chunksize = max(1, len(sources) // (self.workers * 2))
+        pool = self._executor()
+        try:
+            return list(pool.map(
+                _standardize_batch,
+                [(source, max_size, padding) for source in sources],
+                chunksize=chunksize,
+            ))
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+    async def process_many_async(self, sources: Iterable[ImageInput], max_size: int = 1024, padding: int = 30) -> List[Result]:
+        pool = self._executor()
+        try:
+            futures = [asyncio.wrap_future(pool.submit(_standardize, source, max_size, padding)) for source in sources]
+            return list(await asyncio.gather(*futures))
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+
+background_remover = BackgroundRemover(workers=settings.REMBG_WORKERS, model_name=settings.REMBG_MODEL)
@@ -1,7 +1,8 @@
 # app/utils/file_util.py
 import os
 import shutil
-from typing import List
+import tempfile
+from typing import Iterable, List, Tuple
 
 from fastapi import UploadFile
 from sqlalchemy.orm import Session
@@ -12,6 +13,8 @@ import uuid
 # ===============================
 STORAGE_MODE = os.getenv("FILE_STORAGE_MODE", "DISK").upper()
 USE_CLOUDINARY = STORAGE_MODE == "CLOUDINARY"
+# save_stream (Cloudinary): ข้อมูลเกินขนาดนี้พักลงไฟล์ชั่วคราวแทน memory
+STREAM_SPOOL_BYTES = 8 * 1024 * 1024
 
 if USE_CLOUDINARY:
     import cloudinary
@@ -144,6 +147,42 @@ def save_file(upload_dir: str, file: UploadFile, filename: str | None = None) ->
     return file_path.replace("\\", "/")
 
 
+def save_stream(upload_dir: str, chunks: Iterable[bytes], filename: str) -> Tuple[str, int]:
+    """
+    บันทึกข้อมูลที่มาเป็นชิ้น (เช่น body ของ HTTP response) โดยไม่ต้องถือทั้งไฟล์ไว้ใน memory
+    return (path หรือ URL แบบเดียวกับ save_file, จำนวน bytes)
+    """
+    size = 0
+    if USE_CLOUDINARY:
+        # เก็บใน memory ไม่เกิน STREAM_SPOOL_BYTES ที่เหลือล้นลงไฟล์ชั่วคราว แล้ว upload
+        with tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_BYTES) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+                size += len(chunk)
+            spool.seek(0)
+            upload_result = cloudinary.uploader.upload(
+                spool,
+                folder=_normalize_folder(upload_dir),
+                resource_type="image",
+            )
+        return upload_result.get("secure_url"), size
+
+    # -------- DISK MODE --------
+    ensure_dir(upload_dir)
+    file_path = os.path.join(upload_dir, filename)
+    try:
+        with open(file_path, "wb") as buffer:
+            for chunk in chunks:
+                buffer.write(chunk)
+                size += len(chunk)
+    except Exception:
+        # ไม่ทิ้งไฟล์ครึ่ง ๆ ไว้ถ้า stream ขาดกลางทาง
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return file_path.replace("\\", "/"), size
+
+
 def save_multiple_files(upload_dir: str, files: List[UploadFile]) -> List[str]:
     """
     DISK MODE   → list ของ relative path
@@ -1,16 +1,22 @@
-# app/utils/image_processor.py - Enhanced with Detailed Debugging
+# app/utils/image_processor.py
 """
 Utility สำหรับประมวลผลรูปภาพ:
 - ลบพื้นหลัง (background removal)
 - จัดรูปให้มาตรฐาน (standardization)
 - จัดกึ่งกลางพร้อม space
+
+งานหนักทั้งหมดทำใน process pool ของ app.utils.background_remover (model โหลดครั้งเดียวต่อ process)
+เรียกจาก async handler → ใช้ background_remover.process_async แทน (ไม่ block event loop)
 """
 import io
 import os
-from typing import Tuple, Optional, Union
+import time
+from typing import List, Tuple, Optional, Union
 from PIL import Image
 from fastapi import UploadFile
 
+from app.utils.background_remover import background_remover
+
 
 class ImageProcessor:
     """Class สำหรับประมวลผลรูปภาพ"""
@@ -21,10 +27,10 @@ class ImageProcessor:
         max_size: int = 1024,
         padding: int = 30,
         return_bytes: bool = False,
-        debug: bool = True
+        debug: bool = False
     ) -> Tuple[Optional[Union[bytes, Image.Image]], Optional[Tuple[int, int]]]:
         """
-        ประมวลผลรูปภาพให้เป็นมาตรฐาน:
+        ประมวลผลรูปภาพให้เป็นมาตรฐาน (ทำใน process pool ของ background_remover):
         1. ลบพื้นหลัง
         2. Crop ขอบเขตวัตถุ
         3. Resize ให้ขนาดมาตรฐาน
@@ -46,7 +52,7 @@ class ImageProcessor:
             True = return bytes, False = return PIL Image
         
         debug : bool
-            แสดง debug messages
+            แสดงขนาด input / output + เวลาที่ใช้
 
         Returns:
         --------
@@ -55,219 +61,93 @@ class ImageProcessor:
             - (width, height) ขนาดของรูปผลลัพธ์
         """
         try:
-            if debug:
-                print("\n" + "="*60)
-                print("🎨 [IMAGE PROCESSOR] Starting image processing...")
-                print("="*60)
-
-            # ========================================
-            # STEP 1: อ่านรูปภาพจาก source ต่างๆ
-            # ========================================
-            if debug:
-                print(f"\n📂 STEP 1: Reading image from source...")
-                print(f"   Input type: {type(input_source)}")
-
-            input_image = None
-
-            if isinstance(input_source, str):
-                # จาก path
-                if not os.path.exists(input_source):
-                    print(f"❌ ERROR: File not found: {input_source}")
-                    return None, None
-                
-                with open(input_source, 'rb') as f:
-                    input_image = f.read()
-                
-                if debug:
-                    print(f"   ✅ Read from path: {input_source}")
-                    print(f"   File size: {len(input_image)} bytes")
-            
-            elif isinstance(input_source, bytes):
-                # จาก bytes
-                input_image = input_source
-                if debug:
-                    print(f"   ✅ Read from bytes")
-                    print(f"   Data size: {len(input_image)} bytes")
-            
-            elif isinstance(input_source, UploadFile):
-                # จาก FastAPI UploadFile
-                input_image = input_source.file.read()
-                input_source.file.seek(0)  # reset file pointer
-                if debug:
-                    print(f"   ✅ Read from UploadFile")
-                    print(f"   Filename: {input_source.filename}")
-                    print(f"   Content type: {input_source.content_type}")
-                    print(f"   Data size: {len(input_image)} bytes")
-            
-            elif isinstance(input_source, Image.Image):
-                # จาก PIL Image
-                img_byte_arr = io.BytesIO()
-                input_source.save(img_byte_arr, format='PNG')
-                input_image = img_byte_arr.getvalue()
-                if debug:
-                    print(f"   ✅ Read from PIL Image")
-                    print(f"   Image size: {input_source.size}")
-                    print(f"   Image mode: {input_source.mode}")
-            
-            else:
-                print(f"❌ ERROR: Unsupported input type: {type(input_source)}")
-                return None, None
-
-            if input_image is None or len(input_image) == 0:
-                print(f"❌ ERROR: Empty image data")
+            started = time.perf_counter()
+            source = ImageProcessor._read_source(input_source)
+            if source is None:
                 return None, None
 
-            # ========================================
-            # STEP 2: ลบพื้นหลัง
-            # ========================================
-            if debug:
-                print(f"\n🎨 STEP 2: Removing background...")
-                print(f"   Using rembg library...")
-
-            try:
-                from rembg import remove
-                subject_only = remove(input_image)
-                
-                if debug:
-                    print(f"   ✅ Background removed successfully")
-                    print(f"   Output size: {len(subject_only)} bytes")
-                
-            except ImportError as e:
-                print(f"❌ ERROR: rembg not installed!")
-                print(f"   Install with: pip install rembg --break-system-packages")
-                return None, None
-            except Exception as e:
-                print(f"❌ ERROR: Background removal failed")
-                print(f"   Error: {e}")
-                import traceback
-                traceback.print_exc()
-                return None, None
-
-            # ========================================
-            # STEP 3: Convert เป็น PIL Image (RGBA)
-            # ========================================
-            if debug:
-                print(f"\n🖼️  STEP 3: Converting to PIL Image...")
-
-            try:
-                img = Image.open(io.BytesIO(subject_only))
-                original_mode = img.mode
-                img = img.convert("RGBA")
-                
-                if debug:
-                    print(f"   Original mode: {original_mode}")
-                    print(f"   Converted to: RGBA")
-                    print(f"   Image size: {img.size}")
-                    print(f"   ✅ Conversion successful")
-                
-            except Exception as e:
-                print(f"❌ ERROR: Failed to convert to PIL Image")
-                print(f"   Error: {e}")
-                return None, None
-
-            # ========================================
-            # STEP 4: หาขอบเขตวัตถุและครอป
-            # ========================================
-            if debug:
-                print(f"\n✂️  STEP 4: Finding object bounds and cropping...")
-
-            bbox = img.getbbox()
-            if not bbox:
-                print(f"❌ ERROR: No object found in image (bbox is None)")
-                print(f"   This usually means:")
-                print(f"   - Image is completely transparent")
-                print(f"   - Background removal removed everything")
-                print(f"   - Image is empty")
+            final_img, size = background_remover.process(source, max_size=max_size, padding=padding)
+            if final_img is None:
+                print("❌ [IMAGE PROCESSOR] No object found in image (empty after background removal)")
                 return None, None
-            
-            if debug:
-                print(f"   Bounding box: {bbox}")
-                print(f"   Box size: {bbox[2] - bbox[0]} x {bbox[3] - bbox[1]}")
-            
-            cropped_img = img.crop(bbox)
-            
-            if debug:
-                print(f"   ✅ Cropped to object bounds")
-                print(f"   Cropped size: {cropped_img.size}")
 
-            # ========================================
-            # STEP 5: ปรับขนาดให้เป็นค่ามาตรฐาน
-            # ========================================
             if debug:
-                print(f"\n📏 STEP 5: Resizing to standard size...")
-                print(f"   Max size (with padding): {max_size}")
-                print(f"   Padding: {padding}")
-
-            inner_max_size = max_size - (padding * 2)
-            original_size = cropped_img.size
-            cropped_img.thumbnail((inner_max_size, inner_max_size), Image.Resampling.LANCZOS)
-            
-            if debug:
-                print(f"   Inner max size: {inner_max_size}")
-                print(f"   Original size: {original_size}")
-                print(f"   Resized to: {cropped_img.size}")
-                print(f"   ✅ Resize complete")
-
-            # ========================================
-            # STEP 6: สร้างเฟรมใหม่ + padding
-            # ========================================
-            if debug:
-                print(f"\n🖼️  STEP 6: Creating frame with padding...")
-
-            new_width = cropped_img.width + (padding * 2)
-            new_height = cropped_img.height + (padding * 2)
-            
-            # สร้างพื้นหลังโปร่งใส (RGBA)
-            final_img = Image.new("RGBA", (new_width, new_height), (0, 0, 0, 0))
-            
-            if debug:
-                print(f"   Frame size: {new_width} x {new_height}")
-                print(f"   Background: Transparent")
-
-            # ========================================
-            # STEP 7: วางวัตถุลงตรงกลาง
-            # ========================================
-            if debug:
-                print(f"\n🎯 STEP 7: Centering object...")
-
-            paste_x = padding
-            paste_y = padding
-            final_img.paste(cropped_img, (paste_x, paste_y), cropped_img)
-            
-            if debug:
-                print(f"   Paste position: ({paste_x}, {paste_y})")
-                print(f"   ✅ Object centered")
-
-            # ========================================
-            # STEP 8: Return ผลลัพธ์
-            # ========================================
-            if debug:
-                print(f"\n✅ STEP 8: Processing complete!")
-                print(f"   Final size: {new_width} x {new_height} px")
-                print(f"   Output format: PNG (RGBA)")
-                print("="*60 + "\n")
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"🎨 [IMAGE PROCESSOR] {type(input_source).__name__} → {size[0]}x{size[1]} RGBA ({elapsed_ms:.0f} ms)")
 
             if return_bytes:
                 img_byte_arr = io.BytesIO()
                 final_img.save(img_byte_arr, format='PNG')
-                return img_byte_arr.getvalue(), (new_width, new_height)
-            else:
-                return final_img, (new_width, new_height)
+                return img_byte_arr.getvalue(), size
+            return final_img, size
 
         except Exception as e:
-            print(f"\n❌ FATAL ERROR in image processing!")
-            print(f"   Error: {e}")
-            import traceback
-            traceback.print_exc()
+            # rembg ไม่ได้ติดตั้ง → BrokenProcessPool (initializer ของ pool import ไม่ได้)
+            print(f"❌ [IMAGE PROCESSOR] Processing failed: {e}")
             return None, None
 
+    @staticmethod
+    def _read_source(input_source) -> Optional[Union[bytes, Image.Image]]:
+        """path / bytes / UploadFile → bytes, PIL Image ส่งต่อได้เลย (ไม่ต้องแปลงเป็น PNG)"""
+        if isinstance(input_source, str):
+            if not os.path.exists(input_source):
+                print(f"❌ [IMAGE PROCESSOR] File not found: {input_source}")
+                return None
+            with open(input_source, 'rb') as f:
+                data = f.read()
+        elif isinstance(input_source, bytes):
+            data = input_source
+        elif isinstance(input_source, UploadFile):
+            data = input_source.file.read()
+            input_source.file.seek(0)  # reset file pointer
+        elif isinstance(input_source, Image.Image):
+            return input_source
+        else:
+            print(f"❌ [IMAGE PROCESSOR] Unsupported input type: {type(input_source)}")
+            return None
+
+        if not data:
+            print("❌ [IMAGE PROCESSOR] Empty image data")
+            return None
+        return data
+
+    @staticmethod
+    def process_many(
+        input_sources,
+        max_size: int = 1024,
+        padding: int = 30,
+        return_bytes: bool = False
+    ) -> List[Tuple[Optional[Union[bytes, Image.Image]], Optional[Tuple[int, int]]]]:
+        """
+        ประมวลผลหลายรูปเป็นชุดเดียว (กระจายไปทุก process ใน pool) คืนผลตามลำดับเดิม
+        รูปที่อ่านไม่ได้ / ไม่พบวัตถุ → (None, None)
+        """
+        sources = [ImageProcessor._read_source(src) for src in input_sources]
+        valid = [i for i, src in enumerate(sources) if src is not None]
+        results: List = [(None, None)] * len(sources)
+        try:
+            processed = background_remover.process_many(
+                [sources[i] for i in valid], max_size=max_size, padding=padding
+            )
+        except Exception as e:
+            print(f"❌ [IMAGE PROCESSOR] Batch processing failed: {e}")
+            return results
+
+        for i, (final_img, size) in zip(valid, processed):
+            if final_img is not None and return_bytes:
+                img_byte_arr = io.BytesIO()
+                final_img.save(img_byte_arr, format='PNG')
+                final_img = img_byte_arr.getvalue()
+            results[i] = (final_img, size)
+        return results
+
     @staticmethod
     def save_processed_image(
         input_source,
         output_path: str,
         max_size: int = 1024,
         padding: int = 30,
-        debug: bool = True
+        debug: bool = False
     ) -> Tuple[bool, Optional[str], Optional[Tuple[int, int]]]:
         """
         ประมวลผลรูปภาพและบันทึกไฟล์
@@ -318,7 +198,7 @@ class ImageProcessor:
         input_source,
         max_size: int = 1024,
         padding: int = 30,
-        debug: bool = True
+        debug: bool = False
     ) -> Optional[bytes]:
         """
         ประมวลผลรูปภาพและ return เป็น bytes
@@ -347,7 +227,7 @@ def process_vton_image(
     image_type: str = "garment",
     max_size: int = 1024,
     padding: int = 30,
-    debug: bool = True
+    debug: bool = False
 ) -> Optional[bytes]:
     """
     ประมวลผลรูปภาพสำหรับ VTON
@@ -2,6 +2,8 @@
 from datetime import datetime, timezone, timedelta
 import pytz
 
+THAI_TZ = "Asia/Bangkok"
+
 def now_utc():
     """คืนค่าเวลา UTC สำหรับเก็บ DB"""
     return datetime.now(timezone.utc)
@@ -5,17 +5,19 @@ import stripe
 
 from app.core.stripe_client import stripe
 from app.core.celery import celery_app
-from app.db.database import SessionLocal
+from app.db.database import WorkerSessionLocal
 from app.models.order import Order
+from app.repositories import daily_sales_repository
 from app.models.payment import Payment, PaymentStatus
 from app.models.stock_reservation import StockReservation
+from app.repositories.stock_reservation_repository import release_reservations
 from app.utils.now_utc import now_utc
 
 logger = get_task_logger(__name__)
 
 @celery_app.task(bind=True, max_retries=3)
 def check_order_timeout(self, order_id_str: str):
-    db: Session = SessionLocal()
+    db: Session = WorkerSessionLocal()
     try:
         order_id = UUID(order_id_str)
         # ✅ 1. Lock row ออเดอร์เพื่อป้องกัน Webhook เข้ามาแก้ไขพร้อมกัน
@@ -60,6 +62,7 @@ def check_order_timeout(self, order_id_str: str):
                     payment.paid_at = now_utc()
                     order.order_status = "PREPARING"
                     order.order_text_status = "กำลังจัดเตรียมสินค้า"
+                    daily_sales_repository.refresh_orders(db, [order.order_id])
                     db.commit()
                     return
 
@@ -85,9 +88,7 @@ def check_order_timeout(self, order_id_str: str):
         order.order_text_status = "ยกเลิกอัตโนมัติ (หมดเวลาชำระเงิน)"
 
         # คืน Stock ทันที
-        db.query(StockReservation).filter(
-            StockReservation.order_id == order_id
-        ).delete(synchronize_session=False)
+        release_reservations(db, StockReservation.order_id == order_id)
 
         if payment and payment.status == PaymentStatus.PENDING:
             payment.status = PaymentStatus.FAILED
@@ -0,0 +1,170 @@
+# app/utils/pagination.py
+"""
+Keyset (cursor) pagination + การนับจำนวนแบบเลือกได้
+
+- cursor เป็น string แบบ opaque (base64 ของ created_at + id ของแถวสุดท้าย)
+- หน้าถัดไปใช้ WHERE (created_at, id) < (cursor) แทน OFFSET → เร็วเท่ากันทุกหน้า
+- count mode:
+    exact     = COUNT(*) จริง (ช้าบน join ใหญ่)
+    estimated = ค่าประมาณจาก EXPLAIN ของ Postgres (ไม่ scan ข้อมูล)
+    none      = ไม่นับ
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+
+COUNT_MODES = ("exact", "estimated", "none")
+COUNT_MODE_PATTERN = "^(exact|estimated|none)$"
+
+
+def encode_cursor(created_at: datetime, row_id: Any) -> str:
+    payload = json.dumps({"c": created_at.isoformat(), "i": str(row_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """แปลง cursor กลับเป็น (created_at, id) — raise ValueError ถ้า cursor ไม่ถูกต้อง"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return datetime.fromisoformat(payload["c"]), UUID(payload["i"])
+    except Exception:
+        raise ValueError("cursor ไม่ถูกต้อง")
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """cursor สำหรับรายการที่เรียงตามคะแนน (เช่นผลค้นหา) ซึ่งใช้ keyset ไม่ได้"""
+    payload = json.dumps({"o": offset})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode()).decode())["o"])
+    except Exception:
+        raise ValueError("cursor ไม่ถูกต้อง")
+    if offset < 0:
+        raise ValueError("cursor ไม่ถูกต้อง")
+    return offset
+
+
+def _keyset_statement(query, created_col, id_col, limit: int, cursor: Optional[str]):
+    """เงื่อนไข keyset + ORDER BY + LIMIT (ใช้ได้ทั้ง Query และ select())"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+
+    return (
+        query
+        .order_by(created_col.desc(), id_col.desc())
+        .limit(limit + 1)  # ดึงเกิน 1 แถวเพื่อรู้ว่ามีหน้าถัดไปไหม
+    )
+
+
+def _keyset_result(rows: List[Any], created_col, id_col, limit: int) -> Tuple[List[Any], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
+
+
+def keyset_page(
+    query: Query,
+    created_col,
+    id_col,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    ดึง 1 หน้าแบบ keyset เรียง (created_at DESC, id DESC)
+
+    Returns:
+        (rows, next_cursor) — next_cursor เป็น None เมื่อถึงหน้าสุดท้าย
+    """
+    rows = _keyset_statement(query, created_col, id_col, limit, cursor).all()
+    return _keyset_result(rows, created_col, id_col, limit)
+
+
+def offset_page(query: Query, skip: int, limit: int) -> Tuple[List[Any], bool]:
+    """OFFSET แบบเดิม (สำหรับ client เก่า) — query ต้อง order_by มาแล้ว"""
+    rows = query.offset(skip).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def _explain_sql(dialect, statement) -> str:
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}"
+
+
+def _plan_rows(plan) -> int:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def estimate_count(db: Session, query: Query) -> Optional[int]:
+    """จำนวนแถวโดยประมาณจาก planner ของ Postgres (EXPLAIN) — คืน None ถ้าประมาณไม่ได้"""
+    try:
+        sql = _explain_sql(db.get_bind().dialect, query.statement)
+        # compiler escape % เป็น %% ไว้แล้ว (pyformat) → ให้ driver แปลงกลับตอน execute
+        plan = db.connection().exec_driver_sql(sql).scalar()
+        return _plan_rows(plan)
+    except Exception as e:
+        print(f"⚠️ [estimate_count] Failed: {e}")
+        return None
+
+
+def count_rows(db: Session, query: Query, mode: str) -> Optional[int]:
+    """นับจำนวนแถวตาม count mode (exact / estimated / none)"""
+    if mode == "exact":
+        return query.order_by(None).count()
+    if mode == "estimated":
+        return estimate_count(db, query.order_by(None))
+    return None
+
+
+# ---------- AsyncSession + select() ----------
+
+async def keyset_page_async(
+    db: AsyncSession,
+    stmt: Select,
+    created_col,
+    id_col,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """keyset_page สำหรับ AsyncSession (stmt เป็น select(Model))"""
+    result = await db.execute(_keyset_statement(stmt, created_col, id_col, limit, cursor))
+    return _keyset_result(result.scalars().all(), created_col, id_col, limit)
+
+
+async def offset_page_async(db: AsyncSession, stmt: Select, skip: int, limit: int) -> Tuple[List[Any], bool]:
+    result = await db.execute(stmt.offset(skip).limit(limit + 1))
+    rows = result.scalars().all()
+    return rows[:limit], len(rows) > limit
+
+
+async def count_rows_async(db: AsyncSession, stmt: Select, mode: str) -> Optional[int]:
+    stmt = stmt.order_by(None)
+    if mode == "exact":
+        return await db.scalar(select(func.count()).select_from(stmt.subquery()))
+    if mode == "estimated":
+        try:
+            sql = _explain_sql(db.get_bind().dialect, stmt)
+            conn = await db.connection()
+            plan = (await conn.exec_driver_sql(sql)).scalar()
+            return _plan_rows(plan)
+        except Exception as e:
+            print(f"⚠️ [estimate_count] Failed: {e}")
+            return None
+    return None
@@ -1,32 +1,29 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlalchemy.orm import Session
 
-from app.db.database import SessionLocal
-from app.models.stock_reservation import StockReservation
-from app.models.order import Order
-from app.utils.now_utc import now_utc
+from app.core.config import settings
+from app.db.database import WorkerSessionLocal
+from app.services.stock_service import sweep_expired_reservations
 
 
 scheduler = AsyncIOScheduler()
 
 
 def cleanup_expired_orders():
-    db: Session = SessionLocal()
+    """
+    ใช้ sweeper ตัวเดียวกับ Celery beat (sweep_expired_reservations)
+    สำหรับรันใน process ของ API เมื่อไม่มี celery beat
+    """
+    db: Session = WorkerSessionLocal()
     try:
-        now = now_utc()
-        expired_reservations = (
-            db.query(StockReservation)
-            .filter(StockReservation.expires_at < now)
-            .all()
+        stats = sweep_expired_reservations(
+            db,
+            batch_size=settings.RESERVATION_SWEEP_BATCH_SIZE,
+            max_batches=settings.RESERVATION_SWEEP_MAX_BATCHES,
+            grace_seconds=settings.RESERVATION_SWEEP_GRACE_SECONDS,
         )
-
-        for res in expired_reservations:
-            order = res.order
-            if order and order.order_status == "PENDING":
-                order.order_status = "CANCELLED"
-            db.delete(res)
-
-        db.commit()
+        if stats["orders_cancelled"] or stats["reserved_qty_released"]:
+            print("cleanup_expired_orders:", stats)
     except Exception as e:
         db.rollback()
         print("cleanup_expired_orders error:", e)
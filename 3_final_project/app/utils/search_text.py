@@ -0,0 +1,61 @@
+# app/utils/search_text.py
+"""
+Tokenizer สำหรับ search index (รองรับภาษาไทย)
+
+ภาษาไทยไม่มีช่องว่างระหว่างคำ และ Postgres ไม่มี parser ภาษาไทย
+จึงตัดคำเองฝั่ง Python:
+- คำภาษาอังกฤษ / ตัวเลข → 1 token ต่อคำ (lowercase)
+- ข้อความภาษาไทย → character bigram ("เสื้อยืด" → "เส", "สื", "ื้", ...)
+  ทำให้ค้นหาด้วยส่วนใดส่วนหนึ่งของคำได้ โดยไม่ต้องมีพจนานุกรม
+
+token ถูกส่งเข้า Postgres เป็น tsvector / tsquery literal โดยตรง (ไม่ผ่าน parser)
+"""
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u0E00-\u0E7F]+")
+_THAI_RE = re.compile(r"[\u0E00-\u0E7F]")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """lowercase + NFC + ยุบช่องว่าง (ใช้กับ trigram และ autocomplete)"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text).lower()
+    return " ".join(text.split())
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """ตัดข้อความเป็น token (ไม่ซ้ำ, เรียงตามลำดับที่พบ)"""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(normalize_text(text)):
+        word = match.group()
+        if _THAI_RE.match(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return list(dict.fromkeys(tokens))
+
+
+def to_tsvector_literal(tokens: Iterable[str]) -> str:
+    """token → tsvector input ('a' 'b' ...) — token มีแค่ตัวอักษร/ตัวเลข จึงไม่ต้อง escape"""
+    return " ".join(f"'{token}'" for token in tokens)
+
+
+def to_tsquery_literal(text: Optional[str]) -> Optional[str]:
+    """
+    คำค้นหา → tsquery ('a' & 'b':*)
+    token สุดท้ายเป็น prefix match เพื่อรองรับการพิมพ์ทีละตัว
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    terms = [f"'{token}'" for token in tokens]
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def escape_like(text: str) -> str:
+    """escape ตัวอักษรพิเศษของ LIKE (ใช้คู่กับ escape='\\\\')"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")